@@ -1,11 +1,11 @@
-import json
+import asyncio
 import os
-import time
-from pathlib import Path
 
 from dotenv import load_dotenv
-from supabase import create_client
-from openai import OpenAI
+from openai import AsyncOpenAI
+
+from src.db.embedding_backfill import BackfillEngine
+from src.db.supabase_async import create_async_supabase
 
 load_dotenv()
 
@@ -14,90 +14,41 @@ SUPABASE_KEY = os.getenv("SUPABASE_KEY")
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 EMB_MODEL = os.getenv("OPENAI_EMBEDDING_MODEL", "text-embedding-3-small")
 
-BATCH = int(os.getenv("BACKFILL_BATCH", "50"))
-SLEEP = float(os.getenv("BACKFILL_SLEEP", "0.05"))
-
-STATE_FILE = Path("backfill_state.json")
-
-sb = create_client(SUPABASE_URL, SUPABASE_KEY)
-oa = OpenAI(api_key=OPENAI_API_KEY)
-
-
-def load_state():
-    if STATE_FILE.exists():
-        return json.loads(STATE_FILE.read_text(encoding="utf-8"))
-    return {"last_id": 0, "updated": 0}
-
-
-def save_state(state):
-    STATE_FILE.write_text(json.dumps(state, ensure_ascii=False, indent=2), encoding="utf-8")
-
-
-def embed(text: str):
-    r = oa.embeddings.create(model=EMB_MODEL, input=text)
-    return r.data[0].embedding
-
-
-state = load_state()
-last_id = int(state.get("last_id", 0))
-updated = int(state.get("updated", 0))
-
-print(f"[BACKFILL] Iniciando desde last_id={last_id}, updated={updated}")
-
-attempt = 0
-max_attempts = 3
-
-while True:
+# BACKFILL_BATCH ahora es el tamaño de página de lectura; los requests a OpenAI
+# se arman por presupuesto de tokens (BACKFILL_TOKEN_BUDGET)
+BATCH = int(os.getenv("BACKFILL_BATCH", "500"))
+TOKEN_BUDGET = int(os.getenv("BACKFILL_TOKEN_BUDGET", "100000"))
+CONCURRENCY = int(os.getenv("BACKFILL_CONCURRENCY", "4"))
+MAX_CONCURRENCY = int(os.getenv("BACKFILL_MAX_CONCURRENCY", "32"))
+# Solo chunks nuevos o con texto cambiado (requiere sql/chunk_content_hash.sql)
+INCREMENTAL = os.getenv("BACKFILL_INCREMENTAL", "False").lower() == "true"
+
+STATE_FILE = "backfill_state.json"
+
+
+async def main():
+    sb = create_async_supabase(SUPABASE_URL, SUPABASE_KEY, pool_size=MAX_CONCURRENCY)
+    # Los 429 los maneja el motor (ventana adaptativa), no los reintentos del SDK
+    oa = AsyncOpenAI(api_key=OPENAI_API_KEY, max_retries=0)
+
+    engine = BackfillEngine(
+        sb,
+        oa,
+        model=EMB_MODEL,
+        state_path=STATE_FILE,
+        page_size=BATCH,
+        token_budget=TOKEN_BUDGET,
+        concurrency=CONCURRENCY,
+        max_concurrency=MAX_CONCURRENCY,
+        incremental=INCREMENTAL,
+    )
     try:
-        # Con .limit(1000) evitamos timeout en búsqueda
-        resp = (
-            sb.table("chunks")
-            .select("id,texto")
-            .gt("id", last_id)
-            .is_("embedding_openai", "null")
-            .order("id", desc=False)
-            .limit(BATCH)
-            .execute()
-        )
-        rows = resp.data or []
-        attempt = 0  # reset on success
-        
-        if not rows:
-            print(f"[BACKFILL] ✅ DONE - No hay más chunks sin embedding")
-            print(f"[BACKFILL] Total updated: {updated}")
-            break
-
-        for row in rows:
-            chunk_id = row["id"]
-            last_id = chunk_id
-            texto = (row.get("texto") or "").strip()
-            if not texto:
-                continue
-
-            try:
-                vec = embed(texto)
-                sb.table("chunks").update({"embedding_openai": vec}).eq("id", chunk_id).execute()
-                updated += 1
-
-                if updated % 10 == 0:
-                    print(f"[BACKFILL] updated: {updated:,} last_id: {last_id}")
-                    save_state({"last_id": last_id, "updated": updated})
-
-                time.sleep(SLEEP)
-
-            except Exception as e:
-                print(f"[BACKFILL] ❌ Error embedding chunk {chunk_id}: {e}")
-                time.sleep(0.05)
+        result = await engine.run()
+    finally:
+        await sb.postgrest.session.aclose()
+    print(f"[BACKFILL] Finalizado. Total embeddings procesados: {result['updated']:,} (fallidos: {result['failed']})")
 
-    except Exception as e:
-        attempt += 1
-        print(f"[BACKFILL] ⚠️  Error en query (intento {attempt}/3): {e}")
-        if attempt >= max_attempts:
-            print(f"[BACKFILL] ❌ Máximo de intentos alcanzado. Guardando state...")
-            save_state({"last_id": last_id, "updated": updated})
-            break
-        time.sleep(5.0)  # espera 5 seg antes de reintentar
 
-save_state({"last_id": last_id, "updated": updated})
-print(f"[BACKFILL] Finalizado. Total embeddings procesados: {updated:,}")
-# ============ FIN backfill_openai_embeddings_supabase.py ============
\ No newline at end of file
+if __name__ == "__main__":
+    asyncio.run(main())
+# ============ FIN backfill_openai_embeddings_supabase.py ============
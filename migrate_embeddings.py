@@ -14,7 +14,7 @@ from psycopg2.extras import RealDictCursor
 import logging
 
 sys.path.insert(0, os.path.abspath(os.path.dirname(__file__)))
-from src.vectordb_qdrant import VectorDB
+from src.db.vectordb_qdrant import VectorDB
 
 logging.basicConfig(
     level=logging.INFO,
@@ -108,13 +108,18 @@ def main():
     logger.info("\n[6/6] 🔄 Re-vectorizando %d chunks con SentenceTransformers...", len(chunks))
     logger.info("⏱️  Tiempo estimado: 5-10 minutos")
     
+    # Lotes grandes: add_documents hace un encode por lote (o lo reparte en el pool
+    # de procesos si EMBEDDING_WORKERS > 1) y upserts sin esperar por punto
+    block = 1000
     success_count = 0
     error_count = 0
 
-    for idx, chunk in enumerate(chunks, 1):
-        try:
-            metadata = {
+    for start in range(0, len(chunks), block):
+        batch = chunks[start:start + block]
+        metadatas = [
+            {
                 "chunk_id": str(chunk["chunk_id"]),
+                "chunk_index": chunk["chunk_index"],
                 "title": chunk["title"],
                 "resolution_number": chunk["resolution_number"],
                 "year": chunk["year"],
@@ -124,27 +129,21 @@ def main():
                     else None
                 ),
             }
+            for chunk in batch
+        ]
+        ok = vdb.add_documents(
+            [chunk["text"] for chunk in batch],
+            ids=[str(chunk["norma_id"]) for chunk in batch],
+            metadatas=metadatas,
+        )
+        success_count += ok
+        error_count += len(batch) - ok
+
+        done = start + len(batch)
+        logger.info("  ✅ Progreso: %d/%d chunks (%.1f%%)",
+                   done, len(chunks), (done/len(chunks))*100)
 
-            success = vdb.add_document(
-                document_id=str(chunk["norma_id"]),
-                content=chunk["text"],
-                chunk_index=chunk["chunk_index"],
-                metadata=metadata,
-            )
-
-            if success:
-                success_count += 1
-            else:
-                error_count += 1
-
-            # Log de progreso cada 50 chunks
-            if idx % 50 == 0:
-                logger.info("  ✅ Progreso: %d/%d chunks (%.1f%%)", 
-                           idx, len(chunks), (idx/len(chunks))*100)
-
-        except Exception as e:
-            logger.error("❌ Error en chunk %s: %s", chunk["chunk_id"], e)
-            error_count += 1
+    vdb.close()
 
     # RESUMEN
     logger.info("\n" + "=" * 70)
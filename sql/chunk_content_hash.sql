@@ -0,0 +1,93 @@
+-- Re-embedding incremental: hash de contenido + modelo con el que se generó cada embedding.
+-- Ejecutar antes de set_chunk_embeddings.sql (la RPC escribe las columnas *_hash / *_model).
+--
+-- content_hash            sha256 hex de texto (lo mantiene el trigger; en Python:
+--                         src/db/content_hash.py:content_hash, mismo resultado)
+-- embedding_<x>_hash      content_hash del texto que se embebió
+-- embedding_<x>_model     modelo que generó el embedding
+-- embedding_<x>_stale     generada: sin embedding o texto cambiado desde que se embebió
+--
+-- Un job incremental procesa solo "stale or model <> modelo actual" y reutiliza el
+-- vector de cualquier chunk con el mismo content_hash ya embebido con ese modelo.
+--
+-- embedding_local         vectores del proveedor local de src/db/embedding_jobs.py
+--                         (SentenceTransformers; 384 dims = paraphrase-multilingual-MiniLM-L12-v2,
+--                         otro modelo local requiere cambiar la dimensión)
+
+alter table chunks
+    add column if not exists embedding_local vector(384),
+    add column if not exists content_hash text,
+    add column if not exists embedding_openai_hash text,
+    add column if not exists embedding_openai_model text,
+    add column if not exists embedding_gemini_hash text,
+    add column if not exists embedding_gemini_model text,
+    add column if not exists embedding_local_hash text,
+    add column if not exists embedding_local_model text;
+
+create or replace function chunks_set_content_hash()
+returns trigger
+language plpgsql
+as $$
+begin
+    new.content_hash := encode(sha256(convert_to(coalesce(new.texto, ''), 'UTF8')), 'hex');
+    return new;
+end;
+$$;
+
+drop trigger if exists chunks_content_hash on chunks;
+create trigger chunks_content_hash
+    before insert or update of texto on chunks
+    for each row execute function chunks_set_content_hash();
+
+update chunks
+   set content_hash = encode(sha256(convert_to(coalesce(texto, ''), 'UTF8')), 'hex')
+ where content_hash is null;
+
+-- Los embeddings existentes se generaron a partir del texto actual con los modelos por defecto
+update chunks
+   set embedding_openai_hash = content_hash,
+       embedding_openai_model = 'text-embedding-3-small'
+ where embedding_openai is not null and embedding_openai_hash is null;
+
+update chunks
+   set embedding_gemini_hash = content_hash,
+       embedding_gemini_model = 'text-embedding-004'
+ where embedding_gemini is not null and embedding_gemini_hash is null;
+
+-- Columnas generadas (reescriben la tabla una vez)
+alter table chunks
+    add column if not exists embedding_openai_stale boolean
+        generated always as (embedding_openai is null or embedding_openai_hash is distinct from content_hash) stored,
+    add column if not exists embedding_gemini_stale boolean
+        generated always as (embedding_gemini is null or embedding_gemini_hash is distinct from content_hash) stored,
+    add column if not exists embedding_local_stale boolean
+        generated always as (embedding_local is null or embedding_local_hash is distinct from content_hash) stored;
+
+create index if not exists chunks_content_hash_idx on chunks (content_hash);
+create index if not exists chunks_openai_stale_idx on chunks (id) where embedding_openai_stale;
+create index if not exists chunks_gemini_stale_idx on chunks (id) where embedding_gemini_stale;
+create index if not exists chunks_local_stale_idx on chunks (id) where embedding_local_stale;
+
+
+-- Vectores ya calculados para una lista de hashes (uno por hash), para reutilizarlos.
+-- Devuelve [{"content_hash": "...", "embedding": "[0.1,...]"}, ...]
+create or replace function chunk_embeddings_by_hash(hashes text[], target text, model text)
+returns table (content_hash text, embedding text)
+language plpgsql
+stable
+as $$
+begin
+    if target not in ('embedding_openai', 'embedding_gemini', 'embedding_local') then
+        raise exception 'Columna de embedding no permitida: %', target;
+    end if;
+
+    return query execute format(
+        'select distinct on (c.content_hash) c.content_hash, c.%1$I::text
+           from chunks c
+          where c.content_hash = any($1)
+            and not c.%2$I
+            and c.%3$I = $2',
+        target, target || '_stale', target || '_model'
+    ) using hashes, model;
+end;
+$$;
@@ -0,0 +1,27 @@
+-- Marca de cambio de los chunks: updated_at se actualiza con cualquier UPDATE de la
+-- fila (texto editado, embedding nuevo o re-embebido por src/db/embedding_jobs.py).
+--
+-- VectorDBSupabase.corpus_version() usa (count, max(updated_at)) para invalidar el
+-- cache semántico de respuestas, y el índice local trae por updated_at las filas
+-- cambiadas con id por debajo de su watermark. El índice hace que max(updated_at)
+-- y "updated_at > x" sean baratos.
+
+alter table chunks
+    add column if not exists updated_at timestamptz not null default now();
+
+create or replace function chunks_touch_updated_at()
+returns trigger
+language plpgsql
+as $$
+begin
+    new.updated_at := now();
+    return new;
+end;
+$$;
+
+drop trigger if exists chunks_updated_at on chunks;
+create trigger chunks_updated_at
+    before update on chunks
+    for each row execute function chunks_touch_updated_at();
+
+create index if not exists chunks_updated_at_idx on chunks (updated_at);
@@ -0,0 +1,38 @@
+-- Escritura masiva de embeddings en chunks en un solo round trip.
+-- PostgREST no permite UPDATE de muchas filas con valores distintos (y un upsert
+-- exigiría todas las columnas NOT NULL), así que se expone como RPC.
+-- Requiere sql/chunk_content_hash.sql (columnas <target>_hash / <target>_model).
+--
+-- rows:   [{"id": 123, "embedding": [0.1, ...], "hash": "<content_hash>"}, ...]
+--         "hash" es opcional: sin él se asume el content_hash actual de la fila
+-- target: columna destino ('embedding_openai', 'embedding_gemini' o 'embedding_local')
+-- model:  modelo que generó los embeddings (opcional, se conserva el anterior)
+-- Devuelve cuántas filas se actualizaron.
+
+drop function if exists set_chunk_embeddings(jsonb, text);
+
+create or replace function set_chunk_embeddings(rows jsonb, target text default 'embedding_openai', model text default null)
+returns integer
+language plpgsql
+as $$
+declare
+    updated integer;
+begin
+    if target not in ('embedding_openai', 'embedding_gemini', 'embedding_local') then
+        raise exception 'Columna de embedding no permitida: %', target;
+    end if;
+
+    execute format(
+        'update chunks c
+            set %1$I = (r->>''embedding'')::vector,
+                %2$I = coalesce(r->>''hash'', c.content_hash),
+                %3$I = coalesce($2, c.%3$I)
+           from jsonb_array_elements($1) as r
+          where c.id = (r->>''id'')::bigint',
+        target, target || '_hash', target || '_model'
+    ) using rows, model;
+
+    get diagnostics updated = row_count;
+    return updated;
+end;
+$$;
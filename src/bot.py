@@ -2,12 +2,33 @@
 # src/bot.py
 import logging
 import asyncio
+import statistics
 import time
+from collections import deque
 from telegram import Update, constants
 from telegram.ext import Application, CommandHandler, MessageHandler, filters, ContextTypes
 
-from src.config import TELEGRAM_BOT_TOKEN
+from src.config import (
+    TELEGRAM_BOT_TOKEN,
+    TELEGRAM_API_BASE_URL,
+    TELEGRAM_CONNECTION_POOL,
+    TELEGRAM_CONCURRENT_UPDATES,
+    STREAM_RESPONSES,
+    STREAM_EDIT_INTERVAL,
+    SCHEDULER_MAX_PER_CHAT,
+    SCHEDULER_MAX_GLOBAL,
+    BOT_MODE,
+    WEBHOOK_URL,
+    WEBHOOK_HOST,
+    WEBHOOK_PORT,
+    WEBHOOK_PATH,
+    WEBHOOK_SECRET,
+    WEBHOOK_MAX_CONCURRENCY,
+    WEBHOOK_MAX_PENDING,
+)
 from src.core.agent import CREGAgent
+from src.core.scheduler import AnswerScheduler, ChatBusyError
+from src.telegram_stream import TelegramStreamWriter
 
 logging.basicConfig(
     format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
@@ -30,12 +51,47 @@ WELCOME_MSG = (
 )
 
 HELP_TOAST = "👋 *¡Hola de nuevo!* Recuerda que puedes preguntarme sobre cualquier Resolución CREG o tema regulatorio de energía y gas."
+STREAM_PLACEHOLDER = "🔎 Consultando la normativa CREG..."
+BUSY_MSG = "⏳ Todavía estoy respondiendo tu consulta anterior. Espera un momento y vuelve a intentarlo."
+
+
+def format_options(opciones) -> str:
+    msg = "🔍 *He encontrado varias opciones:* \n\n"
+    for i, opt in enumerate(opciones, 1):
+        msg += f"{i}. Resolución *{opt['normanumero']}* de *{opt['año']}*\n"
+    msg += "\nPor favor, sé más específico (ej: _'háblame de la resolución 67 de 1995'_)."
+    return msg
+
+
+def format_sources(normas) -> str:
+    if not normas:
+        return ""
+    msg = "\n\n📚 Normas consultadas:\n"
+    for n in normas:
+        msg += f"- Resolución {n.get('norma_numero')} ({n.get('año')})\n"
+    return msg
 
 
 class CREGBot:
     def __init__(self):
-        self.app = Application.builder().token(TELEGRAM_BOT_TOKEN).build()
+        builder = (
+            Application.builder()
+            .token(TELEGRAM_BOT_TOKEN)
+            .connection_pool_size(TELEGRAM_CONNECTION_POOL)
+            .concurrent_updates(TELEGRAM_CONCURRENT_UPDATES)
+        )
+        if TELEGRAM_API_BASE_URL:
+            builder = builder.base_url(TELEGRAM_API_BASE_URL)
+        self.app = builder.build()
         self.agent = CREGAgent()
+        self.scheduler = AnswerScheduler(
+            self.agent,
+            max_global=SCHEDULER_MAX_GLOBAL,
+            max_per_chat=SCHEDULER_MAX_PER_CHAT,
+        )
+        self.streaming = STREAM_RESPONSES
+        # Tiempo hasta el primer token visible (segundos), ventana de los últimos mensajes
+        self.ttfvt = deque(maxlen=200)
         self.setup_handlers()
 
     def setup_handlers(self):
@@ -52,6 +108,7 @@ class CREGBot:
         await update.message.reply_text(WELCOME_MSG, parse_mode=constants.ParseMode.MARKDOWN)
 
     async def handle_message(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        started_at = time.perf_counter()
         user_message = update.message.text
         now = time.time()
         last_interaction = context.user_data.get("last_interaction")
@@ -72,39 +129,94 @@ class CREGBot:
 
         await context.bot.send_chat_action(chat_id=update.effective_chat.id, action="typing")
 
+        if self.streaming:
+            await self.reply_streaming(update, user_message, started_at)
+            return
+
         try:
-            result = await self.agent.answer(user_message)
+            result = await self.scheduler.answer(update.effective_chat.id, user_message)
             
             if result.get("ambiguo"):
-                opciones = result.get("opciones", [])
-                msg = "🔍 *He encontrado varias opciones:* \n\n"
-                for i, opt in enumerate(opciones, 1):
-                    msg += f"{i}. Resolución *{opt['normanumero']}* de *{opt['año']}*\n"
-                msg += "\nPor favor, sé más específico (ej: _'háblame de la resolución 67 de 1995'_)."
+                msg = format_options(result.get("opciones", []))
                 await update.message.reply_text(msg, parse_mode=constants.ParseMode.MARKDOWN)
                 return
 
             respuesta = result.get("respuesta", "")
             normas = result.get("normas_usadas", [])
 
-            msg = respuesta
-            if normas:
-                msg += "\n\n📚 Normas consultadas:\n"
-                for n in normas:
-                    msg += f"- Resolución {n.get('norma_numero')} ({n.get('año')})\n"
+            msg = respuesta + format_sources(normas)
 
             # Telegram limita 4096 chars
             for i in range(0, len(msg), 4096):
                 await update.message.reply_text(msg[i:i+4096])
 
+        except ChatBusyError:
+            await update.message.reply_text(BUSY_MSG)
         except Exception as e:
             logger.error(f"Error procesando mensaje: {e}")
             await update.message.reply_text("❌ Error interno. Intenta de nuevo.")
 
+    async def reply_streaming(self, update: Update, user_message: str, started_at: float):
+        """
+        Responde editando un placeholder a medida que llegan los tokens del LLM.
+        """
+        writer = TelegramStreamWriter(
+            update.message.reply_text,
+            min_interval=STREAM_EDIT_INTERVAL,
+            started_at=started_at,
+        )
+        try:
+            await writer.start(STREAM_PLACEHOLDER)
+            result = {}
+            async for item in self.scheduler.answer_stream(update.effective_chat.id, user_message):
+                if isinstance(item, str):
+                    await writer.append(item)
+                else:
+                    result = item
+
+            if result.get("ambiguo"):
+                await writer.replace(
+                    format_options(result.get("opciones", [])),
+                    parse_mode=constants.ParseMode.MARKDOWN,
+                )
+            else:
+                await writer.finish(format_sources(result.get("normas_usadas", [])))
+        except ChatBusyError:
+            await writer.replace(BUSY_MSG)
+            return
+        except Exception as e:
+            logger.error(f"Error procesando mensaje (stream): {e}")
+            await update.message.reply_text("❌ Error interno. Intenta de nuevo.")
+            return
+
+        if writer.first_visible is not None:
+            self.ttfvt.append(writer.first_visible)
+            logger.info(
+                f"⏱️ Primer token visible: {writer.first_visible * 1000:.0f} ms "
+                f"(p50 últimos {len(self.ttfvt)}: {statistics.median(self.ttfvt) * 1000:.0f} ms, "
+                f"ediciones: {writer.edits}, mensajes: {writer.messages})"
+            )
+
     def run(self):
+        if BOT_MODE == "webhook":
+            self.run_webhook()
+            return
         logger.info("🤖 Bot CREG iniciando (Async Ready)...")
         self.app.run_polling()
 
+    def run_webhook(self):
+        from src.webhook import WebhookServer
+
+        logger.info("🤖 Bot CREG iniciando en modo webhook...")
+        server = WebhookServer(
+            self,
+            path=WEBHOOK_PATH,
+            secret_token=WEBHOOK_SECRET or None,
+            max_concurrency=WEBHOOK_MAX_CONCURRENCY,
+            max_pending=WEBHOOK_MAX_PENDING,
+        )
+        asyncio.run(server.serve(WEBHOOK_HOST, WEBHOOK_PORT, WEBHOOK_URL or None))
+
 
 if __name__ == "__main__":
     CREGBot().run()
@@ -5,11 +5,44 @@ load_dotenv()
 
 # Telegram
 TELEGRAM_BOT_TOKEN = os.getenv("TELEGRAM_BOT_TOKEN")
+# Respuestas en streaming (ediciones progresivas del mensaje, como máximo una cada N segundos)
+STREAM_RESPONSES = os.getenv("STREAM_RESPONSES", "True").lower() == "true"
+STREAM_EDIT_INTERVAL = float(os.getenv("STREAM_EDIT_INTERVAL", "1.0"))
+# API de Telegram alternativa (p.ej. un servidor falso local para pruebas)
+TELEGRAM_API_BASE_URL = os.getenv("TELEGRAM_API_BASE_URL", "")
+TELEGRAM_CONNECTION_POOL = int(os.getenv("TELEGRAM_CONNECTION_POOL", "16"))
+
+# Planificador: consultas simultáneas por chat y pipelines simultáneos en total
+SCHEDULER_MAX_PER_CHAT = int(os.getenv("SCHEDULER_MAX_PER_CHAT", "1"))
+SCHEDULER_MAX_GLOBAL = int(os.getenv("SCHEDULER_MAX_GLOBAL", "16"))
+# Updates que el bot procesa a la vez en modo polling; por encima de SCHEDULER_MAX_GLOBAL
+# para que un chat ocupado reciba el aviso aunque todos los pipelines estén en curso
+TELEGRAM_CONCURRENT_UPDATES = int(os.getenv("TELEGRAM_CONCURRENT_UPDATES", "32"))
+
+# Modo de ejecución del bot: "polling" o "webhook"
+BOT_MODE = os.getenv("BOT_MODE", "polling").lower()
+WEBHOOK_URL = os.getenv("WEBHOOK_URL", "")
+WEBHOOK_HOST = os.getenv("WEBHOOK_HOST", "0.0.0.0")
+WEBHOOK_PORT = int(os.getenv("WEBHOOK_PORT", os.getenv("PORT", "8080")))
+WEBHOOK_PATH = os.getenv("WEBHOOK_PATH", "/telegram")
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET", "")
+WEBHOOK_MAX_CONCURRENCY = int(os.getenv("WEBHOOK_MAX_CONCURRENCY", "32"))
+WEBHOOK_MAX_PENDING = int(os.getenv("WEBHOOK_MAX_PENDING", "256"))
 
 # OpenAI
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 OPENAI_MODEL = os.getenv("OPENAI_MODEL", "gpt-4o-mini")
 OPENAI_EMBEDDING_MODEL = os.getenv("OPENAI_EMBEDDING_MODEL", "text-embedding-3-small")
+# Lanza embedding + búsqueda vectorial en paralelo con la desambiguación textual
+SPECULATIVE_RETRIEVAL = os.getenv("SPECULATIVE_RETRIEVAL", "True").lower() == "true"
+# Cache de embeddings de consultas (0 = desactivado; PATH vacío = solo memoria)
+EMBEDDING_CACHE_SIZE = int(os.getenv("EMBEDDING_CACHE_SIZE", "1024"))
+EMBEDDING_CACHE_TTL = float(os.getenv("EMBEDDING_CACHE_TTL", "86400"))
+EMBEDDING_CACHE_PATH = os.getenv("EMBEDDING_CACHE_PATH", "")
+# Cache semántico de respuestas (0 = desactivado)
+ANSWER_CACHE_SIZE = int(os.getenv("ANSWER_CACHE_SIZE", "256"))
+ANSWER_CACHE_THRESHOLD = float(os.getenv("ANSWER_CACHE_THRESHOLD", "0.95"))
+ANSWER_CACHE_CORPUS_CHECK = float(os.getenv("ANSWER_CACHE_CORPUS_CHECK", "300"))
 
 
 
@@ -17,6 +50,26 @@ OPENAI_EMBEDDING_MODEL = os.getenv("OPENAI_EMBEDDING_MODEL", "text-embedding-3-s
 # Supabase
 SUPABASE_URL = os.getenv("SUPABASE_URL")
 SUPABASE_KEY = os.getenv("SUPABASE_KEY")
+# Trae texto + metadata de los matches (vectoriales y textuales) en una sola consulta
+SUPABASE_BATCH_FETCH = os.getenv("SUPABASE_BATCH_FETCH", "True").lower() == "true"
+# Pool de conexiones del cliente async (httpx)
+SUPABASE_POOL_SIZE = int(os.getenv("SUPABASE_POOL_SIZE", "10"))
+SUPABASE_KEEPALIVE = float(os.getenv("SUPABASE_KEEPALIVE", "30"))
+SUPABASE_TIMEOUT = float(os.getenv("SUPABASE_TIMEOUT", "30"))
+SUPABASE_HTTP2 = os.getenv("SUPABASE_HTTP2", "False").lower() == "true"
+# Índice vectorial local (réplica en memoria de embedding_openai; NLIST=0 => búsqueda exacta)
+LOCAL_INDEX_ENABLED = os.getenv("LOCAL_INDEX_ENABLED", "False").lower() == "true"
+LOCAL_INDEX_NLIST = int(os.getenv("LOCAL_INDEX_NLIST", "0"))
+LOCAL_INDEX_NPROBE = int(os.getenv("LOCAL_INDEX_NPROBE", "8"))
+# Desfase máximo del índice local respecto a chunks:
+# - ids nuevos, borrados y (con chunks.updated_at, sql/chunk_updated_at.sql) filas re-embebidas
+#   o rellenadas con id menor: LOCAL_INDEX_REFRESH segundos
+# - sin updated_at esas filas, o un borrado que coincide con altas y no cambia el número de
+#   chunks: LOCAL_INDEX_FULL_RELOAD segundos (0 = sin recarga periódica, sin cota)
+LOCAL_INDEX_REFRESH = float(os.getenv("LOCAL_INDEX_REFRESH", "300"))
+LOCAL_INDEX_FULL_RELOAD = float(os.getenv("LOCAL_INDEX_FULL_RELOAD", "3600"))
+# Snapshot en disco (src/db/snapshot.py) para el arranque en frío del índice local
+LOCAL_INDEX_SNAPSHOT = os.getenv("LOCAL_INDEX_SNAPSHOT", "")
 
 # App
 LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
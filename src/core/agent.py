@@ -4,15 +4,30 @@ Agente que integra Supabase (Hybrid Search) + OpenAI (GPT) - Versión Async
 """
 
 import logging
-from typing import List, Dict, Optional
+import time
+from typing import AsyncIterator, List, Dict, Optional, Tuple, Union
 
 from openai import AsyncOpenAI
 
-from src.config import OPENAI_API_KEY, OPENAI_MODEL
-from src.db.vectordb_supabase import VectorDBSupabase
+from src.config import (
+    OPENAI_API_KEY,
+    OPENAI_MODEL,
+    SPECULATIVE_RETRIEVAL,
+    ANSWER_CACHE_SIZE,
+    ANSWER_CACHE_THRESHOLD,
+    ANSWER_CACHE_CORPUS_CHECK,
+)
+from src.core.answer_cache import AnswerCache
+from src.db.vectordb_supabase import RetrievalContext, VectorDBSupabase
 
 logger = logging.getLogger(__name__)
 
+ERROR_PREFIX = "Error al procesar"
+
+
+class ErrorText(str):
+    """Texto de error devuelto al usuario en lugar de una respuesta; nunca se cachea."""
+
 
 class CREGAgent:
     """
@@ -22,15 +37,33 @@ class CREGAgent:
     3) Genera respuesta con OpenAI (Async)
     """
 
+    # Parámetros de la búsqueda vectorial (la tarea especulativa debe usar los mismos)
+    N_RESULTS = 3
+    THRESHOLD = 0.4
+
     def __init__(self):
         self.vectordb = VectorDBSupabase()
         self.client = AsyncOpenAI(api_key=OPENAI_API_KEY)
         self.model = OPENAI_MODEL
+        self.speculative = SPECULATIVE_RETRIEVAL
+
+        self.answer_cache: Optional[AnswerCache] = None
+        if ANSWER_CACHE_SIZE > 0:
+            self.answer_cache = AnswerCache(ANSWER_CACHE_SIZE, ANSWER_CACHE_THRESHOLD)
+        self._corpus_checked_at = 0.0
         logger.info("✅ Agent inicializado (Async Pipeline)")
 
-    async def search_normas(self, query: str, n_results: int = 3) -> Optional[List[Dict]]:
+    async def search_normas(
+        self,
+        query: str,
+        n_results: int = N_RESULTS,
+        ctx: Optional[RetrievalContext] = None,
+        threshold: float = THRESHOLD,
+    ) -> Optional[List[Dict]]:
         # La búsqueda ahora es asíncrona e híbrida
-        results = await self.vectordb.search(query, n_results=n_results, threshold=0.4)
+        results = await self.vectordb.search(
+            query, n_results=n_results, threshold=threshold, ctx=ctx
+        )
         if not results:
             return None
 
@@ -65,7 +98,7 @@ class CREGAgent:
             context += f" URL: {n['url']}\n\n"
         return context
 
-    async def generate_response(self, user_question: str, context: str) -> str:
+    def build_messages(self, user_question: str, context: str) -> List[Dict]:
         system_prompt = (
             "Eres un asistente experto en regulación de energía y gas en Colombia (CREG). "
             "Responde en español, claro y conciso. Máximo 500 palabras. "
@@ -83,24 +116,130 @@ INSTRUCCIONES:
 2. Cita las resoluciones que usaste (ej: \"Resolución 502-149 de 2025\").
 3. Si no hay información suficiente, di: \"No encontré información en las normas disponibles\".
 """
+        return [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": user_prompt},
+        ]
 
+    async def generate_response(self, user_question: str, context: str) -> str:
         try:
             resp = await self.client.chat.completions.create(
                 model=self.model,
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": user_prompt},
-                ],
+                messages=self.build_messages(user_question, context),
                 temperature=0.2,
             )
             return (resp.choices[0].message.content or "").strip() or "No pude generar respuesta."
         except Exception as e:
             logger.error(f"❌ Error con OpenAI: {e}")
-            return f"Error al procesar: {str(e)}"
+            return ErrorText(f"{ERROR_PREFIX}: {str(e)}")
+
+    async def stream_response(self, user_question: str, context: str) -> AsyncIterator[str]:
+        """
+        Igual que generate_response pero con stream=True: produce los tokens a medida que llegan.
+        """
+        try:
+            stream = await self.client.chat.completions.create(
+                model=self.model,
+                messages=self.build_messages(user_question, context),
+                temperature=0.2,
+                stream=True,
+            )
+            async for chunk in stream:
+                if not chunk.choices:
+                    continue
+                token = chunk.choices[0].delta.content
+                if token:
+                    yield token
+        except Exception as e:
+            logger.error(f"❌ Error con OpenAI (stream): {e}")
+            # Puede llegar después de tokens ya enviados: el llamador lo detecta por el tipo
+            yield ErrorText(f"{ERROR_PREFIX}: {str(e)}")
+
+    async def _refresh_corpus_version(self) -> None:
+        # Consulta la versión del corpus como máximo cada ANSWER_CACHE_CORPUS_CHECK segundos
+        now = time.monotonic()
+        if now - self._corpus_checked_at < ANSWER_CACHE_CORPUS_CHECK:
+            return
+        self._corpus_checked_at = now
+        version = await self.vectordb.corpus_version()
+        if version is not None:
+            self.answer_cache.set_corpus_version(version)
+
+    async def _cache_lookup(
+        self,
+        user_question: str,
+        normas: Optional[List[Dict]],
+        ctx: Optional[RetrievalContext] = None,
+    ) -> Tuple[Optional[str], Optional[Tuple]]:
+        """
+        Busca en el cache semántico. Devuelve (respuesta cacheada, clave para guardar luego).
+        """
+        if self.answer_cache is None or not normas:
+            return None, None
+
+        await self._refresh_corpus_version()
+        vector = await self.vectordb.generate_embedding(user_question, ctx)
+        if vector is None:
+            return None, None
+
+        norma_ids = frozenset(n["norma_id"] for n in normas)
+        hit = self.answer_cache.lookup(vector, norma_ids)
+        if hit is not None:
+            logger.info(f"⚡ Respuesta desde cache semántico ({self.answer_cache.stats()})")
+            return hit.respuesta, None
+        return None, (vector, norma_ids)
+
+    def _cache_store(
+        self,
+        user_question: str,
+        key: Optional[Tuple],
+        respuesta: str,
+        latency: float,
+        failed: bool = False,
+    ) -> None:
+        if key is None or failed or isinstance(respuesta, ErrorText):
+            return
+        vector, norma_ids = key
+        self.answer_cache.store(user_question, vector, norma_ids, respuesta, latency)
+
+    async def cached_response(
+        self,
+        user_question: str,
+        context: str,
+        normas: Optional[List[Dict]],
+        ctx: Optional[RetrievalContext] = None,
+    ) -> str:
+        """
+        generate_response con cache semántico delante: misma pregunta (por similitud
+        de embedding) y mismo set de norma_id => se reutiliza la respuesta anterior.
+        """
+        cached, key = await self._cache_lookup(user_question, normas, ctx)
+        if cached is not None:
+            return cached
+
+        t0 = time.perf_counter()
+        respuesta = await self.generate_response(user_question, context)
+        self._cache_store(user_question, key, respuesta, time.perf_counter() - t0)
+        return respuesta
+
+    async def retrieve(self, user_question: str, ctx: RetrievalContext) -> Dict:
+        """
+        Etapa de recuperación: desambiguación textual + búsqueda híbrida.
+        Devuelve el resultado ambiguo final o las normas y el contexto para el LLM.
+        """
+        t0 = time.perf_counter()
+
+        # 0. Especulativo: embedding + RPC vectorial arrancan junto con la desambiguación.
+        #    search_normas reutiliza esta misma tarea vía ctx (mismos parámetros).
+        if self.speculative:
+            ctx.spawn(
+                self.vectordb.search_by_vector(
+                    user_question, self.N_RESULTS, self.THRESHOLD, ctx=ctx
+                )
+            )
 
-    async def answer(self, user_question: str) -> Dict:
         # 1. Búsqueda textual primero para ver si hay ambigüedad clara (mismo número, varios años)
-        text_matches = await self.vectordb.search_by_text(user_question)
+        text_matches = await self.vectordb.search_by_text(user_question, ctx=ctx)
         
         # Si hay más de una norma distinta por texto, enviamos opciones para desambiguar
         unique_norms = {}
@@ -111,22 +250,76 @@ INSTRUCCIONES:
                 unique_norms[key] = meta
 
         if len(unique_norms) > 1:
+            cancelled = await ctx.cancel()
+            if cancelled:
+                logger.info(f"🛑 Búsqueda especulativa cancelada ({cancelled} tareas)")
+            logger.info(f"📊 Llamadas backend: {dict(ctx.calls)}")
             return {
                 "ambiguo": True,
                 "opciones": list(unique_norms.values()),
                 "respuesta": "He encontrado varias resoluciones con ese número. ¿A cuál te refieres?",
+                "llamadas_backend": dict(ctx.calls),
             }
 
         # 2. Pipeline normal si no hay ambigüedad crítica
-        normas = await self.search_normas(user_question, n_results=3)
+        normas = await self.search_normas(user_question, ctx=ctx)
+        logger.info(f"⏱️ Recuperación: {(time.perf_counter() - t0) * 1000:.0f} ms")
         context = self.build_context(normas) if normas else "No hay normas disponibles."
-        respuesta = await self.generate_response(user_question, context)
+        return {"ambiguo": False, "normas": normas, "contexto": context}
+
+    async def answer(self, user_question: str) -> Dict:
+        # Contexto por mensaje: la búsqueda textual se hace una sola vez y se reutiliza
+        ctx = RetrievalContext()
+        retrieved = await self.retrieve(user_question, ctx)
+        if retrieved["ambiguo"]:
+            return retrieved
 
+        normas = retrieved["normas"]
+        respuesta = await self.cached_response(user_question, retrieved["contexto"], normas, ctx)
+
+        logger.info(f"📊 Llamadas backend: {dict(ctx.calls)}")
         return {
             "ambiguo": False,
             "pregunta": user_question,
             "respuesta": respuesta,
             "normas_usadas": normas or [],
+            "llamadas_backend": dict(ctx.calls),
+        }
+
+    async def answer_stream(self, user_question: str) -> AsyncIterator[Union[str, Dict]]:
+        """
+        Versión streaming de answer(): produce los tokens (str) de la respuesta a medida
+        que llegan y termina con el mismo dict que devolvería answer().
+        """
+        ctx = RetrievalContext()
+        retrieved = await self.retrieve(user_question, ctx)
+        if retrieved["ambiguo"]:
+            yield retrieved
+            return
+
+        normas = retrieved["normas"]
+        cached, key = await self._cache_lookup(user_question, normas, ctx)
+        if cached is not None:
+            respuesta = cached
+            yield cached
+        else:
+            t0 = time.perf_counter()
+            parts = []
+            failed = False
+            async for token in self.stream_response(user_question, retrieved["contexto"]):
+                failed = failed or isinstance(token, ErrorText)
+                parts.append(token)
+                yield token
+            respuesta = "".join(parts).strip() or "No pude generar respuesta."
+            self._cache_store(user_question, key, respuesta, time.perf_counter() - t0, failed)
+
+        logger.info(f"📊 Llamadas backend: {dict(ctx.calls)}")
+        yield {
+            "ambiguo": False,
+            "pregunta": user_question,
+            "respuesta": respuesta,
+            "normas_usadas": normas or [],
+            "llamadas_backend": dict(ctx.calls),
         }
 
 # ============ FIN src/core/agent.py ============
@@ -0,0 +1,138 @@
+"""
+src/core/answer_cache.py
+Cache semántico de respuestas: reutiliza una respuesta ya generada cuando la
+pregunta es casi idéntica (similitud coseno del embedding) y la recuperación
+devolvió exactamente las mismas normas.
+"""
+
+import logging
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, FrozenSet, Hashable, Optional, Sequence
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class CachedAnswer:
+    """Respuesta almacenada junto con lo necesario para validarla."""
+    query: str
+    vector: np.ndarray
+    norma_ids: FrozenSet
+    respuesta: str
+    latency: float
+    created: float
+
+
+class AnswerCache:
+    """
+    Cache acotado (LRU) de respuestas del LLM indexado por embedding de la pregunta.
+    Se vacía completo cuando cambia la versión del corpus.
+    """
+
+    def __init__(self, max_size: int = 256, threshold: float = 0.95):
+        self.max_size = max_size
+        self.threshold = threshold
+        self.corpus_version: Optional[Hashable] = None
+
+        self._entries: "OrderedDict[int, CachedAnswer]" = OrderedDict()
+        self._next_key = 0
+        self._matrix: Optional[np.ndarray] = None
+        self._keys: list = []
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self.latency_saved = 0.0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @staticmethod
+    def _normalize(vector: Sequence[float]) -> np.ndarray:
+        vec = np.asarray(vector, dtype=np.float32)
+        norm = float(np.linalg.norm(vec))
+        return vec / norm if norm else vec
+
+    def _index(self) -> np.ndarray:
+        # Matriz de vectores normalizados, reconstruida solo cuando cambia el cache
+        if self._matrix is None:
+            self._keys = list(self._entries.keys())
+            self._matrix = np.stack([self._entries[k].vector for k in self._keys])
+        return self._matrix
+
+    def lookup(self, vector: Sequence[float], norma_ids: FrozenSet) -> Optional[CachedAnswer]:
+        """
+        Devuelve la entrada más similar si supera el umbral y comparte el mismo set de normas.
+        """
+        if not self._entries:
+            self.misses += 1
+            return None
+
+        q = self._normalize(vector)
+        sims = self._index() @ q
+        for i in np.argsort(-sims):
+            if sims[i] < self.threshold:
+                break
+            key = self._keys[i]
+            entry = self._entries[key]
+            if entry.norma_ids == norma_ids:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                self.latency_saved += entry.latency
+                return entry
+
+        self.misses += 1
+        return None
+
+    def store(
+        self,
+        query: str,
+        vector: Sequence[float],
+        norma_ids: FrozenSet,
+        respuesta: str,
+        latency: float,
+    ) -> None:
+        if self.max_size <= 0:
+            return
+        self._entries[self._next_key] = CachedAnswer(
+            query=query,
+            vector=self._normalize(vector),
+            norma_ids=norma_ids,
+            respuesta=respuesta,
+            latency=latency,
+            created=time.time(),
+        )
+        self._next_key += 1
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+        self._matrix = None
+
+    def set_corpus_version(self, version: Hashable) -> None:
+        """
+        Registra la versión actual del corpus; si cambió, invalida todas las respuestas.
+        """
+        if self.corpus_version is not None and version != self.corpus_version and self._entries:
+            logger.info(f"♻️ Corpus cambió ({self.corpus_version} → {version}), vaciando cache de respuestas")
+            self.invalidations += 1
+            self._entries.clear()
+            self._matrix = None
+        self.corpus_version = version
+
+    def stats(self) -> Dict:
+        total = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 3) if total else 0.0,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+            "latency_saved_s": round(self.latency_saved, 2),
+        }
@@ -0,0 +1,150 @@
+# src/core/scheduler.py
+"""
+Planificador entre CREGBot y CREGAgent:
+- límite de consultas en curso por chat,
+- semáforo global de pipelines (recuperación + LLM) simultáneos,
+- single-flight: preguntas idénticas (normalizadas) en curso comparten una sola ejecución.
+"""
+
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Tuple, Union
+
+from src.db.embedding_cache import normalize_query
+
+logger = logging.getLogger(__name__)
+
+
+class ChatBusyError(Exception):
+    """El chat ya tiene el máximo de consultas en curso."""
+
+
+class _Flight:
+    """
+    Ejecución compartida: guarda los items producidos para que cada seguidor
+    los reciba todos (incluidos los emitidos antes de que se uniera).
+    """
+
+    def __init__(self):
+        self.items: List[Any] = []
+        self.done = False
+        self.error: Optional[BaseException] = None
+        self.followers = 0
+        self._changed = asyncio.Event()
+
+    def _notify(self) -> None:
+        event, self._changed = self._changed, asyncio.Event()
+        event.set()
+
+    def push(self, item: Any) -> None:
+        self.items.append(item)
+        self._notify()
+
+    def close(self, error: Optional[BaseException] = None) -> None:
+        self.error = error
+        self.done = True
+        self._notify()
+
+    async def follow(self) -> AsyncIterator[Any]:
+        i = 0
+        while True:
+            changed = self._changed
+            while i < len(self.items):
+                yield self.items[i]
+                i += 1
+            if self.done:
+                if self.error is not None:
+                    raise self.error
+                return
+            await changed.wait()
+
+
+class AnswerScheduler:
+    """
+    Envuelve CREGAgent.answer / answer_stream con control de concurrencia y coalescencia.
+    """
+
+    def __init__(self, agent, max_global: int = 16, max_per_chat: int = 1):
+        self.agent = agent
+        self.max_global = max_global
+        self.max_per_chat = max_per_chat
+
+        self._global = asyncio.Semaphore(max_global)
+        self._per_chat: Dict[Any, int] = {}
+        self._flights: Dict[Tuple[str, str], _Flight] = {}
+        self._tasks = set()
+
+        # Métricas
+        self.executed = 0
+        self.coalesced = 0
+        self.rejected = 0
+
+    @asynccontextmanager
+    async def chat_slot(self, chat_id: Any):
+        if self._per_chat.get(chat_id, 0) >= self.max_per_chat:
+            self.rejected += 1
+            raise ChatBusyError(chat_id)
+        self._per_chat[chat_id] = self._per_chat.get(chat_id, 0) + 1
+        try:
+            yield
+        finally:
+            self._per_chat[chat_id] -= 1
+            if not self._per_chat[chat_id]:
+                del self._per_chat[chat_id]
+
+    def _join(self, mode: str, question: str, factory: Callable[[], AsyncIterator[Any]]) -> _Flight:
+        key = (mode, normalize_query(question))
+        flight = self._flights.get(key)
+        if flight is not None:
+            self.coalesced += 1
+            logger.info(f"🔗 Consulta coalescida con una ejecución en curso: {key[1]!r}")
+        else:
+            flight = _Flight()
+            self._flights[key] = flight
+            task = asyncio.create_task(self._produce(key, flight, factory))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+        flight.followers += 1
+        return flight
+
+    async def _produce(self, key, flight: _Flight, factory) -> None:
+        # La ejecución no depende de ningún chat en particular: si quien la inició
+        # se desconecta, el resto de seguidores sigue recibiendo el resultado.
+        error = None
+        try:
+            async with self._global:
+                self.executed += 1
+                async for item in factory():
+                    flight.push(item)
+        except Exception as e:
+            error = e
+        finally:
+            self._flights.pop(key, None)
+            flight.close(error)
+
+    async def answer(self, chat_id: Any, question: str) -> Dict:
+        async with self.chat_slot(chat_id):
+            async def run():
+                yield await self.agent.answer(question)
+
+            flight = self._join("answer", question, run)
+            result = {}
+            async for item in flight.follow():
+                result = item
+            return result
+
+    async def answer_stream(self, chat_id: Any, question: str) -> AsyncIterator[Union[str, Dict]]:
+        async with self.chat_slot(chat_id):
+            flight = self._join("stream", question, lambda: self.agent.answer_stream(question))
+            async for item in flight.follow():
+                yield item
+
+    def stats(self) -> Dict:
+        return {
+            "in_flight": len(self._flights),
+            "chats_active": len(self._per_chat),
+            "executed": self.executed,
+            "coalesced": self.coalesced,
+            "rejected": self.rejected,
+        }
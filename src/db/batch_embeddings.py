@@ -0,0 +1,466 @@
+"""
+src/db/batch_embeddings.py
+Pipeline de embeddings con la Batch API de OpenAI (mitad de costo, sin límites por request).
+
+Etapas (el estado queda en <workdir>/manifest.json, cada una se puede relanzar):
+    build   recorre chunks sin embedding y escribe shards JSONL con tope de líneas y
+            de bytes; en la misma pasada valida cada línea (custom_id único, input no
+            vacío, truncado al máximo de tokens, tamaño de línea). Junto a cada shard,
+            <shard>.hashes.json guarda el content_hash del texto enviado
+    submit  sube cada shard (purpose=batch) y crea su batch en /v1/embeddings
+    poll    consulta los batches hasta que todos terminen
+    ingest  descarga la salida de cada batch terminado (también la parcial de los
+            expirados o cancelados) y la escribe en embedding_openai por lotes (RPC
+            set_chunk_embeddings, con hash y modelo); las líneas sin embedding
+            (request fallido, batch failed/expired/cancelled) van a un shard de
+            reintento, hasta MAX_ATTEMPTS
+    run     todas las etapas en orden, repitiendo submit/poll/ingest mientras queden
+            shards de reintento
+
+Con OPENAI_BASE_URL apuntando a un servidor falso se prueba de punta a punta sin
+costo (ver src/scripts/batch_smoke.py).
+
+Uso:
+    python -m src.db.batch_embeddings build|submit|poll|ingest|run|status [workdir]
+"""
+
+import asyncio
+import json
+import logging
+import os
+import sys
+import time
+from typing import AsyncIterator, Awaitable, Callable, Dict, List, Optional, Set
+
+from src.db.content_hash import content_hash
+from src.db.embedding_backfill import MAX_INPUT_TOKENS, TokenCounter, write_embeddings
+
+logger = logging.getLogger(__name__)
+
+ENDPOINT = "/v1/embeddings"
+MAX_LINES = 50_000           # requests por batch (límite de la API)
+MAX_BYTES = 190 * 2**20      # el archivo de entrada admite hasta 200 MB
+TERMINAL = {"completed", "failed", "expired", "cancelled"}
+MAX_ATTEMPTS = 3             # envíos por línea (shard original + reintentos)
+
+WriteFn = Callable[[List[int], List[List[float]], Optional[List[str]]], Awaitable[None]]
+
+
+def custom_id_for(chunk_id: int) -> str:
+    return f"chunk-{chunk_id}"
+
+
+def chunk_id_from(custom_id: str) -> int:
+    return int(custom_id.rsplit("-", 1)[1])
+
+
+class BatchPipeline:
+    def __init__(
+        self,
+        openai_client,
+        workdir: str = "batch_jobs/embeddings",
+        model: str = "text-embedding-3-small",
+        supabase=None,
+        column: str = "embedding_openai",
+        max_lines: int = MAX_LINES,
+        max_bytes: int = MAX_BYTES,
+    ):
+        self.openai = openai_client
+        self.workdir = workdir
+        self.model = model
+        self.supabase = supabase
+        self.column = column
+        self.max_lines = max_lines
+        self.max_bytes = max_bytes
+        self.tokens = TokenCounter(model)
+
+        os.makedirs(workdir, exist_ok=True)
+        self.manifest_path = os.path.join(workdir, "manifest.json")
+        self.manifest: Dict = {"model": model, "shards": []}
+        if os.path.exists(self.manifest_path):
+            with open(self.manifest_path, encoding="utf-8") as f:
+                self.manifest = json.load(f)
+
+    def save(self) -> None:
+        tmp = f"{self.manifest_path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.manifest, f, indent=2, ensure_ascii=False)
+        os.replace(tmp, self.manifest_path)
+
+    @property
+    def shards(self) -> List[Dict]:
+        return self.manifest["shards"]
+
+    def _hashes_path(self, shard: Dict) -> str:
+        return os.path.join(self.workdir, shard["file"].replace(".jsonl", ".hashes.json"))
+
+    def _load_hashes(self, shard: Dict) -> Optional[Dict[str, str]]:
+        """custom_id -> content_hash del shard (None en shards anteriores al archivo de hashes)."""
+        path = self._hashes_path(shard)
+        if not os.path.exists(path):
+            return None
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+
+    def _save_hashes(self, shard: Dict, hashes: Dict[str, str]) -> None:
+        with open(self._hashes_path(shard), "w", encoding="utf-8") as f:
+            json.dump(hashes, f)
+
+    # ------------------------------------------------------------ build
+
+    async def iter_chunks(self, page_size: int = 1000) -> AsyncIterator[Dict]:
+        """Chunks sin embedding en orden de id, desde el último id ya incluido en un shard."""
+        cursor = max((s["last_id"] for s in self.shards), default=0)
+        while True:
+            res = await (
+                self.supabase.table("chunks")
+                .select("id,texto,content_hash")
+                .gt("id", cursor)
+                .is_(self.column, "null")
+                .order("id")
+                .limit(page_size)
+                .execute()
+            )
+            rows = res.data or []
+            for row in rows:
+                yield row
+            if len(rows) < page_size:
+                return
+            cursor = rows[-1]["id"]
+
+    async def build(self, rows: Optional[AsyncIterator[Dict]] = None) -> List[Dict]:
+        """Escribe shards nuevos; devuelve solo los creados en esta llamada."""
+        rows = rows if rows is not None else self.iter_chunks()
+        created: List[Dict] = []
+        seen = set()
+        skipped: Dict[str, int] = {}
+        out = None
+        shard: Dict = {}
+        hashes: Dict[str, str] = {}
+
+        def close_shard():
+            nonlocal out
+            if out is not None:
+                out.close()
+                out = None
+                self._save_hashes(shard, hashes)
+                self.shards.append(shard)
+                created.append(shard)
+                self.save()
+                logger.info(
+                    f"📝 {shard['file']}: {shard['lines']} líneas, {shard['bytes'] / 2**20:.1f} MB "
+                    f"(ids {shard['first_id']}-{shard['last_id']})"
+                )
+
+        async for row in rows:
+            chunk_id = int(row["id"])
+            texto = (row.get("texto") or "").strip()
+
+            # Validación en la misma pasada
+            problem = None
+            if not texto:
+                problem = "empty_input"
+            elif chunk_id in seen:
+                problem = "duplicate_custom_id"
+            if problem:
+                skipped[problem] = skipped.get(problem, 0) + 1
+                continue
+            seen.add(chunk_id)
+
+            truncated = self.tokens.truncate(texto, MAX_INPUT_TOKENS)
+            line = json.dumps(
+                {
+                    "custom_id": custom_id_for(chunk_id),
+                    "method": "POST",
+                    "url": ENDPOINT,
+                    "body": {"model": self.model, "input": truncated, "encoding_format": "float"},
+                },
+                ensure_ascii=False,
+            ) + "\n"
+            size = len(line.encode("utf-8"))
+            if size > self.max_bytes:
+                raise ValueError(f"La línea del chunk {chunk_id} supera el tope de bytes del shard")
+
+            if out is not None and (shard["lines"] >= self.max_lines or shard["bytes"] + size > self.max_bytes):
+                close_shard()
+            if out is None:
+                name = f"shard_{len(self.shards):04d}.jsonl"
+                shard = {
+                    "file": name,
+                    "lines": 0,
+                    "bytes": 0,
+                    "first_id": chunk_id,
+                    "last_id": chunk_id,
+                    "status": "built",
+                    "validation": {"truncated": 0},
+                }
+                out = open(os.path.join(self.workdir, name), "w", encoding="utf-8")
+                hashes = {}
+
+            out.write(line)
+            hashes[custom_id_for(chunk_id)] = row.get("content_hash") or content_hash(row.get("texto"))
+            shard["lines"] += 1
+            shard["bytes"] += size
+            shard["last_id"] = chunk_id
+            if truncated != texto:
+                shard["validation"]["truncated"] += 1
+
+        close_shard()
+        if skipped:
+            logger.warning(f"⚠️ Filas omitidas en la validación: {skipped}")
+            totals = self.manifest.setdefault("skipped", {})
+            for problem, n in skipped.items():
+                totals[problem] = totals.get(problem, 0) + n
+            self.save()
+        return created
+
+    # ----------------------------------------------------------- submit
+
+    async def submit(self) -> int:
+        submitted = 0
+        for shard in self.shards:
+            if shard.get("batch_id"):
+                continue
+            if not shard.get("file_id"):
+                with open(os.path.join(self.workdir, shard["file"]), "rb") as f:
+                    uploaded = await self.openai.files.create(file=f, purpose="batch")
+                shard["file_id"] = uploaded.id
+                self.save()
+            batch = await self.openai.batches.create(
+                input_file_id=shard["file_id"],
+                endpoint=ENDPOINT,
+                completion_window="24h",
+                metadata={"shard": shard["file"]},
+            )
+            shard["batch_id"] = batch.id
+            shard["status"] = batch.status
+            self.save()
+            submitted += 1
+            logger.info(f"🚀 {shard['file']} -> batch {batch.id}")
+        return submitted
+
+    # ------------------------------------------------------------- poll
+
+    async def refresh(self) -> Dict[str, int]:
+        counts: Dict[str, int] = {}
+        for shard in self.shards:
+            if shard.get("batch_id") and shard["status"] not in TERMINAL:
+                batch = await self.openai.batches.retrieve(shard["batch_id"])
+                shard["status"] = batch.status
+                shard["output_file_id"] = batch.output_file_id
+                shard["error_file_id"] = batch.error_file_id
+                if batch.request_counts is not None:
+                    shard["request_counts"] = {
+                        "completed": batch.request_counts.completed,
+                        "failed": batch.request_counts.failed,
+                        "total": batch.request_counts.total,
+                    }
+            counts[shard["status"]] = counts.get(shard["status"], 0) + 1
+        self.save()
+        return counts
+
+    async def poll(self, interval: float = 60.0, once: bool = False) -> Dict[str, int]:
+        while True:
+            counts = await self.refresh()
+            logger.info(f"⏱️ Estado de batches: {counts}")
+            pending = [s for s in self.shards if s.get("batch_id") and s["status"] not in TERMINAL]
+            if once or not pending:
+                return counts
+            await asyncio.sleep(interval)
+
+    # ----------------------------------------------------------- retry
+
+    def _custom_ids(self, shard: Dict) -> Set[str]:
+        with open(os.path.join(self.workdir, shard["file"]), encoding="utf-8") as f:
+            return {json.loads(line)["custom_id"] for line in f if line.strip()}
+
+    def _retry_shard(self, shard: Dict, missing: Set[str]) -> Optional[Dict]:
+        """Shard nuevo con las líneas de shard que quedaron sin embedding (mismo request)."""
+        attempt = shard.get("attempt", 1) + 1
+        if attempt > MAX_ATTEMPTS:
+            logger.error(f"❌ {shard['file']}: {len(missing)} chunks sin embedding tras {MAX_ATTEMPTS} intentos")
+            return None
+        retry = {
+            "file": f"shard_{len(self.shards):04d}.jsonl",
+            "lines": 0,
+            "bytes": 0,
+            "first_id": None,
+            "last_id": None,
+            "status": "built",
+            "validation": {"truncated": 0},
+            "attempt": attempt,
+            "retry_of": shard["file"],
+        }
+        ids = []
+        hashes = self._load_hashes(shard)
+        with open(os.path.join(self.workdir, shard["file"]), encoding="utf-8") as src, open(
+            os.path.join(self.workdir, retry["file"]), "w", encoding="utf-8"
+        ) as out:
+            for line in src:
+                if not line.strip():
+                    continue
+                custom_id = json.loads(line)["custom_id"]
+                if custom_id not in missing:
+                    continue
+                out.write(line)
+                retry["lines"] += 1
+                retry["bytes"] += len(line.encode("utf-8"))
+                ids.append(chunk_id_from(custom_id))
+        # first_id/last_id no superan los del shard original: el cursor de iter_chunks no cambia
+        retry["first_id"], retry["last_id"] = min(ids), max(ids)
+        if hashes is not None:
+            self._save_hashes(retry, {k: hashes[k] for k in missing if k in hashes})
+        self.shards.append(retry)
+        logger.info(f"🔁 {retry['file']}: {retry['lines']} líneas de {shard['file']} (intento {attempt})")
+        return retry
+
+    # ----------------------------------------------------------- ingest
+
+    async def _write(self, ids: List[int], vectors: List[List[float]], hashes: Optional[List[str]] = None) -> None:
+        # Hash y modelo: sin ellos --incremental de embedding_jobs volvería a embeber estas filas
+        model = self.manifest.get("model", self.model)
+        await write_embeddings(self.supabase, ids, vectors, self.column, hashes, model)
+
+    async def ingest(self, write: Optional[WriteFn] = None, rows_per_write: int = 500, in_flight: int = 4) -> int:
+        """
+        Escribe la salida de los batches terminados y arma shards de reintento con lo
+        que quedó sin embedding. Devuelve cuántos embeddings se escribieron.
+        """
+        write = write or self._write
+        total = 0
+
+        for shard in list(self.shards):
+            if shard["status"] not in TERMINAL or shard.get("ingested"):
+                continue
+            t0 = time.perf_counter()
+            pending: set = set()
+            ids, vectors, hashes = [], [], []
+            known = self._load_hashes(shard)
+            done_ids: Set[str] = set()
+            written = failed = 0
+
+            async def flush(ids, vectors, hashes):
+                # Como mucho in_flight escrituras en curso: acota la memoria si Supabase va lento
+                if len(pending) >= in_flight:
+                    done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                    pending.difference_update(done)
+                    for task in done:
+                        task.result()
+                pending.add(asyncio.create_task(write(ids, vectors, hashes if known is not None else None)))
+
+            try:
+                # La salida puede pesar cientos de MB: se procesa en streaming línea a línea.
+                # Un batch failed no tiene salida; uno expired o cancelled, a lo sumo parcial.
+                if shard.get("output_file_id"):
+                    async with self.openai.files.with_streaming_response.content(shard["output_file_id"]) as content:
+                        async for line in content.iter_lines():
+                            if not line.strip():
+                                continue
+                            result = json.loads(line)
+                            response = result.get("response") or {}
+                            if result.get("error") or response.get("status_code") != 200:
+                                failed += 1
+                                continue
+                            done_ids.add(result["custom_id"])
+                            ids.append(chunk_id_from(result["custom_id"]))
+                            vectors.append(response["body"]["data"][0]["embedding"])
+                            if known is not None:
+                                hashes.append(known[result["custom_id"]])
+                            written += 1
+                            if len(ids) >= rows_per_write:
+                                await flush(ids, vectors, hashes)
+                                ids, vectors, hashes = [], [], []
+                if ids:
+                    await flush(ids, vectors, hashes)
+                await asyncio.gather(*pending)
+            finally:
+                # Si una escritura o la lectura de la salida falla, no quedan escrituras huérfanas
+                leftover = [task for task in pending if not task.done()]
+                for task in leftover:
+                    task.cancel()
+                if leftover:
+                    await asyncio.gather(*leftover, return_exceptions=True)
+
+            # Requests fallidos y los que no llegaron a correr: se reenvían en un shard nuevo
+            missing = self._custom_ids(shard) - done_ids
+            retry = self._retry_shard(shard, missing) if missing else None
+            shard["ingested"] = True
+            shard["ingest"] = {
+                "written": written,
+                "failed": failed,
+                "missing": len(missing),
+                "retry": retry["file"] if retry else None,
+                "seconds": round(time.perf_counter() - t0, 2),
+            }
+            self.save()
+            total += written
+            logger.info(
+                f"📥 {shard['file']} ({shard['status']}): {written} embeddings escritos, "
+                f"{failed} fallidos, {len(missing)} sin embedding"
+            )
+        return total
+
+    # -------------------------------------------------------------- run
+
+    async def run(self, interval: float = 60.0) -> int:
+        await self.build()
+        total = 0
+        # Cada ingest puede dejar shards de reintento; MAX_ATTEMPTS acota las vueltas
+        while True:
+            await self.submit()
+            await self.poll(interval)
+            total += await self.ingest()
+            if all(s.get("ingested") for s in self.shards):
+                return total
+
+    def status(self) -> List[Dict]:
+        return [
+            {k: s.get(k) for k in ("file", "lines", "first_id", "last_id", "status", "batch_id", "ingested", "attempt")}
+            for s in self.shards
+        ]
+
+
+async def main(argv: List[str]) -> None:
+    if not argv or argv[0] not in ("build", "submit", "poll", "ingest", "run", "status"):
+        print(__doc__)
+        sys.exit(1)
+    command = argv[0]
+    workdir = argv[1] if len(argv) > 1 else "batch_jobs/embeddings"
+
+    from openai import AsyncOpenAI
+
+    from src.db.supabase_async import create_async_supabase
+
+    # AsyncOpenAI toma OPENAI_BASE_URL del entorno (servidor falso para pruebas)
+    oa = AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+    sb = create_async_supabase(os.getenv("SUPABASE_URL"), os.getenv("SUPABASE_KEY"))
+    pipeline = BatchPipeline(
+        oa,
+        workdir,
+        model=os.getenv("OPENAI_EMBEDDING_MODEL", "text-embedding-3-small"),
+        supabase=sb,
+    )
+    interval = float(os.getenv("BATCH_POLL_INTERVAL", "60"))
+    try:
+        if command == "build":
+            print(f"📝 {len(await pipeline.build())} shards nuevos")
+        elif command == "submit":
+            print(f"🚀 {await pipeline.submit()} batches enviados")
+        elif command == "poll":
+            print(f"⏱️ {await pipeline.poll(interval)}")
+        elif command == "ingest":
+            print(f"📥 {await pipeline.ingest()} embeddings escritos")
+        elif command == "run":
+            print(f"✅ {await pipeline.run(interval)} embeddings escritos")
+        for row in pipeline.status():
+            print(f"  {row}")
+    finally:
+        await sb.postgrest.session.aclose()
+
+
+if __name__ == "__main__":
+    from dotenv import load_dotenv
+
+    load_dotenv()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+    asyncio.run(main(sys.argv[1:]))
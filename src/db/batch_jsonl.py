@@ -0,0 +1,332 @@
+"""
+src/db/batch_jsonl.py
+Validador + divisor + detector de duplicados de archivos JSONL de la Batch API,
+en una sola pasada y en streaming (reemplaza a validate_batch_file.py,
+check_duplicates_c1.py y split_embeddings_batch.py de src/scripts/legacy).
+
+- Los custom_id se guardan como digest de 64 bits (blake2b) en un set de int,
+  no los strings ni un dict de listas de líneas.
+- orjson si está instalado (parseo varias veces más rápido); si no, json.
+- Con --split-dir copia las líneas válidas y no duplicadas, tal cual (sin
+  re-serializar), a shards con tope de líneas y de bytes.
+- Con --workers N (solo validar/deduplicar) el archivo se parte en N rangos de
+  bytes que se procesan en paralelo; cada worker devuelve sus digests en un array
+  numpy (8 bytes por id) y los duplicados se resuelven al final ordenándolos.
+
+Uso:
+    python -m src.db.batch_jsonl <archivo.jsonl> [--split-dir DIR] [--max-lines 50000]
+        [--max-bytes 199000000] [--model text-embedding-3-small] [--workers N]
+"""
+
+import hashlib
+import json
+import os
+import sys
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Set, Tuple
+
+import numpy as np
+
+try:
+    import orjson
+
+    loads = orjson.loads
+except ImportError:  # opcional
+    orjson = None
+    loads = json.loads
+
+MAX_LINES = 50_000
+MAX_BYTES = 199_000_000
+MAX_EXAMPLES = 5
+REQUIRED = ("custom_id", "method", "url", "body")
+
+
+def digest64(custom_id: str) -> int:
+    """Digest de 64 bits del custom_id (colisión esperada recién hacia ~4*10^9 ids)."""
+    return int.from_bytes(hashlib.blake2b(custom_id.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+def set_nbytes(values: Set[int]) -> int:
+    """Memoria aproximada de un set de int: la tabla más un int de 64 bits por elemento."""
+    return sys.getsizeof(values) + len(values) * sys.getsizeof(1 << 63)
+
+
+def check_line(obj, model: Optional[str]) -> Optional[str]:
+    """Devuelve el tipo de error de una línea ya parseada, o None si es válida."""
+    if not isinstance(obj, dict):
+        return "not_object"
+    for field in REQUIRED:
+        if field not in obj:
+            return f"missing_{field}"
+    custom_id = obj["custom_id"]
+    if not isinstance(custom_id, str):
+        return "custom_id_not_string"
+    if not custom_id:
+        return "empty_custom_id"
+    if obj["method"] != "POST":
+        return "invalid_method"
+    if obj["url"] != "/v1/embeddings":
+        return "invalid_url"
+    body = obj["body"]
+    if not isinstance(body, dict):
+        return "body_not_dict"
+    if model and body.get("model") != model:
+        return "invalid_model"
+    if not body.get("input"):
+        return "missing_input"
+    if body.get("encoding_format") != "float":
+        return "invalid_encoding_format"
+    return None
+
+
+class Report:
+    def __init__(self):
+        self.lines = 0
+        self.valid = 0
+        self.bytes = 0
+        self.errors: Counter = Counter()
+        self.examples: Dict[str, List] = {}
+        self.duplicates = 0
+        self.duplicate_examples: List[Tuple[str, int]] = []
+        self.shards: List[Tuple[str, int, int]] = []
+
+    def error(self, kind: str, line_no: int, detail=None) -> None:
+        self.errors[kind] += 1
+        examples = self.examples.setdefault(kind, [])
+        if len(examples) < MAX_EXAMPLES:
+            examples.append((line_no, detail) if detail is not None else line_no)
+
+    def print(self, elapsed: float, digests_bytes: int = 0) -> None:
+        print(f"\n📊 RESUMEN ({self.bytes / 2**20:.1f} MB en {elapsed:.1f} s, {self.bytes / 2**20 / max(elapsed, 1e-9):.0f} MB/s)")
+        print(f"  Total líneas: {self.lines}")
+        print(f"  Líneas válidas: {self.valid}")
+        print(f"  custom_id duplicados: {self.duplicates}")
+        if digests_bytes:
+            print(f"  Memoria del set de ids: {digests_bytes / 2**20:.1f} MB")
+        for cid, line_no in self.duplicate_examples:
+            print(f"    - {cid}: línea {line_no}")
+        if self.errors:
+            print("\n❌ ERRORES ENCONTRADOS:")
+            for kind, n in self.errors.most_common():
+                print(f"  {kind}: {n} ocurrencias")
+                for item in self.examples.get(kind, []):
+                    print(f"    - {item}")
+        elif not self.duplicates:
+            print("\n✅ ARCHIVO VÁLIDO - SIN ERRORES")
+        for path, lines, size in self.shards:
+            print(f"  📄 {path}: {lines} líneas, {size / 2**20:.1f} MB")
+
+
+class ShardWriter:
+    def __init__(self, directory: str, stem: str, max_lines: int, max_bytes: int):
+        os.makedirs(directory, exist_ok=True)
+        self.directory, self.stem = directory, stem
+        self.max_lines, self.max_bytes = max_lines, max_bytes
+        self.done: List[Tuple[str, int, int]] = []
+        self._f = None
+
+    def write(self, raw: bytes) -> None:
+        if not raw.endswith(b"\n"):
+            raw += b"\n"
+        if self._f is not None and (self._lines >= self.max_lines or self._bytes + len(raw) > self.max_bytes):
+            self.close()
+        if self._f is None:
+            self._path = os.path.join(self.directory, f"{self.stem}_{len(self.done) + 1:03d}.jsonl")
+            self._f = open(self._path, "wb")
+            self._lines = self._bytes = 0
+        self._f.write(raw)
+        self._lines += 1
+        self._bytes += len(raw)
+
+    def close(self) -> None:
+        if self._f is not None:
+            self._f.close()
+            self.done.append((self._path, self._lines, self._bytes))
+            self._f = None
+
+
+def scan(
+    path: str,
+    model: Optional[str] = None,
+    split_dir: Optional[str] = None,
+    max_lines: int = MAX_LINES,
+    max_bytes: int = MAX_BYTES,
+) -> Tuple[Report, Set[int]]:
+    """Una pasada secuencial: valida, detecta duplicados y (opcionalmente) divide."""
+    report = Report()
+    seen: Set[int] = set()
+    stem = os.path.splitext(os.path.basename(path))[0]
+    writer = ShardWriter(split_dir, stem, max_lines, max_bytes) if split_dir else None
+
+    with open(path, "rb") as f:
+        for line_no, raw in enumerate(f, start=1):
+            report.bytes += len(raw)
+            if not raw.strip():
+                continue
+            report.lines += 1
+            try:
+                obj = loads(raw)
+            except ValueError as e:
+                report.error("json_invalid", line_no, str(e)[:80])
+                continue
+            kind = check_line(obj, model)
+            if kind:
+                report.error(kind, line_no)
+                continue
+            report.valid += 1
+            digest = digest64(obj["custom_id"])
+            if digest in seen:
+                report.duplicates += 1
+                if len(report.duplicate_examples) < 10:
+                    report.duplicate_examples.append((obj["custom_id"], line_no))
+                continue
+            seen.add(digest)
+            if writer is not None:
+                writer.write(raw)
+
+    if writer is not None:
+        writer.close()
+        report.shards = writer.done
+    return report, seen
+
+
+# ------------------------------------------------------ paralelo por rangos
+
+def _scan_range(path: str, start: int, end: int, model: Optional[str]) -> Dict:
+    """Procesa las líneas que empiezan en [start, end). Números de línea locales al rango."""
+    errors: Counter = Counter()
+    examples: Dict[str, List] = {}
+    digests: List[int] = []
+    line_nos: List[int] = []
+    offsets: List[int] = []
+    lines = valid = 0
+
+    with open(path, "rb") as f:
+        if start:
+            f.seek(start - 1)
+            f.readline()  # termina la línea que empezó en el rango anterior
+        local = 0
+        while f.tell() < end:
+            pos = f.tell()
+            raw = f.readline()
+            if not raw:
+                break
+            local += 1
+            if not raw.strip():
+                continue
+            lines += 1
+            try:
+                obj = loads(raw)
+            except ValueError as e:
+                kind, detail = "json_invalid", str(e)[:80]
+            else:
+                kind, detail = check_line(obj, model), None
+            if kind:
+                errors[kind] += 1
+                bucket = examples.setdefault(kind, [])
+                if len(bucket) < MAX_EXAMPLES:
+                    bucket.append((local, detail))
+                continue
+            valid += 1
+            digests.append(digest64(obj["custom_id"]))
+            line_nos.append(local)
+            offsets.append(pos)
+
+    return {
+        "local_lines": local,
+        "lines": lines,
+        "valid": valid,
+        "errors": errors,
+        "examples": examples,
+        "digests": np.asarray(digests, dtype=np.uint64),
+        "line_nos": np.asarray(line_nos, dtype=np.int64),
+        "offsets": np.asarray(offsets, dtype=np.int64),
+    }
+
+
+def scan_parallel(path: str, workers: int, model: Optional[str] = None) -> Report:
+    size = os.path.getsize(path)
+    step = max(1, size // workers)
+    bounds = [min(i * step, size) for i in range(workers)] + [size]
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        parts = list(pool.map(_scan_range, [path] * workers, bounds[:-1], bounds[1:], [model] * workers))
+
+    report = Report()
+    report.bytes = size
+    offset = 0
+    all_digests, all_lines, all_offsets = [], [], []
+    for part in parts:
+        report.lines += part["lines"]
+        report.valid += part["valid"]
+        report.errors.update(part["errors"])
+        for kind, items in part["examples"].items():
+            bucket = report.examples.setdefault(kind, [])
+            for local, detail in items:
+                if len(bucket) < MAX_EXAMPLES:
+                    bucket.append((offset + local, detail) if detail is not None else offset + local)
+        all_digests.append(part["digests"])
+        all_lines.append(part["line_nos"] + offset)
+        all_offsets.append(part["offsets"])
+        offset += part["local_lines"]
+
+    digests = np.concatenate(all_digests)
+    line_nos = np.concatenate(all_lines)
+    offsets = np.concatenate(all_offsets)
+    # Duplicado = mismo digest que la entrada anterior tras ordenar (estable: la primera aparición queda primera)
+    order = np.argsort(digests, kind="stable")
+    sorted_digests = digests[order]
+    dup = np.flatnonzero(sorted_digests[1:] == sorted_digests[:-1]) + 1
+    report.duplicates = len(dup)
+    # Solo se vuelve a leer el custom_id de los ejemplos (por offset), en orden de archivo
+    examples = sorted(order[dup], key=lambda k: line_nos[k])[:10]
+    with open(path, "rb") as f:
+        for k in examples:
+            f.seek(int(offsets[k]))
+            report.duplicate_examples.append((loads(f.readline())["custom_id"], int(line_nos[k])))
+    return report
+
+
+def main(argv: List[str]) -> int:
+    args = list(argv)
+
+    def option(name: str, default):
+        if name in args:
+            i = args.index(name)
+            value = args[i + 1]
+            del args[i:i + 2]
+            return value
+        return default
+
+    split_dir = option("--split-dir", None)
+    max_lines = int(option("--max-lines", MAX_LINES))
+    max_bytes = int(option("--max-bytes", MAX_BYTES))
+    model = option("--model", None)
+    workers = int(option("--workers", "1"))
+    if len(args) != 1:
+        print(__doc__)
+        return 2
+    path = args[0]
+
+    print(f"\n🔍 VALIDACIÓN EN UNA PASADA: {path} (parser: {'orjson' if orjson else 'json'})")
+    print("=" * 80)
+    t0 = time.perf_counter()
+    if workers > 1:
+        if split_dir:
+            print("⚠️ --split-dir requiere una pasada secuencial; se ignora --workers")
+            report, seen = scan(path, model, split_dir, max_lines, max_bytes)
+            report.print(time.perf_counter() - t0, set_nbytes(seen))
+        else:
+            report = scan_parallel(path, workers, model)
+            report.print(time.perf_counter() - t0)
+    else:
+        report, seen = scan(path, model, split_dir, max_lines, max_bytes)
+        report.print(time.perf_counter() - t0, set_nbytes(seen))
+    print("\n" + "=" * 80)
+    return 0 if not report.errors and not report.duplicates else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,53 @@
+"""
+src/db/content_hash.py
+Hash de contenido de los chunks y caché de vectores por hash, para re-embeddings
+incrementales (sql/chunk_content_hash.sql): solo se embebe lo que cambió y los
+textos idénticos (artículos repetidos entre resoluciones) se embeben una vez.
+También los ids estables de los puntos de Qdrant.
+"""
+
+import hashlib
+from collections import OrderedDict
+from typing import Optional
+
+import numpy as np
+
+
+def content_hash(text: Optional[str]) -> str:
+    """sha256 hex del texto; igual al que calcula el trigger chunks_set_content_hash."""
+    return hashlib.sha256((text or "").encode("utf-8")).hexdigest()
+
+
+def stable_point_id(document_id, chunk_index: int) -> int:
+    """
+    Id de punto de Qdrant para (document_id, chunk_index): blake2b de 63 bits, igual
+    en todos los procesos (hash() de str cambia por proceso) y entero positivo que
+    cabe en int64 (snapshots). Colisión esperada recién hacia ~3*10^9 puntos.
+    """
+    key = f"{document_id}-{chunk_index}".encode("utf-8")
+    return int.from_bytes(hashlib.blake2b(key, digest_size=8).digest(), "big") >> 1
+
+
+class VectorCache:
+    """LRU acotado content_hash -> vector float32."""
+
+    def __init__(self, max_items: int = 2000):
+        self.max_items = max_items
+        self._items: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self.hits = 0
+
+    def get(self, key: str) -> Optional[np.ndarray]:
+        vector = self._items.get(key)
+        if vector is not None:
+            self._items.move_to_end(key)
+            self.hits += 1
+        return vector
+
+    def put(self, key: str, vector) -> None:
+        self._items[key] = np.asarray(vector, dtype=np.float32)
+        self._items.move_to_end(key)
+        while len(self._items) > self.max_items:
+            self._items.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._items)
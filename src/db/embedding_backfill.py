@@ -0,0 +1,432 @@
+"""
+src/db/embedding_backfill.py
+Backfill asíncrono de chunks.embedding_openai con la API de embeddings de OpenAI.
+
+- Lectura por keyset (id > cursor, columna nula) en páginas.
+- Varios textos por request de embeddings, empaquetados hasta un presupuesto de tokens.
+- Ventana de concurrencia adaptativa (AIMD): sube de a poco con cada éxito y se
+  divide a la mitad con cada 429, respetando Retry-After.
+- Escritura masiva: un round trip por request vía RPC set_chunk_embeddings
+  (sql/set_chunk_embeddings.sql).
+- Checkpoint {"last_id", "updated"} como el script original: last_id solo avanza
+  hasta el final del tramo contiguo de lotes ya escritos (los lotes terminan en
+  desorden) y se detiene en el primer lote fallido, así que al reanudar nunca se
+  salta un chunk pendiente.
+- Lectura de páginas con 3 intentos (5 s entre intentos) como el script original.
+- Cada escritura guarda el content_hash del texto leído y el modelo (requiere
+  sql/chunk_content_hash.sql).
+- incremental=True: solo chunks sin embedding, con texto cambiado o embebidos con
+  otro modelo; los textos idénticos se embeben una vez y se reutilizan vectores ya
+  guardados con el mismo content_hash. El filtro ya excluye lo procesado, así que
+  cada corrida recorre desde id 0 (un chunk viejo con texto nuevo no se saltea) y
+  el estado va a <state>_incremental.json, sin tocar el checkpoint del backfill.
+"""
+
+import asyncio
+import json
+import logging
+import random
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Deque, Dict, List, Optional
+
+import openai
+
+from src.db.content_hash import VectorCache, content_hash
+from src.db.local_index import parse_vector
+
+logger = logging.getLogger(__name__)
+
+try:
+    import tiktoken
+except ImportError:  # opcional: sin tiktoken se estima por caracteres
+    tiktoken = None
+
+MAX_INPUT_TOKENS = 8191
+MAX_INPUTS_PER_REQUEST = 2048
+REUSE_CACHE_SIZE = 2000
+# Columnas que aceptan las RPC de sql/set_chunk_embeddings.sql y sql/chunk_content_hash.sql
+EMBEDDING_COLUMNS = ("embedding_openai", "embedding_gemini", "embedding_local")
+PAGE_ATTEMPTS = 3
+PAGE_RETRY_DELAY = 5.0
+
+
+class TokenCounter:
+    """Cuenta tokens con tiktoken si está instalado; si no, estima ~3 caracteres por token."""
+
+    def __init__(self, model: str):
+        self._enc = None
+        if tiktoken is not None:
+            try:
+                self._enc = tiktoken.encoding_for_model(model)
+            except KeyError:
+                self._enc = tiktoken.get_encoding("cl100k_base")
+
+    def count(self, text: str) -> int:
+        if self._enc is not None:
+            return len(self._enc.encode(text))
+        return len(text) // 3 + 1
+
+    def truncate(self, text: str, max_tokens: int = MAX_INPUT_TOKENS) -> str:
+        if self._enc is not None:
+            tokens = self._enc.encode(text)
+            return text if len(tokens) <= max_tokens else self._enc.decode(tokens[:max_tokens])
+        return text[: max_tokens * 3]
+
+
+class AdaptiveLimiter:
+    """
+    Ventana de concurrencia AIMD: +1/limit por éxito (≈ +1 por ventana completa),
+    /2 por cada 429 y pausa global hasta que venza el Retry-After.
+    """
+
+    def __init__(self, initial: int = 4, minimum: int = 1, maximum: int = 32):
+        self.limit = float(initial)
+        self.minimum = minimum
+        self.maximum = maximum
+        self.in_flight = 0
+        self.throttled = 0
+        self._resume_at = 0.0
+        self._changed = asyncio.Condition()
+
+    async def acquire(self) -> None:
+        async with self._changed:
+            while self.in_flight >= int(self.limit):
+                await self._changed.wait()
+            self.in_flight += 1
+        delay = self._resume_at - time.monotonic()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    async def release(self) -> None:
+        async with self._changed:
+            self.in_flight -= 1
+            self._changed.notify_all()
+
+    def on_success(self) -> None:
+        self.limit = min(self.maximum, self.limit + 1.0 / self.limit)
+
+    def on_throttle(self, retry_after: float) -> None:
+        self.throttled += 1
+        self.limit = max(self.minimum, self.limit / 2)
+        self._resume_at = max(self._resume_at, time.monotonic() + retry_after)
+
+    async def wait_resume(self) -> None:
+        delay = self._resume_at - time.monotonic()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+def retry_after_seconds(error: Exception, default: float) -> float:
+    headers = getattr(getattr(error, "response", None), "headers", None) or {}
+    try:
+        if headers.get("retry-after-ms"):
+            return float(headers["retry-after-ms"]) / 1000
+        if headers.get("retry-after"):
+            return float(headers["retry-after"])
+    except ValueError:
+        pass
+    return default
+
+
+async def write_embeddings(
+    supabase,
+    ids: List[int],
+    vectors: List[List[float]],
+    column: str,
+    hashes: Optional[List[str]] = None,
+    model: Optional[str] = None,
+) -> None:
+    """Escribe muchos embeddings en chunks en un round trip (RPC de sql/set_chunk_embeddings.sql)."""
+    rows = [{"id": i, "embedding": v} for i, v in zip(ids, vectors)]
+    if hashes:
+        for row, h in zip(rows, hashes):
+            row["hash"] = h
+    params = {"rows": rows, "target": column}
+    if model:
+        params["model"] = model
+    await supabase.rpc("set_chunk_embeddings", params).execute()
+
+
+@dataclass
+class _Batch:
+    """Un request de embeddings: filas a escribir y el id más alto que cubre."""
+
+    max_id: int
+    ids: List[int] = field(default_factory=list)
+    texts: List[str] = field(default_factory=list)
+    hashes: List[str] = field(default_factory=list)
+    tokens: int = 0
+    done: bool = False
+    failed: bool = False
+
+
+class BackfillEngine:
+    def __init__(
+        self,
+        supabase,
+        openai_client,
+        model: str = "text-embedding-3-small",
+        column: str = "embedding_openai",
+        state_path: str = "backfill_state.json",
+        page_size: int = 500,
+        token_budget: int = 100_000,
+        concurrency: int = 4,
+        max_concurrency: int = 32,
+        max_retries: int = 6,
+        incremental: bool = False,
+    ):
+        if column not in EMBEDDING_COLUMNS:
+            raise ValueError(f"Columna de embedding no permitida: {column} ({', '.join(EMBEDDING_COLUMNS)})")
+        self.supabase = supabase
+        self.openai = openai_client
+        self.model = model
+        self.column = column
+        self.state_path = Path(state_path)
+        if incremental:
+            self.state_path = self.state_path.with_name(f"{self.state_path.stem}_incremental{self.state_path.suffix}")
+        self.page_size = page_size
+        self.token_budget = token_budget
+        self.max_retries = max_retries
+        self.incremental = incremental
+        self.reuse = VectorCache(REUSE_CACHE_SIZE)
+
+        self.tokens = TokenCounter(model)
+        self.max_inputs = MAX_INPUTS_PER_REQUEST
+        self.max_input_tokens = MAX_INPUT_TOKENS
+        self.limiter = AdaptiveLimiter(initial=concurrency, maximum=max_concurrency)
+
+        state = self.load_state()
+        # En modo incremental last_id solo informa hasta dónde llegó la última corrida
+        self.last_id = 0 if incremental else int(state.get("last_id", 0))
+        self.updated = int(state.get("updated", 0))
+        self.failed = 0
+        self.requests = 0
+        self.tokens_sent = 0
+        self.reused = 0
+
+        self._pending: Deque[_Batch] = deque()
+        self._stalled = False
+        self._started = 0.0
+        self._last_report = 0.0
+
+    # ------------------------------------------------------------- estado
+
+    def load_state(self) -> Dict:
+        if self.state_path.exists():
+            return json.loads(self.state_path.read_text(encoding="utf-8"))
+        return {"last_id": 0, "updated": 0}
+
+    def save_state(self) -> None:
+        tmp = self.state_path.with_suffix(".tmp")
+        tmp.write_text(
+            json.dumps({"last_id": self.last_id, "updated": self.updated}, ensure_ascii=False, indent=2),
+            encoding="utf-8",
+        )
+        tmp.replace(self.state_path)
+
+    def _advance_checkpoint(self) -> None:
+        """Avanza last_id por los lotes terminados del frente; desde el primer fallido ya no se mueve."""
+        moved = False
+        while self._pending and self._pending[0].done:
+            batch = self._pending.popleft()
+            if batch.failed and not self._stalled:
+                self._stalled = True
+                logger.warning(f"⚠️ Checkpoint detenido en last_id={self.last_id} (lote fallido hasta id {batch.max_id})")
+            if not self._stalled:
+                self.last_id = batch.max_id
+                moved = True
+        if moved:
+            self.save_state()
+
+    # ------------------------------------------------------------ lectura
+
+    @property
+    def _columns(self) -> str:
+        return "id,texto,content_hash"
+
+    def _pending_filter(self, query):
+        """Filtro de chunks por procesar: sin embedding o, en modo incremental, desactualizados."""
+        if not self.incremental:
+            return query.is_(self.column, "null")
+        col = self.column
+        return query.or_(f'{col}_stale.is.true,{col}_model.is.null,{col}_model.neq."{self.model}"')
+
+    async def _read_page(self, cursor: int, hi: Optional[int] = None) -> List[Dict]:
+        """Página de chunks pendientes con id > cursor (y < hi), con reintentos."""
+        for attempt in range(1, PAGE_ATTEMPTS + 1):
+            query = self._pending_filter(self.supabase.table("chunks").select(self._columns).gt("id", cursor))
+            if hi is not None:
+                query = query.lt("id", hi)
+            try:
+                res = await query.order("id").limit(self.page_size).execute()
+                return res.data or []
+            except Exception as e:
+                logger.warning(f"⚠️ Error leyendo chunks desde id {cursor} (intento {attempt}/{PAGE_ATTEMPTS}): {e}")
+                if attempt == PAGE_ATTEMPTS:
+                    raise
+                await asyncio.sleep(PAGE_RETRY_DELAY)
+
+    async def _pages(self):
+        cursor = self.last_id
+        while True:
+            rows = await self._read_page(cursor)
+            if not rows:
+                return
+            yield rows
+            cursor = rows[-1]["id"]
+            if len(rows) < self.page_size:
+                return
+
+    def _pack(self, rows: List[Dict]) -> List[_Batch]:
+        """Agrupa filas consecutivas en requests de hasta token_budget tokens."""
+        batches: List[_Batch] = []
+        current = None
+        for row in rows:
+            if current is None:
+                current = _Batch(max_id=row["id"])
+            texto = (row.get("texto") or "").strip()
+            if texto:
+                texto = self.tokens.truncate(texto, self.max_input_tokens)
+                n = self.tokens.count(texto)
+                if current.texts and (
+                    current.tokens + n > self.token_budget or len(current.texts) >= self.max_inputs
+                ):
+                    batches.append(current)
+                    current = _Batch(max_id=row["id"])
+                current.ids.append(row["id"])
+                current.texts.append(texto)
+                current.hashes.append(row.get("content_hash") or content_hash(row.get("texto")))
+                current.tokens += n
+            # Las filas vacías no se embeben, pero el checkpoint sí las cubre
+            current.max_id = row["id"]
+        if current is not None:
+            batches.append(current)
+        return batches
+
+    # -------------------------------------------------------- procesamiento
+
+    async def _embed(self, batch: _Batch) -> List[List[float]]:
+        delay = 1.0
+        for attempt in range(self.max_retries + 1):
+            await self.limiter.wait_resume()
+            try:
+                resp = await self.openai.embeddings.create(model=self.model, input=batch.texts)
+                self.limiter.on_success()
+                self.requests += 1
+                self.tokens_sent += batch.tokens
+                return [d.embedding for d in sorted(resp.data, key=lambda d: d.index)]
+            except openai.RateLimitError as e:
+                wait = retry_after_seconds(e, delay)
+                self.limiter.on_throttle(wait)
+                logger.warning(
+                    f"⏳ 429 de OpenAI: ventana -> {int(self.limiter.limit)}, espera {wait:.1f}s"
+                )
+            except (openai.APIConnectionError, openai.APITimeoutError, openai.InternalServerError) as e:
+                if attempt == self.max_retries:
+                    raise
+                logger.warning(f"⚠️ Error transitorio de OpenAI ({e.__class__.__name__}), reintento en {delay:.1f}s")
+                await asyncio.sleep(delay)
+            delay = min(delay * 2, 60.0) * (0.8 + random.random() * 0.4)
+        raise RuntimeError(f"Demasiados 429 seguidos para el lote que termina en id {batch.max_id}")
+
+    async def _donors(self, hashes: List[str]) -> Dict[str, List[float]]:
+        """Vectores ya guardados (mismo modelo, texto vigente) para esos hashes."""
+        res = await self.supabase.rpc(
+            "chunk_embeddings_by_hash", {"hashes": hashes, "target": self.column, "model": self.model}
+        ).execute()
+        return {r["content_hash"]: parse_vector(r["embedding"]).tolist() for r in res.data or []}
+
+    async def _vectors_for(self, batch: _Batch) -> List[List[float]]:
+        """Embeddings del lote; en modo incremental solo se piden los textos que no se pueden reutilizar."""
+        if not self.incremental:
+            return await self._embed(batch)
+
+        found: Dict[str, List[float]] = {}
+        for h in set(batch.hashes):
+            cached = self.reuse.get(h)
+            if cached is not None:
+                found[h] = cached.tolist()
+        missing = [h for h in set(batch.hashes) if h not in found]
+        if missing:
+            found.update(await self._donors(missing))
+
+        todo = _Batch(max_id=batch.max_id)
+        for texto, h in zip(batch.texts, batch.hashes):
+            if h not in found and h not in todo.hashes:
+                todo.texts.append(texto)
+                todo.hashes.append(h)
+        if todo.texts:
+            todo.tokens = batch.tokens * len(todo.texts) // len(batch.texts)
+            for h, vector in zip(todo.hashes, await self._embed(todo)):
+                found[h] = vector
+                self.reuse.put(h, vector)
+        self.reused += len(batch.texts) - len(todo.texts)
+        return [found[h] for h in batch.hashes]
+
+    async def _write(self, batch: _Batch, vectors: List[List[float]]) -> None:
+        # Hash y modelo siempre: sin ellos la fila queda como desactualizada para --incremental
+        await write_embeddings(self.supabase, batch.ids, vectors, self.column, batch.hashes, self.model)
+
+    async def _process(self, batch: _Batch) -> None:
+        ok = False
+        try:
+            if batch.texts:
+                vectors = await self._vectors_for(batch)
+                await self._write(batch, vectors)
+                self.updated += len(batch.ids)
+            ok = True
+        except Exception as e:
+            # Como el script original: se registra y se sigue. El checkpoint queda antes
+            # de este lote, así que la próxima corrida lo vuelve a tomar.
+            self.failed += len(batch.ids)
+            logger.error(f"❌ Lote hasta id {batch.max_id} ({len(batch.ids)} chunks): {e}")
+        finally:
+            # Un lote cancelado (CancelledError) también cuenta como no escrito
+            batch.done = True
+            batch.failed = not ok
+            self._advance_checkpoint()
+            await self.limiter.release()
+            self._report()
+
+    def _report(self, final: bool = False, every: float = 5.0) -> None:
+        now = time.perf_counter()
+        if not final and now - self._last_report < every:
+            return
+        self._last_report = now
+        elapsed = max(now - self._started, 1e-9)
+        print(
+            f"[BACKFILL] {'✅ ' if final else ''}updated: {self.updated:,} last_id: {self.last_id}"
+            f" | {self.requests / elapsed:.1f} req/s | {self.tokens_sent / elapsed:,.0f} tokens/s"
+            f" | ventana {int(self.limiter.limit)} | 429: {self.limiter.throttled} | fallidos: {self.failed}"
+            + (f" | reutilizados: {self.reused:,}" if self.incremental else "")
+        )
+
+    async def run(self) -> Dict:
+        print(f"[BACKFILL] Iniciando desde last_id={self.last_id}, updated={self.updated}")
+        self._started = self._last_report = time.perf_counter()
+        tasks = set()
+
+        try:
+            async for rows in self._pages():
+                for batch in self._pack(rows):
+                    await self.limiter.acquire()
+                    self._pending.append(batch)
+                    task = asyncio.create_task(self._process(batch))
+                    tasks.add(task)
+                    task.add_done_callback(tasks.discard)
+
+            if tasks:
+                await asyncio.gather(*tasks)
+        finally:
+            # Si la lectura falla o se interrumpe la corrida, no quedan requests huérfanos
+            leftover = list(tasks)
+            for task in leftover:
+                task.cancel()
+            if leftover:
+                await asyncio.gather(*leftover, return_exceptions=True)
+            self.save_state()
+        self._report(final=True)
+        return {"last_id": self.last_id, "updated": self.updated, "failed": self.failed, "reused": self.reused}
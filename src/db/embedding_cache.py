@@ -0,0 +1,144 @@
+"""
+src/db/embedding_cache.py
+Cache LRU + TTL de embeddings de consultas (vectores float32 compactos),
+opcionalmente respaldado en SQLite para sobrevivir reinicios del bot.
+Las escrituras a SQLite se agrupan (un commit cada FLUSH_EVERY entradas o
+FLUSH_INTERVAL segundos) para no hacer un commit síncrono por cada miss.
+"""
+
+import logging
+import re
+import sqlite3
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+_PUNCT_EDGES = "¿?¡!.,;: \"'"
+FLUSH_EVERY = 32
+FLUSH_INTERVAL = 5.0
+
+
+def normalize_query(text: str) -> str:
+    """
+    Normaliza una consulta para usarla como clave de cache:
+    Unicode NFKC, minúsculas, espacios colapsados y sin puntuación en los bordes.
+    """
+    text = unicodedata.normalize("NFKC", text or "").casefold()
+    text = re.sub(r"\s+", " ", text)
+    return text.strip(_PUNCT_EDGES)
+
+
+class EmbeddingCache:
+    """
+    Cache en memoria acotada (LRU) con expiración (TTL) por entrada.
+    Clave: (modelo de embedding, texto normalizado). Valor: np.ndarray float32.
+    """
+
+    def __init__(self, max_size: int = 1024, ttl: float = 86400.0, path: Optional[str] = None):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._data: "OrderedDict[Tuple[str, str], Tuple[float, np.ndarray]]" = OrderedDict()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+        self._db: Optional[sqlite3.Connection] = None
+        self._pending: List[Tuple[str, str, float, bytes]] = []
+        self._flushed_at = time.monotonic()
+        if path:
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings ("
+                " model TEXT NOT NULL, key TEXT NOT NULL, created REAL NOT NULL,"
+                " vec BLOB NOT NULL, PRIMARY KEY (model, key))"
+            )
+            self._db.execute("DELETE FROM embeddings WHERE created < ?", (time.time() - ttl,))
+            self._db.commit()
+            logger.info(f"💾 Cache de embeddings persistente en {path}")
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, text: str, model: str) -> Optional[np.ndarray]:
+        key = (model, normalize_query(text))
+        now = time.time()
+
+        entry = self._data.get(key)
+        if entry is not None:
+            created, vec = entry
+            if now - created <= self.ttl:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return vec
+            del self._data[key]
+            self.expirations += 1
+
+        if self._db is not None:
+            row = self._db.execute(
+                "SELECT created, vec FROM embeddings WHERE model = ? AND key = ?", key
+            ).fetchone()
+            if row is not None and now - row[0] <= self.ttl:
+                vec = np.frombuffer(row[1], dtype=np.float32)
+                self._store(key, row[0], vec)
+                self.hits += 1
+                return vec
+
+        self.misses += 1
+        return None
+
+    def put(self, text: str, model: str, embedding: Sequence[float]) -> np.ndarray:
+        key = (model, normalize_query(text))
+        vec = np.asarray(embedding, dtype=np.float32)
+        created = time.time()
+        self._store(key, created, vec)
+
+        if self._db is not None:
+            self._pending.append((key[0], key[1], created, vec.tobytes()))
+            if len(self._pending) >= FLUSH_EVERY or time.monotonic() - self._flushed_at >= FLUSH_INTERVAL:
+                self.flush()
+        return vec
+
+    def flush(self) -> None:
+        """Escribe en SQLite las entradas pendientes en una sola transacción."""
+        self._flushed_at = time.monotonic()
+        if self._db is None or not self._pending:
+            return
+        rows, self._pending = self._pending, []
+        self._db.executemany(
+            "INSERT OR REPLACE INTO embeddings (model, key, created, vec) VALUES (?, ?, ?, ?)", rows
+        )
+        self._db.commit()
+
+    def _store(self, key: Tuple[str, str], created: float, vec: np.ndarray) -> None:
+        if self.max_size <= 0:
+            return
+        self._data[key] = (created, vec)
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_size:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def stats(self) -> Dict:
+        total = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "hit_rate": round(self.hits / total, 3) if total else 0.0,
+        }
+
+    def close(self) -> None:
+        if self._db is not None:
+            self.flush()
+            self._db.close()
+            self._db = None
@@ -0,0 +1,438 @@
+"""
+src/db/embedding_jobs.py
+Motor único de (re)embeddings de chunks para cualquier proveedor: Gemini, OpenAI
+o un modelo local (SentenceTransformers). Reemplaza a los process_gemini_*.
+
+Sobre BackfillEngine (src/db/embedding_backfill.py): lectura por keyset, varios
+textos por request, ventana de concurrencia adaptativa, escritura masiva por RPC
+y checkpoint contiguo. Además:
+
+- Proveedores enchufables: embed(texts) + classify(error) para decidir si es
+  throttling (se respeta Retry-After y se achica la ventana), transitorio
+  (reintento con backoff exponencial y jitter) o definitivo.
+- Particiones disjuntas para varios workers (procesos o máquinas):
+    range  -> el rango [min_id, max_id] se parte en N tramos contiguos;
+    modulo -> bloques de --block ids repartidos en round-robin (bloque k -> worker k % N),
+              reparte mejor cuando los pendientes están concentrados.
+  Cada worker tiene su propio archivo de estado, así que se reanudan por separado.
+- Reporte en vivo: chunks/s, tokens/s y ETA sobre los pendientes de la partición.
+- --incremental: solo chunks nuevos, con texto cambiado o de otro modelo, reutilizando
+  vectores de textos idénticos (ver sql/chunk_content_hash.sql). Recorre siempre
+  desde id 0, con su propio archivo de estado (*_incremental.json).
+
+Uso:
+    python -m src.db.embedding_jobs gemini|openai|local [--column embedding_gemini|embedding_openai|embedding_local]
+        [--model NOMBRE] [--partition range|modulo] [--block 1000]
+        [--workers N | --shard I/N] [--concurrency N] [--page 500] [--incremental]
+"""
+
+import asyncio
+import logging
+import multiprocessing as mp
+import os
+import random
+import sys
+import time
+from dataclasses import dataclass
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from src.db.embedding_backfill import EMBEDDING_COLUMNS, BackfillEngine, _Batch, retry_after_seconds
+
+logger = logging.getLogger(__name__)
+
+THROTTLE = "throttle"
+TRANSIENT = "transient"
+
+DEFAULT_COLUMNS = {"gemini": "embedding_gemini", "openai": "embedding_openai", "local": "embedding_local"}
+# Modelo por defecto de cada proveedor: (variable de entorno, valor si no está)
+DEFAULT_MODELS = {
+    "gemini": ("GEMINI_EMBEDDING_MODEL", "text-embedding-004"),
+    "openai": ("OPENAI_EMBEDDING_MODEL", "text-embedding-3-small"),
+    "local": ("EMBEDDING_MODEL", "paraphrase-multilingual-MiniLM-L12-v2"),
+}
+
+
+def default_model(column: str) -> Optional[str]:
+    """Modelo con el que se llena por defecto una columna de embedding."""
+    provider = next((name for name, col in DEFAULT_COLUMNS.items() if col == column), None)
+    if provider is None:
+        return None
+    env, value = DEFAULT_MODELS[provider]
+    return os.getenv(env, value)
+
+
+# ------------------------------------------------------------- proveedores
+
+class GeminiProvider:
+    """google-genai (text-embedding-004: 768 dims, hasta 100 textos por request)."""
+
+    name = "gemini"
+    max_inputs = 100
+    max_input_tokens = 2048
+    token_budget = 100 * 2048
+
+    def __init__(self, model: str = "text-embedding-004", api_key: Optional[str] = None):
+        from google import genai
+
+        self.model = model
+        self.client = genai.Client(api_key=api_key or os.getenv("GOOGLE_API_KEY"))
+
+    async def embed(self, texts: List[str]) -> List[List[float]]:
+        resp = await self.client.aio.models.embed_content(model=self.model, contents=texts)
+        return [e.values for e in resp.embeddings]
+
+    def classify(self, error: Exception) -> Optional[str]:
+        from google.genai import errors
+
+        if isinstance(error, errors.APIError):
+            if error.code == 429:
+                return THROTTLE
+            if error.code >= 500:
+                return TRANSIENT
+            return None
+        if isinstance(error, (ConnectionError, TimeoutError, asyncio.TimeoutError)):
+            return TRANSIENT
+        return TRANSIENT if error.__class__.__module__.startswith(("httpx", "aiohttp")) else None
+
+    async def aclose(self) -> None:
+        pass
+
+
+class OpenAIProvider:
+    """API de embeddings de OpenAI (2048 textos / 8191 tokens por input)."""
+
+    name = "openai"
+    max_inputs = 2048
+    max_input_tokens = 8191
+    token_budget = 100_000
+
+    def __init__(self, model: str = "text-embedding-3-small", api_key: Optional[str] = None):
+        from openai import AsyncOpenAI
+
+        self.model = model
+        # Los 429 los maneja el motor (ventana adaptativa), no los reintentos del SDK
+        self.client = AsyncOpenAI(api_key=api_key or os.getenv("OPENAI_API_KEY"), max_retries=0)
+
+    async def embed(self, texts: List[str]) -> List[List[float]]:
+        resp = await self.client.embeddings.create(model=self.model, input=texts)
+        return [d.embedding for d in sorted(resp.data, key=lambda d: d.index)]
+
+    def classify(self, error: Exception) -> Optional[str]:
+        import openai
+
+        if isinstance(error, openai.RateLimitError):
+            return THROTTLE
+        if isinstance(error, (openai.APIConnectionError, openai.APITimeoutError, openai.InternalServerError)):
+            return TRANSIENT
+        return None
+
+    async def aclose(self) -> None:
+        await self.client.close()
+
+
+class LocalProvider:
+    """SentenceTransformers en proceso o en pool (EMBEDDING_WORKERS, src/db/embedding_service.py)."""
+
+    name = "local"
+    max_inputs = 256
+    max_input_tokens = 512
+    token_budget = 256 * 512
+
+    def __init__(self, model: str = "paraphrase-multilingual-MiniLM-L12-v2", batch_size: int = 64):
+        from src.db.embedding_service import create_embedding_service
+
+        self.model = model
+        self.service = create_embedding_service(model, batch_size=batch_size)
+
+    async def embed(self, texts: List[str]) -> List[List[float]]:
+        vectors = await asyncio.to_thread(self.service.encode, texts, True)
+        return np.asarray(vectors, dtype=np.float32).tolist()
+
+    def classify(self, error: Exception) -> Optional[str]:
+        return None
+
+    async def aclose(self) -> None:
+        self.service.close()
+
+
+def make_provider(name: str, model: Optional[str] = None):
+    if name == "gemini":
+        return GeminiProvider(model or default_model(DEFAULT_COLUMNS[name]))
+    if name == "openai":
+        return OpenAIProvider(model or default_model(DEFAULT_COLUMNS[name]))
+    if name == "local":
+        return LocalProvider(model or default_model(DEFAULT_COLUMNS[name]))
+    raise ValueError(f"Proveedor desconocido: {name} (gemini, openai o local)")
+
+
+# ------------------------------------------------------------- particiones
+
+@dataclass
+class Partition:
+    """Worker index de count. Los tramos [lo, hi) de workers distintos nunca se solapan."""
+
+    index: int = 0
+    count: int = 1
+    mode: str = "range"
+    block: int = 1000
+
+    def __post_init__(self):
+        if not 0 <= self.index < self.count:
+            raise ValueError(f"Shard fuera de rango: {self.index}/{self.count}")
+        if self.mode not in ("range", "modulo"):
+            raise ValueError(f"Partición desconocida: {self.mode} (range o modulo)")
+
+    @property
+    def label(self) -> str:
+        return f"{self.index + 1}/{self.count}"
+
+    def spans(self, id_min: int, id_max: int) -> Iterator[Tuple[int, int]]:
+        """Tramos [lo, hi) de ids de este worker dentro de [id_min, id_max]."""
+        end = id_max + 1
+        if self.mode == "range":
+            step = -(-(end - id_min) // self.count)
+            lo = id_min + self.index * step
+            hi = min(lo + step, end)
+            if lo < hi:
+                yield lo, hi
+            return
+        first = id_min // self.block
+        k = first + (self.index - first) % self.count
+        while k * self.block < end:
+            yield max(k * self.block, id_min), min((k + 1) * self.block, end)
+            k += self.count
+
+
+# ------------------------------------------------------------------ motor
+
+class EmbeddingJob(BackfillEngine):
+    def __init__(
+        self,
+        supabase,
+        provider,
+        column: str,
+        partition: Optional[Partition] = None,
+        state_path: Optional[str] = None,
+        page_size: int = 500,
+        token_budget: Optional[int] = None,
+        concurrency: int = 4,
+        max_concurrency: int = 32,
+        max_retries: int = 6,
+        incremental: bool = False,
+    ):
+        self.provider = provider
+        self.partition = partition or Partition()
+        p = self.partition
+        super().__init__(
+            supabase,
+            openai_client=None,
+            model=provider.model,
+            column=column,
+            state_path=state_path or f"embedding_job_{provider.name}_{column}_{p.mode}_{p.index + 1}de{p.count}.json",
+            page_size=page_size,
+            token_budget=token_budget or provider.token_budget,
+            concurrency=concurrency,
+            max_concurrency=max_concurrency,
+            max_retries=max_retries,
+            incremental=incremental,
+        )
+        self.max_inputs = provider.max_inputs
+        self.max_input_tokens = provider.max_input_tokens
+        self.expected = 0
+        self._updated_at_start = self.updated
+        self._id_range: Optional[Tuple[int, int]] = None
+
+    # ------------------------------------------------------------ lectura
+
+    async def _edge_id(self, desc: bool) -> Optional[int]:
+        res = await self.supabase.table("chunks").select("id").order("id", desc=desc).limit(1).execute()
+        return res.data[0]["id"] if res.data else None
+
+    async def _count_pending(self, lo: Optional[int] = None, hi: Optional[int] = None) -> int:
+        # Al reanudar, lo que está por debajo de last_id ya se recorrió
+        q = self._pending_filter(self.supabase.table("chunks").select("id", count="exact")).gt("id", self.last_id)
+        if lo is not None:
+            q = q.gte("id", lo).lt("id", hi)
+        res = await q.limit(1).execute()
+        return res.count or 0
+
+    async def prepare(self) -> None:
+        """Rango global de ids (fijo durante la corrida) y pendientes estimados de la partición."""
+        id_min, id_max = await self._edge_id(False), await self._edge_id(True)
+        if id_min is None:
+            self._id_range = (0, -1)
+            return
+        self._id_range = (id_min, id_max)
+        spans = list(self.partition.spans(id_min, id_max))
+        if self.partition.mode == "range":
+            self.expected = sum([await self._count_pending(lo, hi) for lo, hi in spans])
+        else:
+            # Un count por bloque sería caro: se estima repartiendo el total
+            self.expected = -(-await self._count_pending() // self.partition.count)
+
+    async def _pages(self):
+        id_min, id_max = self._id_range
+        for lo, hi in self.partition.spans(id_min, id_max):
+            if hi <= self.last_id + 1:
+                continue
+            cursor = max(self.last_id, lo - 1)
+            while True:
+                rows = await self._read_page(cursor, hi)
+                if rows:
+                    yield rows
+                    cursor = rows[-1]["id"]
+                if len(rows) < self.page_size:
+                    break
+
+    # -------------------------------------------------------- procesamiento
+
+    async def _embed(self, batch: _Batch) -> List[List[float]]:
+        delay = 1.0
+        for attempt in range(self.max_retries + 1):
+            await self.limiter.wait_resume()
+            try:
+                vectors = await self.provider.embed(batch.texts)
+                self.limiter.on_success()
+                self.requests += 1
+                self.tokens_sent += batch.tokens
+                return vectors
+            except Exception as e:
+                kind = self.provider.classify(e)
+                if kind is None or attempt == self.max_retries:
+                    raise
+                if kind == THROTTLE:
+                    wait = retry_after_seconds(e, delay)
+                    self.limiter.on_throttle(wait)
+                    logger.warning(
+                        f"⏳ [{self.partition.label}] 429 de {self.provider.name}: "
+                        f"ventana -> {int(self.limiter.limit)}, espera {wait:.1f}s"
+                    )
+                else:
+                    logger.warning(
+                        f"⚠️ [{self.partition.label}] Error transitorio de {self.provider.name} "
+                        f"({e.__class__.__name__}), reintento en {delay:.1f}s"
+                    )
+                    await asyncio.sleep(delay)
+            delay = min(delay * 2, 60.0) * (0.8 + random.random() * 0.4)
+        raise RuntimeError(f"Demasiados reintentos para el lote que termina en id {batch.max_id}")
+
+    def _report(self, final: bool = False, every: float = 5.0) -> None:
+        now = time.perf_counter()
+        if not final and now - self._last_report < every:
+            return
+        self._last_report = now
+        elapsed = max(now - self._started, 1e-9)
+        done = self.updated - self._updated_at_start + self.failed
+        rate = done / elapsed
+        eta = ""
+        if self.expected and not final:
+            left = max(self.expected - done, 0)
+            eta = f" | ETA {left / rate / 60:.0f} min" if rate else " | ETA ?"
+        pct = f" ({min(done / self.expected, 1):.1%})" if self.expected else ""
+        reused = f" | reutilizados: {self.reused:,}" if self.incremental else ""
+        print(
+            f"[{self.provider.name} {self.partition.label}] {'✅ ' if final else ''}"
+            f"{done:,}/{self.expected:,}{pct} | {rate:.1f} chunks/s | {self.tokens_sent / elapsed:,.0f} tokens/s"
+            f" | ventana {int(self.limiter.limit)} | 429: {self.limiter.throttled} | fallidos: {self.failed}{reused}{eta}"
+        )
+
+    async def run(self) -> Dict:
+        if self._id_range is None:
+            await self.prepare()
+        print(
+            f"[{self.provider.name} {self.partition.label}] {self.column} con {self.model}"
+            f" | partición {self.partition.mode} | pendientes ~{self.expected:,} | desde id {self.last_id}"
+        )
+        return await super().run()
+
+
+# -------------------------------------------------------------------- CLI
+
+def _run_shard(options: Dict, index: int, count: int) -> Dict:
+    return asyncio.run(run_job(options, index, count))
+
+
+async def run_job(options: Dict, index: int = 0, count: int = 1) -> Dict:
+    from src.db.supabase_async import create_async_supabase
+
+    provider = make_provider(options["provider"], options.get("model"))
+    supabase = create_async_supabase(
+        os.getenv("SUPABASE_URL"), os.getenv("SUPABASE_KEY"), pool_size=options["concurrency"] * 2
+    )
+    job = EmbeddingJob(
+        supabase,
+        provider,
+        column=options["column"],
+        partition=Partition(index, count, options["partition"], options["block"]),
+        page_size=options["page"],
+        concurrency=options["concurrency"],
+        max_concurrency=options["max_concurrency"],
+        incremental=options["incremental"],
+    )
+    try:
+        return await job.run()
+    finally:
+        await provider.aclose()
+        await supabase.postgrest.session.aclose()
+
+
+def main(argv: List[str]) -> None:
+    args = list(argv)
+
+    def option(name: str, default):
+        if name in args:
+            i = args.index(name)
+            value = args[i + 1]
+            del args[i:i + 2]
+            return value
+        return default
+
+    options = {
+        "model": option("--model", None),
+        "partition": option("--partition", "range"),
+        "block": int(option("--block", "1000")),
+        "page": int(option("--page", os.getenv("BACKFILL_BATCH", "500"))),
+        "concurrency": int(option("--concurrency", os.getenv("BACKFILL_CONCURRENCY", "4"))),
+        "max_concurrency": int(option("--max-concurrency", os.getenv("BACKFILL_MAX_CONCURRENCY", "32"))),
+    }
+    options["incremental"] = "--incremental" in args
+    if options["incremental"]:
+        args.remove("--incremental")
+    column = option("--column", None)
+    workers = int(option("--workers", "1"))
+    shard = option("--shard", None)
+    if len(args) != 1:
+        print(__doc__)
+        sys.exit(1)
+    options["provider"] = args[0]
+    options["column"] = column or DEFAULT_COLUMNS.get(args[0])
+    if options["column"] not in EMBEDDING_COLUMNS:
+        # Fallaría en cada lote contra la RPC: mejor cortar antes de leer nada
+        print(f"❌ Columna no permitida: {options['column']} ({', '.join(EMBEDDING_COLUMNS)})")
+        sys.exit(1)
+
+    if shard:
+        index, count = (int(x) for x in shard.split("/"))
+        result = _run_shard(options, index - 1, count)
+        print(f"📊 {result}")
+        return
+    if workers <= 1:
+        print(f"📊 {_run_shard(options, 0, 1)}")
+        return
+
+    # Un proceso por partición; spawn por si el proveedor local carga torch
+    ctx = mp.get_context("spawn")
+    with ctx.Pool(workers) as pool:
+        results = pool.starmap(_run_shard, [(options, i, workers) for i in range(workers)])
+    total = {k: sum(r[k] for r in results) for k in ("updated", "failed", "reused")}
+    print(f"📊 {workers} workers: {total}")
+
+
+if __name__ == "__main__":
+    from dotenv import load_dotenv
+
+    load_dotenv()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+    main(sys.argv[1:])
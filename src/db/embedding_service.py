@@ -0,0 +1,213 @@
+"""
+src/db/embedding_service.py
+Servicio de embeddings locales (SentenceTransformers) en proceso o repartido en
+un pool de procesos con una réplica del modelo cada uno.
+
+- LocalEmbeddingService: encode en el proceso actual (comportamiento de siempre).
+- ProcessPoolEmbeddingService: parte los textos en tramos, cada worker escribe sus
+  vectores directamente en un bloque de memoria compartida en la fila que le
+  corresponde (resultado ordenado sin serializar los vectores de vuelta).
+  close() espera a que terminen los tramos en curso y libera los workers.
+
+create_embedding_service() elige según EMBEDDING_WORKERS (0/1 = en proceso).
+"""
+
+import logging
+import multiprocessing as mp
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from typing import List, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+class LocalEmbeddingService:
+    """Encode en el proceso actual con un SentenceTransformer ya cargado (o que se carga aquí)."""
+
+    def __init__(self, model_name: str, batch_size: int = 64, model=None):
+        if model is None:
+            from sentence_transformers import SentenceTransformer
+
+            model = SentenceTransformer(model_name)
+        self.model = model
+        self.model_name = model_name
+        self.batch_size = batch_size
+
+    def encode(self, texts: List[str], normalize: bool = True) -> np.ndarray:
+        return self.model.encode(
+            texts,
+            batch_size=self.batch_size,
+            convert_to_numpy=True,
+            normalize_embeddings=normalize,
+            show_progress_bar=False,
+        ).astype(np.float32, copy=False)
+
+    def close(self) -> None:
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+# ----------------------------------------------------------------- worker
+
+_worker_model = None
+
+
+def _init_worker(model_name: str, threads: int) -> None:
+    global _worker_model
+    import torch
+    from sentence_transformers import SentenceTransformer
+
+    # Sin esto cada réplica intenta usar todos los núcleos y se pisan entre sí
+    torch.set_num_threads(threads)
+    _worker_model = SentenceTransformer(model_name, device="cpu")
+
+
+def _worker_dim() -> int:
+    return int(_worker_model.get_sentence_embedding_dimension())
+
+
+def _attach(name: str) -> shared_memory.SharedMemory:
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)  # Python >= 3.13
+    except TypeError:
+        # Con spawn el worker comparte el resource tracker del proceso principal:
+        # registrar de nuevo el bloque no duplica nada y lo libera quien lo creó
+        return shared_memory.SharedMemory(name=name)
+
+
+def _worker_encode(
+    shm_name: str,
+    total: int,
+    dim: int,
+    start: int,
+    texts: List[str],
+    batch_size: int,
+    normalize: bool,
+) -> int:
+    vectors = _worker_model.encode(
+        texts,
+        batch_size=batch_size,
+        convert_to_numpy=True,
+        normalize_embeddings=normalize,
+        show_progress_bar=False,
+    )
+    shm = _attach(shm_name)
+    try:
+        out = np.ndarray((total, dim), dtype=np.float32, buffer=shm.buf)
+        out[start:start + len(texts)] = vectors
+        del out
+    finally:
+        shm.close()
+    return len(texts)
+
+
+# ------------------------------------------------------------------- pool
+
+class ProcessPoolEmbeddingService:
+    """
+    Pool de N procesos, cada uno con su réplica del modelo y threads = núcleos / N.
+    encode() reparte tramos de chunk_size textos y devuelve la matriz en el orden de entrada.
+    """
+
+    def __init__(
+        self,
+        model_name: str,
+        workers: int,
+        batch_size: int = 64,
+        chunk_size: int = 256,
+        threads_per_worker: Optional[int] = None,
+    ):
+        self.model_name = model_name
+        self.workers = workers
+        self.batch_size = batch_size
+        self.chunk_size = chunk_size
+        threads = threads_per_worker or max(1, (os.cpu_count() or 1) // workers)
+
+        # spawn: fork con torch ya inicializado puede colgarse
+        self._executor = ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=mp.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(model_name, threads),
+        )
+        self.dim = self._executor.submit(_worker_dim).result()
+        logger.info(
+            f"🧵 Pool de embeddings: {workers} procesos x {threads} threads ({model_name}, {self.dim} dims)"
+        )
+
+    def encode(self, texts: List[str], normalize: bool = True) -> np.ndarray:
+        total = len(texts)
+        if not total:
+            return np.empty((0, self.dim), dtype=np.float32)
+
+        shm = shared_memory.SharedMemory(create=True, size=total * self.dim * 4)
+        try:
+            futures = [
+                self._executor.submit(
+                    _worker_encode,
+                    shm.name,
+                    total,
+                    self.dim,
+                    start,
+                    texts[start:start + self.chunk_size],
+                    self.batch_size,
+                    normalize,
+                )
+                for start in range(0, total, self.chunk_size)
+            ]
+            try:
+                for f in futures:
+                    f.result()
+            except BaseException:
+                for f in futures:
+                    f.cancel()
+                # Ningún worker puede seguir escribiendo en el bloque cuando se libera
+                for f in futures:
+                    if not f.cancelled():
+                        f.exception()
+                raise
+            return np.ndarray((total, self.dim), dtype=np.float32, buffer=shm.buf).copy()
+        finally:
+            shm.close()
+            shm.unlink()
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=True, cancel_futures=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def create_embedding_service(
+    model_name: str,
+    batch_size: int = 64,
+    workers: Optional[int] = None,
+    model=None,
+):
+    """
+    EMBEDDING_WORKERS=0/1 (por defecto) -> en proceso (reutiliza model si se pasa);
+    EMBEDDING_WORKERS=N -> pool de N procesos; -1 -> un proceso por núcleo.
+    """
+    if workers is None:
+        workers = int(os.getenv("EMBEDDING_WORKERS", "0"))
+    if workers < 0:
+        workers = os.cpu_count() or 1
+    if workers <= 1:
+        return LocalEmbeddingService(model_name, batch_size=batch_size, model=model)
+    return ProcessPoolEmbeddingService(
+        model_name,
+        workers=workers,
+        batch_size=batch_size,
+        chunk_size=int(os.getenv("EMBEDDING_CHUNK_SIZE", "256")),
+    )
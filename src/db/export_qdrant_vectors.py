@@ -1,43 +1,288 @@
-﻿import json
+"""
+Exportador de la colección de Qdrant en streaming y reanudable.
+
+Escribe un snapshot binario (src/db/snapshot.py): vectores en un bloque float32
+empaquetado, ids int64, chunk_index como columna y payloads en JSONL comprimido.
+La memoria es constante: cada página de scroll se escribe y se descarta.
+
+- Reanudable: el estado (<salida>.state.json) guarda el next_offset de cada shard
+  y el tamaño de los archivos en el último checkpoint; al relanzar se sigue desde ahí.
+- Shards paralelos: el rango de ids enteros se parte en N tramos que se recorren
+  con scroll en hilos separados; al final se concatenan en orden de id.
+- Progreso por tiempo (no por múltiplos de count): puntos/s y MB/s.
+
+Uso:
+    python -m src.db.export_qdrant_vectors [salida] [--shards N] [--batch N] [--dtype float16] [--fresh]
+"""
+
+import json
+import os
+import shutil
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
 from qdrant_client import QdrantClient
 
-# Conectar a Qdrant local
-client = QdrantClient(host="localhost", port=6333)
+from src.db.snapshot import SnapshotWriter, merge_snapshots
+
+COLLECTION = os.getenv("QDRANT_COLLECTION", "creg_documents")
+OUTDIR = "qdrant_snapshot"
+LIMIT = 256
+CHECKPOINT_PAGES = 20
+REPORT_EVERY = 2.0
+MAX_ID = 2**63 - 1
+
+
+class Progress:
+    """Contador compartido entre shards; informa cada REPORT_EVERY segundos."""
+
+    def __init__(self, expected: int, done: int = 0, label: str = "Exportados"):
+        self.expected = expected
+        self.label = label
+        self.count = done
+        self.bytes = 0
+        self.started = time.perf_counter()
+        self._last = self.started
+        self._lock = threading.Lock()
+
+    def add(self, points: int, nbytes: int) -> None:
+        with self._lock:
+            self.count += points
+            self.bytes += nbytes
+            now = time.perf_counter()
+            if now - self._last >= REPORT_EVERY:
+                self._last = now
+                self.report()
+
+    def report(self, final: bool = False) -> None:
+        elapsed = max(time.perf_counter() - self.started, 1e-9)
+        pct = f" ({self.count / self.expected:.1%})" if self.expected else ""
+        print(
+            f"   {'✅ Total' if final else self.label} {self.count}{pct}"
+            f" | {self.count / elapsed:.0f} puntos/s | {self.bytes / elapsed / 2**20:.1f} MB/s"
+        )
 
-# Exportar puntos con payloads
-collection_name = "creg_documents"
-vectors_data = []
 
-print("📥 Exportando vectores de Qdrant...")
+def _first_id_from(client: QdrantClient, collection: str, offset: Optional[int]) -> Optional[int]:
+    points, _ = client.scroll(collection, limit=1, offset=offset, with_payload=False, with_vectors=False)
+    return int(points[0].id) if points else None
 
-# Paginar para no cargar todo en memoria
-scroll_size = 100
-scroll_offset = None
 
-while True:
-    points, scroll_offset = client.scroll(
-        collection_name=collection_name,
-        limit=scroll_size,
-        offset=scroll_offset,
-        with_payload=True,
-        with_vectors=True
+def find_id_range(client: QdrantClient, collection: str) -> Optional[Tuple[int, int]]:
+    """
+    (min_id, max_id) de la colección sondeando scroll (devuelve ids >= offset en orden):
+    min con un scroll sin offset, max por búsqueda binaria (~63 scrolls de 1 punto).
+    """
+    first = _first_id_from(client, collection, None)
+    if first is None:
+        return None
+    lo, hi = first, MAX_ID
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if _first_id_from(client, collection, mid) is not None:
+            lo = mid
+        else:
+            hi = mid - 1
+    return first, lo
+
+
+def split_range(lo: int, hi: int, shards: int) -> List[Tuple[int, int]]:
+    """Tramos [start, end) que cubren [lo, hi]."""
+    step = max(1, (hi - lo + 1) // shards)
+    bounds = [lo + i * step for i in range(shards)] + [hi + 1]
+    return [(a, b) for a, b in zip(bounds, bounds[1:]) if a < b]
+
+
+class ExportState:
+    """Estado persistente del export; se reescribe atómicamente en cada checkpoint."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.data: Dict = {}
+        self._lock = threading.Lock()
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                self.data = json.load(f)
+
+    def save(self) -> None:
+        with self._lock:
+            tmp = f"{self.path}.tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(self.data, f, indent=2)
+            os.replace(tmp, self.path)
+
+
+def export_shard(
+    client: QdrantClient,
+    collection: str,
+    shard: Dict,
+    state: ExportState,
+    progress: Progress,
+    dim: int,
+    dtype: str,
+    batch_size: int,
+    model: str = "",
+) -> None:
+    if shard["done"]:
+        return
+    if shard["checkpoint"] and shard["next_offset"] is None and os.path.exists(shard["path"]):
+        # Se cerró el shard pero se cortó antes de guardar done=True
+        shard["done"] = True
+        state.save()
+        return
+
+    writer = SnapshotWriter(
+        shard["path"],
+        dim=dim,
+        dtype=dtype,
+        columns=("chunk_index",),
+        payloads=True,
+        compress=True,
+        source=f"qdrant:{collection}",
+        model=model,
+        resume=shard["checkpoint"],
     )
-    
-    if not points:
-        break
-    
-    for point in points:
-        vectors_data.append({
-            "id": point.id,
-            "vector": point.vector,
-            "payload": point.payload
-        })
-    
-    print(f"   Exportados {len(vectors_data)} vectores...")
-
-# Guardar a JSON
-with open("qdrant_vectors_backup.json", "w", encoding="utf-8") as f:
-    json.dump(vectors_data, f, indent=2)
-
-print(f"✅ Total vectores exportados: {len(vectors_data)}")
-print(f"📁 Guardado en: qdrant_vectors_backup.json")
+    offset = shard["next_offset"]
+    pages = 0
+    itemsize = np.dtype(dtype).itemsize
+
+    while offset is not None:
+        points, next_offset = client.scroll(
+            collection_name=collection,
+            limit=batch_size,
+            offset=offset,
+            with_payload=True,
+            with_vectors=True,
+        )
+        points = [p for p in points if int(p.id) < shard["end"]]
+        if next_offset is not None and int(next_offset) >= shard["end"]:
+            next_offset = None
+
+        if points:
+            writer.append(
+                [int(p.id) for p in points],
+                [p.vector for p in points],
+                columns={"chunk_index": [int((p.payload or {}).get("chunk_index", 0)) for p in points]},
+                payloads=[p.payload or {} for p in points],
+            )
+            progress.add(len(points), len(points) * dim * itemsize)
+
+        offset = next_offset
+        pages += 1
+        if offset is None or pages % CHECKPOINT_PAGES == 0:
+            shard["checkpoint"] = writer.checkpoint()
+            shard["next_offset"] = offset
+            state.save()
+
+    writer.close()
+    shard["done"] = True
+    state.save()
+
+
+def export_collection(
+    client: QdrantClient,
+    collection: str,
+    outdir: str,
+    shards: int = 1,
+    batch_size: int = LIMIT,
+    dtype: str = "float32",
+    model: str = "",
+    fresh: bool = False,
+) -> int:
+    """Exporta la colección a un snapshot en outdir; reanuda si hay estado previo."""
+    state = ExportState(f"{outdir.rstrip('/')}.state.json")
+    parts_dir = f"{outdir.rstrip('/')}.shards"
+
+    info = client.get_collection(collection)
+    expected = info.points_count or 0
+
+    if fresh or state.data.get("collection") != collection:
+        shutil.rmtree(parts_dir, ignore_errors=True)
+        id_range = find_id_range(client, collection)
+        if id_range is None:
+            print("⚠️ Colección vacía, nada que exportar")
+            return 0
+        points, _ = client.scroll(collection, limit=1, with_payload=False, with_vectors=True)
+        state.data = {
+            "collection": collection,
+            "dim": len(points[0].vector),
+            "dtype": dtype,
+            "id_range": id_range,
+            "shards": [
+                {
+                    "start": start,
+                    "end": end,
+                    "path": os.path.join(parts_dir, f"shard_{i:03d}"),
+                    "next_offset": start,
+                    "checkpoint": None,
+                    "done": False,
+                }
+                for i, (start, end) in enumerate(split_range(*id_range, shards))
+            ],
+        }
+        state.save()
+    else:
+        print(f"🔁 Reanudando export de '{collection}' desde {state.path}")
+
+    plan = state.data["shards"]
+    already = sum((s["checkpoint"] or {}).get("count", 0) for s in plan)
+    progress = Progress(expected, done=already)
+    print(
+        f"📌 Colección: {collection} | points_count: {expected} | dim: {state.data['dim']}"
+        f" | ids: {state.data['id_range']} | shards: {len(plan)}"
+    )
+
+    with ThreadPoolExecutor(max_workers=len(plan)) as pool:
+        futures = [
+            pool.submit(
+                export_shard, client, collection, shard, state, progress,
+                state.data["dim"], state.data["dtype"], batch_size, model,
+            )
+            for shard in plan
+        ]
+        for f in futures:
+            f.result()
+
+    reader = merge_snapshots([s["path"] for s in plan], outdir)
+    shutil.rmtree(parts_dir, ignore_errors=True)
+    os.remove(state.path)
+
+    progress.report(final=True)
+    return len(reader)
+
+
+def main(argv: List[str]) -> None:
+    args = list(argv)
+
+    def option(name: str, default: str) -> str:
+        if name in args:
+            i = args.index(name)
+            value = args[i + 1]
+            del args[i:i + 2]
+            return value
+        return default
+
+    shards = int(option("--shards", "1"))
+    batch_size = int(option("--batch", str(LIMIT)))
+    dtype = option("--dtype", "float32")
+    fresh = "--fresh" in args
+    if fresh:
+        args.remove("--fresh")
+    outdir = args[0] if args else OUTDIR
+
+    client = QdrantClient(
+        host=os.getenv("QDRANT_HOST", "localhost"),
+        port=int(os.getenv("QDRANT_PORT", "6333")),
+        api_key=os.getenv("QDRANT_API_KEY"),
+        timeout=60,
+    )
+    count = export_collection(client, COLLECTION, outdir, shards, batch_size, dtype, fresh=fresh)
+    print(f"📁 Snapshot: {outdir} ({count} puntos)")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
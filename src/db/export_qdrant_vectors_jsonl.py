@@ -1,47 +1,37 @@
-﻿import json
-from qdrant_client import QdrantClient
+"""
+Export de Qdrant a JSONL (compatibilidad con el formato anterior).
+
+Usa el exportador binario (src/db/export_qdrant_vectors.py: streaming, reanudable,
+con shards) y convierte el snapshot resultante a JSONL línea por línea.
+
+Uso:
+    python -m src.db.export_qdrant_vectors_jsonl [--shards N]            # Qdrant -> JSONL
+    python -m src.db.export_qdrant_vectors_jsonl --from-snapshot DIR     # snapshot -> JSONL (sin Qdrant)
+"""
+import json
+import sys
+
+from src.db.export_qdrant_vectors import OUTDIR, main as export_main
+from src.db.snapshot import SnapshotReader
 
-COLLECTION = "creg_documents"
 OUTFILE = "qdrant_vectors_backup.jsonl"
 LIMIT = 256
 
-client = QdrantClient(host="localhost", port=6333)
+args = sys.argv[1:]
+if "--from-snapshot" in args:
+    snapshot_dir = args[args.index("--from-snapshot") + 1]
+else:
+    export_main([OUTDIR, *args])
+    snapshot_dir = OUTDIR
 
-info = client.get_collection(COLLECTION)
-expected = info.points_count
-print(f"📌 Colección: {COLLECTION}")
-print(f"📌 points_count (esperado aprox): {expected}")
-
-offset = None
+reader = SnapshotReader(snapshot_dir)
 count = 0
-
 with open(OUTFILE, "w", encoding="utf-8") as f:
-    while True:
-        points, next_offset = client.scroll(
-            collection_name=COLLECTION,
-            limit=LIMIT,
-            offset=offset,
-            with_payload=True,
-            with_vectors=True,
-        )
-
-        if not points:
-            break
-
-        for p in points:
-            f.write(json.dumps({
-                "id": p.id,
-                "vector": p.vector,
-                "payload": p.payload
-            }, ensure_ascii=False) + "\n")
+    for batch in reader.batches(LIMIT):
+        payloads = batch["payloads"] or [{}] * len(batch["ids"])
+        for i, v, p in zip(batch["ids"], batch["vectors"], payloads):
+            f.write(json.dumps({"id": int(i), "vector": v.tolist(), "payload": p}, ensure_ascii=False) + "\n")
             count += 1
 
-        offset = next_offset
-        if count % 5000 == 0:
-            print(f"   Exportados {count}...")
-
-        if offset is None:
-            break
-
 print(f"✅ Export terminado. Total exportados: {count}")
 print(f"📄 Archivo: {OUTFILE}")
@@ -0,0 +1,322 @@
+"""
+Importador masivo de vectores ya calculados (sin re-embeddear).
+
+Lee un snapshot (src/db/snapshot.py) o el JSONL de export_qdrant_vectors_jsonl
+y escribe por lotes grandes en Qdrant, Supabase o ChromaDB:
+
+- varios lotes en vuelo a la vez (pipeline acotado por --in-flight),
+- Qdrant con upsert(wait=False); al final se espera a que la colección quede indexada,
+- Supabase en un round trip por lote vía RPC set_chunk_embeddings (sql/set_chunk_embeddings.sql),
+- --skip-existing consulta por id qué puntos ya están y solo escribe el resto,
+- progreso en puntos/s.
+
+Ojo con el destino supabase: escribe en chunks.id = id del snapshot. Los snapshots
+o JSONL exportados de Qdrant traen ids de punto (stable_point_id), no chunks.id, y
+actualizarían filas equivocadas; para Supabase usar solo exportaciones de Supabase.
+
+Uso:
+    python -m src.db.import_vectors <snapshot_dir|archivo.jsonl> qdrant|supabase|chroma
+        [--batch N] [--in-flight N] [--skip-existing] [--collection NOMBRE] [--column embedding_openai]
+        [--model NOMBRE]
+
+En Supabase se registra el modelo de los vectores (--model, o el del snapshot, o el
+de la columna por defecto) y el content_hash del payload si lo trae; si no, el
+content_hash actual de la fila.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import sys
+import time
+from typing import Dict, Iterator, List, Optional, Set
+
+import numpy as np
+
+from src.db.embedding_backfill import write_embeddings
+from src.db.export_qdrant_vectors import Progress
+from src.db.snapshot import SnapshotReader
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 512
+IN_FLIGHT = 4
+
+
+def read_batches(path: str, batch_size: int = BATCH_SIZE) -> Iterator[Dict]:
+    """Lotes {ids, vectors, payloads} desde un snapshot (directorio) o un JSONL."""
+    if os.path.isdir(path):
+        yield from SnapshotReader(path).batches(batch_size)
+        return
+
+    batch: List[Dict] = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                batch.append(json.loads(line))
+            if len(batch) == batch_size:
+                yield _jsonl_batch(batch)
+                batch = []
+    if batch:
+        yield _jsonl_batch(batch)
+
+
+def _jsonl_batch(rows: List[Dict]) -> Dict:
+    return {
+        "ids": np.asarray([int(r["id"]) for r in rows], dtype=np.int64),
+        "vectors": np.asarray([r["vector"] for r in rows], dtype=np.float32),
+        "payloads": [r.get("payload") or {} for r in rows],
+    }
+
+
+def count_source(path: str) -> int:
+    if os.path.isdir(path):
+        return len(SnapshotReader(path))
+    with open(path, "rb") as f:
+        return sum(1 for line in f if line.strip())
+
+
+class QdrantSink:
+    """Destino Qdrant: upsert sin esperar indexación; finish() espera a que quede en verde."""
+
+    def __init__(self, client, collection: str):
+        self.client = client
+        self.collection = collection
+
+    def ensure(self, dim: int) -> None:
+        from qdrant_client.models import Distance, VectorParams
+
+        if not self.client.collection_exists(self.collection):
+            self.client.create_collection(
+                collection_name=self.collection,
+                vectors_config=VectorParams(size=dim, distance=Distance.COSINE),
+            )
+            logger.info(f"📁 Colección '{self.collection}' creada ({dim} dims)")
+
+    def existing(self, ids: List[int]) -> Set[int]:
+        points = self.client.retrieve(self.collection, ids=ids, with_payload=False, with_vectors=False)
+        return {int(p.id) for p in points}
+
+    def write(self, ids: List[int], vectors: np.ndarray, payloads: List[Dict]) -> None:
+        from qdrant_client.models import Batch
+
+        self.client.upsert(
+            collection_name=self.collection,
+            points=Batch(ids=ids, vectors=vectors.tolist(), payloads=payloads),
+            wait=False,
+        )
+
+    def finish(self, timeout: float = 600.0) -> None:
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            info = self.client.get_collection(self.collection)
+            if str(getattr(info.status, "value", info.status)) == "green":
+                break
+            time.sleep(1.0)
+        points = self.client.get_collection(self.collection).points_count
+        logger.info(f"✅ Qdrant '{self.collection}': {points} puntos")
+
+
+class ChromaSink:
+    """Destino ChromaDB (HttpClient): upsert con embeddings ya calculados."""
+
+    def __init__(self, client, collection: str):
+        self.collection = client.get_or_create_collection(name=collection, metadata={"hnsw:space": "cosine"})
+
+    def ensure(self, dim: int) -> None:
+        pass
+
+    def existing(self, ids: List[int]) -> Set[int]:
+        return {int(i) for i in self.collection.get(ids=[str(i) for i in ids], include=[])["ids"]}
+
+    def write(self, ids: List[int], vectors: np.ndarray, payloads: List[Dict]) -> None:
+        # Chroma solo acepta metadatos escalares
+        metadatas = [
+            {k: v for k, v in p.items() if isinstance(v, (str, int, float, bool))} or {"id": i}
+            for i, p in zip(ids, payloads)
+        ]
+        self.collection.upsert(
+            ids=[str(i) for i in ids],
+            embeddings=vectors.tolist(),
+            metadatas=metadatas,
+            documents=[p.get("text", "") for p in payloads],
+        )
+
+    def finish(self) -> None:
+        logger.info(f"✅ Chroma '{self.collection.name}': {self.collection.count()} documentos")
+
+
+class SupabaseSink:
+    """
+    Destino Supabase: actualiza chunks.<column> por id (los chunks deben existir).
+    Los ids deben ser chunks.id: los de un export de Qdrant son ids de punto.
+    """
+
+    def __init__(self, vdb, column: str = "embedding_openai", model: Optional[str] = None):
+        self.vdb = vdb
+        self.column = column
+        self.model = model
+
+    async def existing(self, ids: List[int]) -> Set[int]:
+        res = await self.vdb._execute(
+            "import_existing",
+            lambda: self.vdb.supabase.table("chunks")
+            .select("id")
+            .in_("id", ids)
+            .not_.is_(self.column, "null")
+            .execute(),
+        )
+        return {r["id"] for r in res.data or []}
+
+    async def write(self, ids: List[int], vectors: np.ndarray, payloads: List[Dict]) -> None:
+        # Sin hash en el payload la RPC toma el content_hash actual de la fila
+        hashes = [p.get("content_hash") for p in payloads]
+        await self.vdb._execute(
+            "import_write",
+            lambda: write_embeddings(self.vdb.supabase, ids, vectors.tolist(), self.column, hashes, self.model),
+        )
+
+    async def finish(self) -> None:
+        await self.vdb.aclose()
+
+
+async def _call(fn, *args):
+    """Los sinks síncronos (Qdrant, Chroma) corren en hilos para poder solaparse."""
+    if asyncio.iscoroutinefunction(fn):
+        return await fn(*args)
+    return await asyncio.to_thread(fn, *args)
+
+
+async def run_import(
+    sink,
+    batches: Iterator[Dict],
+    expected: int = 0,
+    in_flight: int = IN_FLIGHT,
+    skip_existing: bool = False,
+) -> Dict:
+    """Escribe los lotes con hasta in_flight escrituras simultáneas. Devuelve contadores."""
+    progress = Progress(expected, label="Importados")
+    slots = asyncio.Semaphore(in_flight)
+    pending: Set[asyncio.Task] = set()
+    stats = {"written": 0, "skipped": 0}
+    error: Optional[BaseException] = None
+
+    async def process(batch: Dict) -> None:
+        nonlocal error
+        try:
+            ids = [int(i) for i in batch["ids"]]
+            vectors = np.asarray(batch["vectors"], dtype=np.float32)
+            payloads = batch["payloads"] or [{}] * len(ids)
+            if skip_existing:
+                present = await _call(sink.existing, ids)
+                if present:
+                    keep = [k for k, i in enumerate(ids) if i not in present]
+                    stats["skipped"] += len(ids) - len(keep)
+                    ids = [ids[k] for k in keep]
+                    vectors = vectors[keep]
+                    payloads = [payloads[k] for k in keep]
+            if ids:
+                await _call(sink.write, ids, vectors, payloads)
+                stats["written"] += len(ids)
+            progress.add(len(batch["ids"]), vectors.nbytes)
+        except Exception as e:
+            error = error or e
+        finally:
+            slots.release()
+
+    first = True
+    for batch in batches:
+        if first and hasattr(sink, "ensure"):
+            await _call(sink.ensure, np.asarray(batch["vectors"]).shape[1])
+            first = False
+        await slots.acquire()
+        launched = False
+        try:
+            if error is not None:
+                break
+            task = asyncio.create_task(process(batch))
+            launched = True
+            pending.add(task)
+            task.add_done_callback(pending.discard)
+        finally:
+            # process() libera el cupo al terminar; si no se lanzó, se libera acá
+            if not launched:
+                slots.release()
+
+    if pending:
+        await asyncio.gather(*pending)
+    if error is not None:
+        raise error
+
+    await _call(sink.finish)
+    progress.report(final=True)
+    elapsed = time.perf_counter() - progress.started
+    stats["points_per_s"] = round(progress.count / elapsed, 1) if elapsed else 0.0
+    return stats
+
+
+def make_sink(backend: str, collection: Optional[str], column: str, model: Optional[str] = None):
+    if backend == "qdrant":
+        from qdrant_client import QdrantClient
+
+        client = QdrantClient(
+            host=os.getenv("QDRANT_HOST", "localhost"),
+            port=int(os.getenv("QDRANT_PORT", "6333")),
+            api_key=os.getenv("QDRANT_API_KEY"),
+            timeout=60,
+        )
+        return QdrantSink(client, collection or os.getenv("QDRANT_COLLECTION", "creg_documents"))
+    if backend == "chroma":
+        import chromadb
+
+        client = chromadb.HttpClient(
+            host=os.getenv("CHROMA_HOST", "localhost"),
+            port=int(os.getenv("CHROMA_PORT", "8000")),
+        )
+        return ChromaSink(client, collection or "normativa_creg_v2")
+    if backend == "supabase":
+        from src.db.vectordb_supabase import VectorDBSupabase
+
+        from src.db.embedding_jobs import default_model
+
+        return SupabaseSink(VectorDBSupabase(), column, model or default_model(column))
+    raise ValueError(f"Backend desconocido: {backend} (qdrant, supabase o chroma)")
+
+
+async def main(argv: List[str]) -> None:
+    args = list(argv)
+
+    def option(name: str, default: Optional[str]) -> Optional[str]:
+        if name in args:
+            i = args.index(name)
+            value = args[i + 1]
+            del args[i:i + 2]
+            return value
+        return default
+
+    batch_size = int(option("--batch", str(BATCH_SIZE)))
+    in_flight = int(option("--in-flight", str(IN_FLIGHT)))
+    collection = option("--collection", None)
+    column = option("--column", "embedding_openai")
+    model = option("--model", None)
+    skip_existing = "--skip-existing" in args
+    if skip_existing:
+        args.remove("--skip-existing")
+    if len(args) != 2:
+        print(__doc__)
+        sys.exit(1)
+    source, backend = args
+
+    if model is None and os.path.isdir(source):
+        model = SnapshotReader(source).model or None
+    sink = make_sink(backend, collection, column, model)
+    expected = count_source(source)
+    print(f"📥 Importando {expected} vectores de {source} → {backend} (lotes de {batch_size}, {in_flight} en vuelo)")
+    stats = await run_import(sink, read_batches(source, batch_size), expected, in_flight, skip_existing)
+    print(f"📊 {stats}")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+    asyncio.run(main(sys.argv[1:]))
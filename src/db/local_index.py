@@ -0,0 +1,288 @@
+"""
+src/db/local_index.py
+Índice vectorial local en memoria (réplica de lectura de chunks.embedding_openai)
+para responder como el RPC match_chunks sin ir a la red.
+
+- Matriz float32 con vectores normalizados: similitud coseno = producto punto.
+- nlist = 0  -> búsqueda exacta (fuerza bruta con numpy).
+- nlist > 0  -> IVF-flat: k-means sobre la matriz y se exploran las nprobe listas más cercanas.
+- Carga inicial y refresco incremental por marca de agua de chunks.id; las filas
+  cambiadas por debajo de esa marca (re-embebidas, rellenadas) se traen por updated_at.
+"""
+
+import json
+import logging
+import time
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+def parse_vector(value) -> Optional[np.ndarray]:
+    """pgvector llega por PostgREST como texto '[0.1,0.2,...]'; a veces ya como lista."""
+    if value is None:
+        return None
+    if isinstance(value, str):
+        value = json.loads(value)
+    return np.asarray(value, dtype=np.float32)
+
+
+def _normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+class LocalVectorIndex:
+    """
+    Índice en memoria con la misma semántica que match_chunks:
+    similarity = 1 - distancia coseno, filtra similarity > threshold,
+    ordena de mayor a menor y devuelve como máximo k filas.
+    """
+
+    def __init__(self, nlist: int = 0, nprobe: int = 8):
+        self.nlist = nlist
+        self.nprobe = nprobe
+
+        self.ids = np.empty(0, dtype=np.int64)
+        self.norma_ids = np.empty(0, dtype=np.int64)
+        self.indices = np.empty(0, dtype=np.int32)
+        self.matrix: Optional[np.ndarray] = None
+
+        self.watermark = 0
+        self.ready = False
+        self.loaded_at = 0.0
+        self.reloaded_at = 0.0
+
+        self._centroids: Optional[np.ndarray] = None
+        self._lists: List[np.ndarray] = []
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    # ------------------------------------------------------------------ carga
+
+    def add(
+        self,
+        ids: Sequence[int],
+        norma_ids: Sequence[int],
+        indices: Sequence[int],
+        vectors: np.ndarray,
+    ) -> None:
+        if len(ids) == 0:
+            return
+        vectors = _normalize_rows(np.asarray(vectors, dtype=np.float32))
+        start = len(self.ids)
+
+        self.ids = np.concatenate([self.ids, np.asarray(ids, dtype=np.int64)])
+        self.norma_ids = np.concatenate([self.norma_ids, np.asarray(norma_ids, dtype=np.int64)])
+        self.indices = np.concatenate([self.indices, np.asarray(indices, dtype=np.int32)])
+        self.matrix = vectors if self.matrix is None else np.concatenate([self.matrix, vectors])
+        self.watermark = max(self.watermark, int(np.max(ids)))
+
+        if self._centroids is not None:
+            # Filas nuevas van a la lista de su centroide más cercano
+            assign = np.argmax(vectors @ self._centroids.T, axis=1)
+            for c in np.unique(assign):
+                new_rows = start + np.flatnonzero(assign == c)
+                self._lists[c] = np.concatenate([self._lists[c], new_rows])
+
+    def upsert(
+        self,
+        ids: Sequence[int],
+        norma_ids: Sequence[int],
+        indices: Sequence[int],
+        vectors: np.ndarray,
+    ) -> int:
+        """
+        Reemplaza en su lugar las filas cuyo id ya está en el índice (embedding
+        recalculado o metadatos nuevos) y agrega el resto. Devuelve cuántas se reemplazaron.
+        """
+        if len(ids) == 0:
+            return 0
+        ids = np.asarray(ids, dtype=np.int64)
+        # Un id repetido entre páginas: gana la última versión leída
+        _, last = np.unique(ids[::-1], return_index=True)
+        keep = np.sort(len(ids) - 1 - last)
+        ids = ids[keep]
+        norma_ids = np.asarray(norma_ids, dtype=np.int64)[keep]
+        indices = np.asarray(indices, dtype=np.int32)[keep]
+        vectors = _normalize_rows(np.asarray(vectors, dtype=np.float32)[keep])
+
+        found = np.zeros(len(ids), dtype=bool)
+        if len(self.ids):
+            # Los ids rellenados con add() pueden quedar fuera de orden: se busca sobre una vista ordenada
+            order = np.argsort(self.ids, kind="stable")
+            slot = np.minimum(np.searchsorted(self.ids[order], ids), len(order) - 1)
+            found = self.ids[order[slot]] == ids
+            rows = order[slot[found]]
+            self.matrix[rows] = vectors[found]
+            self.norma_ids[rows] = norma_ids[found]
+            self.indices[rows] = indices[found]
+
+            if self._centroids is not None and len(rows):
+                # El vector cambió: la fila pasa a la lista de su nuevo centroide más cercano
+                self._lists = [lst[~np.isin(lst, rows)] for lst in self._lists]
+                assign = np.argmax(vectors[found] @ self._centroids.T, axis=1)
+                for c in np.unique(assign):
+                    self._lists[c] = np.concatenate([self._lists[c], rows[assign == c]])
+
+        new = ~found
+        self.add(ids[new], norma_ids[new], indices[new], vectors[new])
+        return int(found.sum())
+
+    def train(self, iterations: int = 10, sample: int = 20000, seed: int = 0) -> None:
+        """K-means esférico para IVF. Sin efecto si nlist == 0 o hay pocas filas."""
+        n = len(self.ids)
+        if self.nlist <= 0 or n < self.nlist * 4:
+            self._centroids = None
+            self._lists = []
+            return
+
+        t0 = time.perf_counter()
+        rng = np.random.default_rng(seed)
+        train_rows = self.matrix[rng.choice(n, size=min(sample, n), replace=False)]
+        centroids = train_rows[rng.choice(len(train_rows), size=self.nlist, replace=False)].copy()
+
+        for _ in range(iterations):
+            assign = np.argmax(train_rows @ centroids.T, axis=1)
+            for c in range(self.nlist):
+                members = train_rows[assign == c]
+                if len(members):
+                    centroids[c] = members.mean(axis=0)
+            centroids = _normalize_rows(centroids)
+
+        assign = np.argmax(self.matrix @ centroids.T, axis=1)
+        self._centroids = centroids
+        self._lists = [np.flatnonzero(assign == c) for c in range(self.nlist)]
+        logger.info(
+            f"🧭 IVF entrenado: {self.nlist} listas sobre {n} vectores "
+            f"en {(time.perf_counter() - t0) * 1000:.0f} ms"
+        )
+
+    def load_snapshot(self, reader) -> int:
+        """
+        Arranque en frío desde un SnapshotReader (src/db/snapshot.py): evita bajar
+        todos los vectores por PostgREST. Después refresh() trae solo lo posterior.
+        """
+        if not len(reader):
+            return 0
+        self.add(reader.ids, reader.column("norma_id"), reader.column("indice"), reader.vectors)
+        if self.nlist > 0:
+            self.train()
+        self.ready = True
+        self.loaded_at = self.reloaded_at = time.time()
+        logger.info(f"📦 Índice local desde snapshot: {len(self)} vectores (watermark {self.watermark})")
+        return len(reader)
+
+    async def refresh(self, vdb, page_size: int = 500) -> int:
+        """
+        Trae de Supabase los chunks con id > watermark y embedding no nulo.
+        Devuelve cuántas filas se agregaron.
+        """
+        full = self.watermark == 0
+        # Se acumulan las páginas y se agregan de una vez (evita copiar la matriz por página)
+        ids, norma_ids, indices, vectors = [], [], [], []
+        async for rows in vdb.iter_embeddings(after_id=self.watermark, page_size=page_size, label="local_index"):
+            for r in rows:
+                ids.append(r["id"])
+                norma_ids.append(r["norma_id"])
+                indices.append(r.get("indice") or 0)
+                vectors.append(parse_vector(r["embedding_openai"]))
+
+        added = len(ids)
+        if added:
+            self.add(ids, norma_ids, indices, np.stack(vectors))
+            if not self.ready and self.nlist > 0:
+                self.train()
+            logger.info(f"📥 Índice local: +{added} vectores (total {len(self)}, watermark {self.watermark})")
+        self.ready = self.ready or len(self) > 0
+        self.loaded_at = time.time()
+        if full:
+            self.reloaded_at = self.loaded_at
+        return added
+
+    async def sync_updated(self, vdb, since: str, page_size: int = 500) -> int:
+        """
+        Aplica los chunks con updated_at >= since: cubre lo que refresh() no ve por
+        watermark (embeddings recalculados con el mismo id, filas con id menor rellenadas
+        después). Requiere la columna chunks.updated_at (sql/chunk_updated_at.sql).
+        """
+        ids, norma_ids, indices, vectors = [], [], [], []
+        async for rows in vdb.iter_updated_embeddings(since=since, page_size=page_size, label="local_index_updated"):
+            for r in rows:
+                ids.append(r["id"])
+                norma_ids.append(r["norma_id"])
+                indices.append(r.get("indice") or 0)
+                vectors.append(parse_vector(r["embedding_openai"]))
+
+        if not ids:
+            return 0
+        before = len(self)
+        replaced = self.upsert(ids, norma_ids, indices, np.stack(vectors))
+        self.ready = self.ready or len(self) > 0
+        logger.info(
+            f"♻️ Índice local: {replaced} vectores actualizados, +{len(self) - before} rellenados "
+            f"(total {len(self)})"
+        )
+        return len(ids)
+
+    async def reload(self, vdb, page_size: int = 500) -> int:
+        """
+        Recarga completa: refresh() y sync_updated() no ven chunks borrados, ni (sin
+        chunks.updated_at) embeddings recalculados con el mismo id. Se carga en un índice nuevo y se
+        reemplaza al final, así las búsquedas siguen respondiendo mientras tanto.
+        """
+        fresh = LocalVectorIndex(nlist=self.nlist, nprobe=self.nprobe)
+        await fresh.refresh(vdb, page_size)
+        self.__dict__.update(fresh.__dict__)
+        logger.info(f"🔄 Índice local recargado: {len(self)} vectores (watermark {self.watermark})")
+        return len(self)
+
+    # ------------------------------------------------------------- búsqueda
+
+    def search(self, query: Sequence[float], k: int = 3, threshold: float = 0.5) -> List[Dict]:
+        if self.matrix is None or k <= 0:
+            return []
+
+        q = np.asarray(query, dtype=np.float32)
+        norm = float(np.linalg.norm(q))
+        if norm:
+            q = q / norm
+
+        if self._centroids is not None:
+            probe = np.argsort(-(self._centroids @ q))[: self.nprobe]
+            candidates = np.concatenate([self._lists[c] for c in probe])
+            sims = self.matrix[candidates] @ q
+        else:
+            candidates = None
+            sims = self.matrix @ q
+
+        keep = np.flatnonzero(sims > threshold)
+        if len(keep) > k:
+            keep = keep[np.argpartition(-sims[keep], k - 1)[:k]]
+        keep = keep[np.argsort(-sims[keep])]
+
+        rows = candidates[keep] if candidates is not None else keep
+        return [
+            {
+                "id": int(self.ids[r]),
+                "norma_id": int(self.norma_ids[r]),
+                "indice": int(self.indices[r]),
+                "similarity": float(s),
+            }
+            for r, s in zip(rows, sims[keep])
+        ]
+
+    def stats(self) -> Dict:
+        return {
+            "vectors": len(self),
+            "dim": 0 if self.matrix is None else self.matrix.shape[1],
+            "memory_mb": 0 if self.matrix is None else round(self.matrix.nbytes / 2**20, 1),
+            "nlist": len(self._lists),
+            "nprobe": self.nprobe,
+            "watermark": self.watermark,
+            "ready": self.ready,
+        }
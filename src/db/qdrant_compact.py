@@ -0,0 +1,172 @@
+"""
+Compactación de una colección de Qdrant: elimina los puntos duplicados que dejaron
+las ingestas con ids hash(str) % 10**9 (aleatorios por proceso: cada corrida
+insertaba copias nuevas en lugar de hacer upsert).
+
+- Recorre la colección con scroll (sin vectores, solo document_id / chunk_index /
+  created_at) y agrupa por (document_id, chunk_index).
+- En cada grupo se queda con el punto cuyo id es el estable (content_hash.stable_point_id);
+  si ninguno lo es, con el más reciente por created_at.
+- --apply borra los duplicados y además copia el punto conservado que no tiene id
+  estable al id estable (mismo vector y payload): si quedara con el id viejo, la
+  próxima ingesta lo duplicaría otra vez.
+- Sin --apply solo informa lo que haría.
+
+Uso:
+    python -m src.db.qdrant_compact [--collection NOMBRE] [--apply] [--batch 1000]
+"""
+
+import logging
+import os
+import sys
+from collections import defaultdict
+from typing import Dict, List, Optional, Tuple
+
+from qdrant_client import QdrantClient
+from qdrant_client.models import PointIdsList, PointStruct
+
+from src.db.content_hash import stable_point_id
+from src.db.export_qdrant_vectors import Progress
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 1000
+FIELDS = ["document_id", "chunk_index", "created_at"]
+
+
+def scan_groups(client: QdrantClient, collection: str, batch_size: int = BATCH_SIZE):
+    """(document_id, chunk_index) -> [(created_at, id), ...] y cantidad de puntos sin esas claves."""
+    expected = client.count(collection, exact=True).count
+    progress = Progress(expected, label="Revisados")
+    groups: Dict[Tuple[str, int], List[Tuple[str, int]]] = defaultdict(list)
+    orphans = 0
+    offset = None
+    while True:
+        points, offset = client.scroll(
+            collection, limit=batch_size, offset=offset, with_payload=FIELDS, with_vectors=False
+        )
+        for p in points:
+            payload = p.payload or {}
+            if payload.get("document_id") is None:
+                orphans += 1
+                continue
+            key = (str(payload["document_id"]), int(payload.get("chunk_index", 0)))
+            groups[key].append((str(payload.get("created_at", "")), p.id))
+        progress.add(len(points), 0)
+        if offset is None:
+            break
+    progress.report(final=True)
+    return groups, orphans
+
+
+def plan(groups: Dict[Tuple[str, int], List[Tuple[str, int]]]):
+    """Ids a borrar y pares (id conservado -> id estable) a re-indexar."""
+    delete: List = []
+    rekey: List[Tuple] = []
+    for (document_id, chunk_index), members in groups.items():
+        stable = stable_point_id(document_id, chunk_index)
+        ids = [pid for _, pid in members]
+        if stable in ids:
+            keep = stable
+        else:
+            keep = max(members, key=lambda m: m[0])[1]
+            rekey.append((keep, stable))
+        delete.extend(pid for pid in ids if pid != keep)
+    return delete, rekey
+
+
+def _rekey(client: QdrantClient, collection: str, pairs: List[Tuple], batch_size: int) -> int:
+    moved = 0
+    for start in range(0, len(pairs), batch_size):
+        chunk = pairs[start:start + batch_size]
+        found = {
+            p.id: p
+            for p in client.retrieve(
+                collection, ids=[old for old, _ in chunk], with_payload=True, with_vectors=True
+            )
+        }
+        points = [
+            PointStruct(id=new, vector=found[old].vector, payload=found[old].payload)
+            for old, new in chunk
+            if old in found
+        ]
+        client.upsert(collection, points=points, wait=True)
+        client.delete(collection, points_selector=PointIdsList(points=[old for old, _ in chunk if old in found]))
+        moved += len(points)
+    return moved
+
+
+def compact_collection(
+    client: QdrantClient,
+    collection: str,
+    apply: bool = False,
+    batch_size: int = BATCH_SIZE,
+) -> Dict[str, int]:
+    groups, orphans = scan_groups(client, collection, batch_size)
+    delete, to_rekey = plan(groups)
+    stats = {
+        "chunks": len(groups),
+        "points": sum(len(m) for m in groups.values()) + orphans,
+        "duplicates": len(delete),
+        "unstable_ids": len(to_rekey),
+        "without_document_id": orphans,
+        "deleted": 0,
+        "rekeyed": 0,
+    }
+    logger.info(
+        f"🔍 '{collection}': {stats['points']} puntos, {stats['chunks']} chunks distintos, "
+        f"{stats['duplicates']} duplicados, {stats['unstable_ids']} con id no estable"
+    )
+    if not apply:
+        return stats
+
+    for start in range(0, len(delete), batch_size):
+        client.delete(
+            collection,
+            points_selector=PointIdsList(points=delete[start:start + batch_size]),
+            wait=start + batch_size >= len(delete),
+        )
+    stats["deleted"] = len(delete)
+    if to_rekey:
+        stats["rekeyed"] = _rekey(client, collection, to_rekey, batch_size)
+    logger.info(f"🧹 Eliminados {stats['deleted']} duplicados, re-indexados {stats['rekeyed']}")
+    return stats
+
+
+def main(argv: List[str]) -> None:
+    args = list(argv)
+
+    def option(name: str, default: Optional[str]) -> Optional[str]:
+        if name in args:
+            i = args.index(name)
+            value = args[i + 1]
+            del args[i:i + 2]
+            return value
+        return default
+
+    collection = option("--collection", os.getenv("QDRANT_COLLECTION", "creg_documents"))
+    batch_size = int(option("--batch", str(BATCH_SIZE)))
+    apply = "--apply" in args
+    unknown = [a for a in args if a != "--apply"]
+    if unknown:
+        print(__doc__)
+        sys.exit(1)
+
+    client = QdrantClient(
+        host=os.getenv("QDRANT_HOST", "localhost"),
+        port=int(os.getenv("QDRANT_PORT", "6333")),
+        api_key=os.getenv("QDRANT_API_KEY"),
+        timeout=60,
+    )
+    before = client.get_collection(collection).points_count
+    stats = compact_collection(client, collection, apply=apply, batch_size=batch_size)
+    print(f"📊 {stats}")
+    if apply:
+        print(f"   puntos: {before} -> {client.get_collection(collection).points_count}")
+    else:
+        print("   (simulación: usar --apply para borrar duplicados y mover a ids estables)")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+    main(sys.argv[1:])
@@ -0,0 +1,171 @@
+"""
+Perfiles de almacenamiento de la colección de Qdrant.
+
+Un perfil fija cómo se guardan e indexan los vectores:
+- cuantización: ninguna (float32), escalar int8 (~4x menos memoria) o binaria
+  (~32x; conviene con más oversampling),
+- rescoring: la búsqueda recorre los vectores cuantizados en RAM y re-puntúa
+  limit * oversampling candidatos con los originales,
+- originales en disco (on_disk) cuando hay cuantización en RAM,
+- HNSW m / ef_construct (grafo) y hnsw_ef (búsqueda).
+
+VectorDB usa QDRANT_STORAGE_PROFILE al crear la colección y en cada búsqueda.
+Una colección existente se migra en caliente con update_collection (Qdrant
+reconstruye en segundo plano y sigue respondiendo mientras tanto).
+
+Uso:
+    python -m src.db.qdrant_storage list
+    python -m src.db.qdrant_storage migrate <perfil> [--collection creg_documents]
+"""
+
+import logging
+import os
+import sys
+import time
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+from qdrant_client import QdrantClient
+from qdrant_client.models import (
+    BinaryQuantization,
+    BinaryQuantizationConfig,
+    Disabled,
+    Distance,
+    HnswConfigDiff,
+    QuantizationSearchParams,
+    ScalarQuantization,
+    ScalarQuantizationConfig,
+    ScalarType,
+    SearchParams,
+    VectorParams,
+    VectorParamsDiff,
+)
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class StorageProfile:
+    name: str
+    quantization: Optional[str] = None  # None | "scalar" | "binary"
+    quantized_in_ram: bool = True
+    on_disk: bool = False
+    rescore: bool = True
+    oversampling: float = 2.0
+    hnsw_m: int = 16
+    hnsw_ef_construct: int = 100
+    hnsw_ef: Optional[int] = None
+
+    def vectors_config(self, dim: int) -> VectorParams:
+        return VectorParams(size=dim, distance=Distance.COSINE, on_disk=self.on_disk)
+
+    def hnsw_config(self) -> HnswConfigDiff:
+        return HnswConfigDiff(m=self.hnsw_m, ef_construct=self.hnsw_ef_construct)
+
+    def quantization_config(self):
+        if self.quantization == "scalar":
+            return ScalarQuantization(
+                scalar=ScalarQuantizationConfig(type=ScalarType.INT8, quantile=0.99, always_ram=self.quantized_in_ram)
+            )
+        if self.quantization == "binary":
+            return BinaryQuantization(binary=BinaryQuantizationConfig(always_ram=self.quantized_in_ram))
+        return None
+
+    def search_params(self) -> Optional[SearchParams]:
+        if self.quantization is None and self.hnsw_ef is None:
+            return None
+        quantization = None
+        if self.quantization is not None:
+            quantization = QuantizationSearchParams(
+                ignore=False, rescore=self.rescore, oversampling=self.oversampling
+            )
+        return SearchParams(hnsw_ef=self.hnsw_ef, quantization=quantization)
+
+    def estimated_ram(self, points: int, dim: int) -> int:
+        """Bytes en RAM estimados: vectores (originales y/o cuantizados) + enlaces del grafo HNSW."""
+        originals = 0 if self.on_disk else points * dim * 4
+        quantized = 0
+        if self.quantization == "scalar" and self.quantized_in_ram:
+            quantized = points * dim
+        elif self.quantization == "binary" and self.quantized_in_ram:
+            quantized = points * ((dim + 7) // 8)
+        graph = points * self.hnsw_m * 2 * 4
+        return originals + quantized + graph
+
+
+PROFILES: Dict[str, StorageProfile] = {
+    # Comportamiento original: float32 en RAM, HNSW por defecto
+    "float32": StorageProfile("float32"),
+    "scalar": StorageProfile("scalar", quantization="scalar", on_disk=True),
+    "scalar-ram": StorageProfile("scalar-ram", quantization="scalar"),
+    # Con pocas dimensiones (384) la binaria pierde recall: más candidatos para re-puntuar
+    "binary": StorageProfile("binary", quantization="binary", on_disk=True, oversampling=4.0),
+    "scalar-hnsw32": StorageProfile(
+        "scalar-hnsw32", quantization="scalar", on_disk=True, hnsw_m=32, hnsw_ef_construct=200, hnsw_ef=128
+    ),
+}
+
+
+def get_profile(name: Optional[str] = None) -> StorageProfile:
+    name = name or os.getenv("QDRANT_STORAGE_PROFILE", "float32")
+    if name not in PROFILES:
+        raise ValueError(f"Perfil de almacenamiento desconocido: {name} ({', '.join(PROFILES)})")
+    return PROFILES[name]
+
+
+def apply_profile(client: QdrantClient, collection: str, profile: StorageProfile) -> None:
+    """Migra una colección existente al perfil (update_collection; Qdrant re-optimiza en segundo plano)."""
+    client.update_collection(
+        collection_name=collection,
+        vectors_config={"": VectorParamsDiff(on_disk=profile.on_disk)},
+        hnsw_config=profile.hnsw_config(),
+        quantization_config=profile.quantization_config() or Disabled.DISABLED,
+    )
+    logger.info(f"🔧 Colección '{collection}' -> perfil '{profile.name}'")
+
+
+def wait_green(client: QdrantClient, collection: str, timeout: float = 1800.0) -> bool:
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        status = client.get_collection(collection).status
+        if str(getattr(status, "value", status)) == "green":
+            return True
+        time.sleep(2.0)
+    return False
+
+
+def main(argv: List[str]) -> None:
+    args = list(argv)
+    collection = os.getenv("QDRANT_COLLECTION", "creg_documents")
+    if "--collection" in args:
+        i = args.index("--collection")
+        collection = args[i + 1]
+        del args[i:i + 2]
+
+    if args[:1] == ["list"]:
+        for profile in PROFILES.values():
+            print(f"  {profile}")
+        return
+    if len(args) != 2 or args[0] != "migrate":
+        print(__doc__)
+        sys.exit(1)
+
+    profile = get_profile(args[1])
+    client = QdrantClient(
+        host=os.getenv("QDRANT_HOST", "localhost"),
+        port=int(os.getenv("QDRANT_PORT", "6333")),
+        api_key=os.getenv("QDRANT_API_KEY"),
+        timeout=60,
+    )
+    info = client.get_collection(collection)
+    print(f"📦 '{collection}': {info.points_count} puntos -> perfil {profile}")
+    apply_profile(client, collection, profile)
+    t0 = time.perf_counter()
+    ok = wait_green(client, collection)
+    print(f"{'✅' if ok else '⚠️'} Optimización {'terminada' if ok else 'aún en curso'} ({time.perf_counter() - t0:.0f} s)")
+    print(f"   Recordar QDRANT_STORAGE_PROFILE={profile.name} para que las búsquedas usen rescoring")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+    main(sys.argv[1:])
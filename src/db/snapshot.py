@@ -0,0 +1,293 @@
+"""
+src/db/snapshot.py
+Snapshot de embeddings en disco, cargable con np.memmap en milisegundos.
+
+Un snapshot es un directorio con:
+    manifest.json      count, dim, dtype, columnas, origen y modelo (se escribe al final)
+    vectors.bin        matriz (count, dim) row-major en float32 o float16
+    ids.bin            int64, un id por fila
+    col_<nombre>.bin   columnas numéricas opcionales (p. ej. norma_id, indice)
+    payloads.jsonl     payload opcional por fila (solo si el origen lo tiene, p. ej. Qdrant);
+                       payloads.jsonl.gz si se escribió comprimido
+
+Uso desde consola:
+    python -m src.db.snapshot from-supabase <dir> [float32|float16]
+    python -m src.db.snapshot from-qdrant <dir> [float32|float16]
+    python -m src.db.snapshot info <dir>
+"""
+
+import gzip
+import json
+import logging
+import os
+import shutil
+import sys
+import time
+from typing import Dict, Iterator, List, Optional, Sequence
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+FORMAT = "creg-embeddings-snapshot"
+VERSION = 1
+DTYPES = ("float32", "float16")
+
+
+class SnapshotWriter:
+    """
+    Escritor en streaming: append() por lotes, sin mantener la matriz en memoria.
+    Escribe en <dir>.tmp y lo renombra en close(), así un snapshot a medias nunca
+    queda en la ruta final.
+
+    checkpoint() devuelve el tamaño de cada archivo en un punto consistente;
+    pasándolo como resume= se truncan los archivos ahí y se sigue agregando.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        dim: int,
+        dtype: str = "float32",
+        columns: Sequence[str] = (),
+        payloads: bool = False,
+        source: str = "",
+        model: str = "",
+        compress: bool = False,
+        resume: Optional[Dict] = None,
+    ):
+        if dtype not in DTYPES:
+            raise ValueError(f"dtype no soportado: {dtype} (usar {', '.join(DTYPES)})")
+        self.path = path
+        self.dim = dim
+        self.dtype = dtype
+        self.columns = list(columns)
+        self.source = source
+        self.model = model
+        self.count = resume["count"] if resume else 0
+
+        self._tmp = f"{path.rstrip('/')}.tmp"
+        if resume is None:
+            shutil.rmtree(self._tmp, ignore_errors=True)
+            os.makedirs(self._tmp)
+
+        names = ["vectors.bin", "ids.bin", *(f"col_{c}.bin" for c in self.columns)]
+        self._payloads_name = None
+        if payloads:
+            self._payloads_name = "payloads.jsonl.gz" if compress else "payloads.jsonl"
+            names.append(self._payloads_name)
+        self._files = {name: self._open(name, resume) for name in names}
+
+        self._vectors = self._files["vectors.bin"]
+        self._ids = self._files["ids.bin"]
+        self._cols = {c: self._files[f"col_{c}.bin"] for c in self.columns}
+        self._payloads = self._files.get(self._payloads_name)
+        self._gzip = gzip.GzipFile(fileobj=self._payloads, mode="wb") if payloads and compress else None
+
+    def _open(self, name: str, resume: Optional[Dict]):
+        f = open(os.path.join(self._tmp, name), "ab" if resume else "wb")
+        if resume:
+            # Descarta lo escrito después del último checkpoint
+            f.truncate(resume["sizes"][name])
+            f.seek(0, os.SEEK_END)
+        return f
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+    def append(
+        self,
+        ids: Sequence[int],
+        vectors,
+        columns: Optional[Dict[str, Sequence[int]]] = None,
+        payloads: Optional[List[Dict]] = None,
+    ) -> None:
+        if len(ids) == 0:
+            return
+        matrix = np.asarray(vectors, dtype=self.dtype)
+        if matrix.shape != (len(ids), self.dim):
+            raise ValueError(f"Forma de vectores {matrix.shape}, se esperaba ({len(ids)}, {self.dim})")
+
+        self._vectors.write(np.ascontiguousarray(matrix).tobytes())
+        self._ids.write(np.asarray(ids, dtype=np.int64).tobytes())
+        for c, f in self._cols.items():
+            f.write(np.asarray((columns or {})[c], dtype=np.int64).tobytes())
+        if self._payloads is not None:
+            lines = "".join(json.dumps(p, ensure_ascii=False) + "\n" for p in payloads or [{}] * len(ids))
+            (self._gzip or self._payloads).write(lines.encode("utf-8"))
+        self.count += len(ids)
+
+    def checkpoint(self) -> Dict:
+        """Vuelca todo a disco y devuelve {count, sizes} para reanudar desde aquí."""
+        if self._gzip is not None:
+            # Cada checkpoint cierra un miembro gzip: los miembros concatenados son un .gz válido
+            self._gzip.close()
+        for f in self._files.values():
+            f.flush()
+            os.fsync(f.fileno())
+        state = {"count": self.count, "sizes": {name: f.tell() for name, f in self._files.items()}}
+        if self._gzip is not None:
+            self._gzip = gzip.GzipFile(fileobj=self._payloads, mode="wb")
+        return state
+
+    def _close_files(self) -> None:
+        if self._gzip is not None:
+            self._gzip.close()
+        for f in self._files.values():
+            f.close()
+
+    def close(self) -> str:
+        self._close_files()
+        manifest = {
+            "format": FORMAT,
+            "version": VERSION,
+            "count": self.count,
+            "dim": self.dim,
+            "dtype": self.dtype,
+            "columns": self.columns,
+            "payloads": self._payloads is not None,
+            "payloads_file": self._payloads_name,
+            "source": self.source,
+            "model": self.model,
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        }
+        with open(os.path.join(self._tmp, "manifest.json"), "w", encoding="utf-8") as f:
+            json.dump(manifest, f, indent=2, ensure_ascii=False)
+
+        shutil.rmtree(self.path, ignore_errors=True)
+        os.replace(self._tmp, self.path)
+        logger.info(f"💾 Snapshot escrito: {self.path} ({self.count} x {self.dim}, {self.dtype})")
+        return self.path
+
+    def abort(self) -> None:
+        self._close_files()
+        shutil.rmtree(self._tmp, ignore_errors=True)
+
+
+class SnapshotReader:
+    """Acceso de solo lectura: vectores, ids y columnas son np.memmap (no se copian)."""
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(os.path.join(path, "manifest.json"), encoding="utf-8") as f:
+            self.manifest = json.load(f)
+        if self.manifest.get("format") != FORMAT:
+            raise ValueError(f"{path} no es un snapshot de embeddings")
+
+        self.count = self.manifest["count"]
+        self.dim = self.manifest["dim"]
+        self.dtype = self.manifest["dtype"]
+        self.model = self.manifest.get("model", "")
+
+        self.vectors = self._memmap("vectors.bin", self.dtype, (self.count, self.dim))
+        self.ids = self._memmap("ids.bin", np.int64, (self.count,))
+
+    def _memmap(self, name: str, dtype, shape) -> np.ndarray:
+        if not self.count:
+            return np.empty(shape, dtype=dtype)
+        return np.memmap(os.path.join(self.path, name), dtype=dtype, mode="r", shape=shape)
+
+    def __len__(self) -> int:
+        return self.count
+
+    def column(self, name: str) -> np.ndarray:
+        if name not in self.manifest["columns"]:
+            raise KeyError(f"El snapshot no tiene la columna '{name}'")
+        return self._memmap(f"col_{name}.bin", np.int64, (self.count,))
+
+    def payloads(self) -> Iterator[Dict]:
+        if not self.manifest["payloads"]:
+            return
+        name = self.manifest.get("payloads_file") or "payloads.jsonl"
+        opener = gzip.open if name.endswith(".gz") else open
+        with opener(os.path.join(self.path, name), "rt", encoding="utf-8") as f:
+            for line in f:
+                yield json.loads(line)
+
+    def batches(self, size: int = 1000) -> Iterator[Dict]:
+        """Recorre el snapshot por lotes: ids, vectores (float32), columnas y payloads."""
+        payloads = self.payloads()
+        for start in range(0, self.count, size):
+            end = min(start + size, self.count)
+            yield {
+                "ids": self.ids[start:end],
+                "vectors": np.asarray(self.vectors[start:end], dtype=np.float32),
+                "columns": {c: self.column(c)[start:end] for c in self.manifest["columns"]},
+                "payloads": [next(payloads) for _ in range(end - start)] if self.manifest["payloads"] else None,
+            }
+
+
+def merge_snapshots(parts: Sequence[str], path: str, **manifest) -> SnapshotReader:
+    """
+    Concatena snapshots con el mismo dim/dtype/columnas (p. ej. shards de un export)
+    en uno solo, copiando bytes sin decodificar. Los gzip se concatenan como miembros.
+    """
+    readers = [SnapshotReader(p) for p in parts]
+    first = readers[0].manifest
+    for r in readers[1:]:
+        for key in ("dim", "dtype", "columns", "payloads_file"):
+            if r.manifest.get(key) != first.get(key):
+                raise ValueError(f"Snapshots incompatibles ({key}): {parts[0]} vs {r.path}")
+
+    tmp = f"{path.rstrip('/')}.tmp"
+    shutil.rmtree(tmp, ignore_errors=True)
+    os.makedirs(tmp)
+    names = ["vectors.bin", "ids.bin", *(f"col_{c}.bin" for c in first["columns"])]
+    if first.get("payloads"):
+        names.append(first.get("payloads_file") or "payloads.jsonl")
+    for name in names:
+        with open(os.path.join(tmp, name), "wb") as out:
+            for r in readers:
+                with open(os.path.join(r.path, name), "rb") as f:
+                    shutil.copyfileobj(f, out, 1 << 20)
+
+    merged = {**first, **manifest, "count": sum(len(r) for r in readers)}
+    merged["created_at"] = time.strftime("%Y-%m-%dT%H:%M:%S")
+    with open(os.path.join(tmp, "manifest.json"), "w", encoding="utf-8") as f:
+        json.dump(merged, f, indent=2, ensure_ascii=False)
+
+    shutil.rmtree(path, ignore_errors=True)
+    os.replace(tmp, path)
+    return SnapshotReader(path)
+
+
+async def _main(argv: List[str]) -> None:
+    command, path = argv[0], argv[1]
+    dtype = argv[2] if len(argv) > 2 else "float32"
+
+    if command == "from-supabase":
+        from src.db.vectordb_supabase import VectorDBSupabase
+
+        vdb = VectorDBSupabase()
+        t0 = time.perf_counter()
+        count = await vdb.export_snapshot(path, dtype=dtype)
+        await vdb.aclose()
+        print(f"✅ {count} vectores exportados en {time.perf_counter() - t0:.1f} s")
+    elif command == "from-qdrant":
+        from src.db.vectordb_qdrant import VectorDB
+
+        t0 = time.perf_counter()
+        count = VectorDB().export_snapshot(path, dtype=dtype)
+        print(f"✅ {count} vectores exportados en {time.perf_counter() - t0:.1f} s")
+    elif command == "info":
+        t0 = time.perf_counter()
+        reader = SnapshotReader(path)
+        print(json.dumps(reader.manifest, indent=2, ensure_ascii=False))
+        print(f"⏱️ memmap en {(time.perf_counter() - t0) * 1000:.1f} ms")
+    else:
+        print(__doc__)
+
+
+if __name__ == "__main__":
+    import asyncio
+
+    if len(sys.argv) < 3:
+        print(__doc__)
+        sys.exit(1)
+    asyncio.run(_main(sys.argv[1:]))
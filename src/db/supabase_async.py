@@ -0,0 +1,92 @@
+"""
+src/db/supabase_async.py
+Cliente Supabase asíncrono nativo (PostgREST sobre httpx.AsyncClient) con pool
+de conexiones keep-alive configurable y métricas de espera por el pool.
+"""
+
+import asyncio
+import logging
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Dict
+
+import httpx
+from supabase import AsyncClient, AsyncClientOptions
+
+logger = logging.getLogger(__name__)
+
+
+def create_async_supabase(
+    url: str,
+    key: str,
+    pool_size: int = 10,
+    keepalive: float = 30.0,
+    timeout: float = 30.0,
+    http2: bool = False,
+) -> AsyncClient:
+    """
+    Crea un AsyncClient de Supabase sobre un httpx.AsyncClient propio, para controlar
+    el tamaño del pool, el keep-alive y HTTP/2. No hace I/O (se puede llamar en __init__).
+    """
+    http_client = httpx.AsyncClient(
+        limits=httpx.Limits(
+            max_connections=pool_size,
+            max_keepalive_connections=pool_size,
+            keepalive_expiry=keepalive,
+        ),
+        timeout=timeout,
+        http2=http2,
+    )
+    options = AsyncClientOptions(httpx_client=http_client)
+    # Igual que AsyncClient.create(), pero sin pedir sesión de auth (usamos la API key)
+    options.headers.update({"apiKey": key, "Authorization": f"Bearer {key}"})
+    return AsyncClient(url, key, options)
+
+
+class PoolGate:
+    """
+    Semáforo del mismo tamaño que el pool httpx: mide cuánto espera cada consulta
+    por una conexión libre (httpx no expone esa métrica).
+    """
+
+    def __init__(self, size: int, window: int = 1000):
+        self.size = size
+        self._semaphore = asyncio.Semaphore(size)
+        self._waits = deque(maxlen=window)
+        self.in_use = 0
+        self.acquired = 0
+        self.waited = 0
+        self.max_wait = 0.0
+
+    @asynccontextmanager
+    async def acquire(self):
+        t0 = time.perf_counter()
+        async with self._semaphore:
+            wait = time.perf_counter() - t0
+            self._waits.append(wait)
+            self.acquired += 1
+            if wait > 0.001:
+                self.waited += 1
+            self.max_wait = max(self.max_wait, wait)
+            self.in_use += 1
+            try:
+                yield
+            finally:
+                self.in_use -= 1
+
+    def stats(self) -> Dict:
+        waits = sorted(self._waits)
+
+        def p(q: float) -> float:
+            return waits[min(len(waits) - 1, int(q * len(waits)))] * 1000 if waits else 0.0
+
+        return {
+            "pool_size": self.size,
+            "in_use": self.in_use,
+            "acquired": self.acquired,
+            "waited": self.waited,
+            "wait_p50_ms": round(p(0.50), 2),
+            "wait_p95_ms": round(p(0.95), 2),
+            "wait_max_ms": round(self.max_wait * 1000, 2),
+        }
@@ -3,6 +3,8 @@ import chromadb
 from sentence_transformers import SentenceTransformer
 import logging
 
+from src.db.embedding_service import create_embedding_service
+
 logger = logging.getLogger(__name__)
 
 class VectorDB:
@@ -24,6 +26,8 @@ class VectorDB:
                 metadata={"hnsw:space": "cosine"}
             )
             self.embedding_model = SentenceTransformer('all-MiniLM-L6-v2')
+            # Encode de lotes: en proceso o en un pool de réplicas (EMBEDDING_WORKERS)
+            self.embedder = create_embedding_service('all-MiniLM-L6-v2', model=self.embedding_model)
             logger.info(f"✅ ChromaDB conectado. Colección: {collection_name}")
         except Exception as e:
             logger.error(f"❌ Error conectando a ChromaDB: {e}")
@@ -52,7 +56,7 @@ class VectorDB:
             
             # Generar embeddings
             logger.info(f"Generando embeddings para {len(documents)} documentos...")
-            embeddings = self.embedding_model.encode(documents)
+            embeddings = self.embedder.encode(documents, normalize=False)
             
             # Agregar a ChromaDB
             self.collection.upsert(
@@ -101,6 +105,10 @@ class VectorDB:
             logger.error(f"❌ Error en búsqueda: {e}")
             return None
     
+    def close(self):
+        """Liberar el pool de embeddings (si lo hay)"""
+        self.embedder.close()
+
     def get_collection_info(self):
         """Obtener info de la colección"""
         try:
@@ -13,16 +13,27 @@ from typing import List, Dict, Optional, Tuple, Any, Union
 from dataclasses import dataclass
 from datetime import datetime
 import json
+import re
 
 from sentence_transformers import SentenceTransformer
 from qdrant_client import QdrantClient
 from qdrant_client.models import (
-    VectorParams,
-    Distance,
     PointStruct,
     SearchRequest,
+    SetPayload,
+    SetPayloadOperation,
+    Filter,
+    FieldCondition,
+    MatchAny,
+    MatchValue,
+    PayloadSchemaType,
+    Range,
 )
 
+from src.db.content_hash import content_hash, stable_point_id
+from src.db.embedding_service import create_embedding_service
+from src.db.qdrant_storage import apply_profile, get_profile
+
 logging.basicConfig(
     level=logging.INFO,
     format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
@@ -47,6 +58,14 @@ class VectorDB:
 
     MODEL_NAME = "all-MiniLM-L6-v2"
     EMBEDDING_DIM = 384
+    # Subir si cambia el preprocesamiento (_clean_text) para forzar re-embeddings
+    EMBEDDING_VERSION = 1
+    # Índices de payload: los filtros se evalúan dentro del recorrido del HNSW
+    PAYLOAD_INDEXES = {
+        "year": PayloadSchemaType.INTEGER,
+        "resolution_number": PayloadSchemaType.KEYWORD,
+        "document_id": PayloadSchemaType.KEYWORD,
+    }
     COLLECTION_NAME = "creg_documents"
 
     def __init__(
@@ -55,6 +74,12 @@ class VectorDB:
         port: int = None,
         api_key: Optional[str] = None,
         collection_name: str = None,
+        encode_batch_size: int = None,
+        upsert_batch_size: int = None,
+        skip_unchanged: Optional[bool] = None,
+        prefer_grpc: Optional[bool] = None,
+        payload_fields: Optional[List[str]] = None,
+        storage_profile: Optional[str] = None,
     ):
         host = host or os.getenv("QDRANT_HOST", "localhost")
         port = port or int(os.getenv("QDRANT_PORT", "6333"))
@@ -62,45 +87,87 @@ class VectorDB:
         self.collection_name = collection_name or os.getenv(
             "QDRANT_COLLECTION", self.COLLECTION_NAME
         )
+        self.encode_batch_size = encode_batch_size or int(os.getenv("QDRANT_ENCODE_BATCH_SIZE", "64"))
+        self.upsert_batch_size = upsert_batch_size or int(os.getenv("QDRANT_UPSERT_BATCH_SIZE", "256"))
+        if skip_unchanged is None:
+            skip_unchanged = os.getenv("QDRANT_SKIP_UNCHANGED", "True").lower() == "true"
+        self.skip_unchanged = skip_unchanged
+        if prefer_grpc is None:
+            prefer_grpc = os.getenv("QDRANT_PREFER_GRPC", "False").lower() == "true"
+        # Campos del payload que devuelve search (None = todos); el texto completo
+        # de metadatos grandes no viaja si no se necesita
+        if payload_fields is None:
+            fields = os.getenv("QDRANT_PAYLOAD_FIELDS", "")
+            payload_fields = [f.strip() for f in fields.split(",") if f.strip()] or None
+        self.payload_fields = payload_fields
+        # Cuantización / on_disk / HNSW (QDRANT_STORAGE_PROFILE, ver src/db/qdrant_storage.py)
+        self.storage = get_profile(storage_profile)
 
-        logger.info("🔌 Conectando a Qdrant en %s:%s ...", host, port)
+        logger.info(
+            "🔌 Conectando a Qdrant en %s:%s (%s) ...", host, port, "gRPC" if prefer_grpc else "REST"
+        )
+        # Un solo cliente (conexiones reutilizadas) para ingesta y búsqueda
         self.client = QdrantClient(
-            host=host, 
-            port=port, 
-            api_key=api_key, 
-            timeout=30.0,
-            prefer_grpc=False
+            host=host,
+            port=port,
+            grpc_port=int(os.getenv("QDRANT_GRPC_PORT", "6334")),
+            api_key=api_key,
+            timeout=30,
+            prefer_grpc=prefer_grpc,
         )
         logger.info("✅ Conexión a Qdrant OK")
 
         logger.info("🤖 Cargando modelo SentenceTransformer '%s' ...", self.MODEL_NAME)
         self.model = SentenceTransformer(self.MODEL_NAME)
         logger.info("✅ Modelo cargado (%d dimensiones)", self.EMBEDDING_DIM)
+        # Encode de lotes: en proceso o en un pool de réplicas (EMBEDDING_WORKERS)
+        self.embedder = create_embedding_service(
+            self.MODEL_NAME, batch_size=self.encode_batch_size, model=self.model
+        )
 
         self._ensure_collection_exists()
 
     def _ensure_collection_exists(self) -> None:
-        """Crea la colección en Qdrant si no existe."""
+        """Crea la colección en Qdrant si no existe, con sus índices de payload."""
         try:
             self.client.get_collection(self.collection_name)
             logger.info("✅ Colección '%s' ya existe", self.collection_name)
         except Exception:
             logger.info(
-                "📁 Colección '%s' no existe, creando con %d dims ...",
+                "📁 Colección '%s' no existe, creando con %d dims (perfil %s) ...",
                 self.collection_name,
                 self.EMBEDDING_DIM,
+                self.storage.name,
             )
             self.client.create_collection(
                 collection_name=self.collection_name,
-                vectors_config=VectorParams(
-                    size=self.EMBEDDING_DIM,
-                    distance=Distance.COSINE,
-                ),
+                vectors_config=self.storage.vectors_config(self.EMBEDDING_DIM),
+                hnsw_config=self.storage.hnsw_config(),
+                quantization_config=self.storage.quantization_config(),
             )
             logger.info("✅ Colección '%s' creada", self.collection_name)
+        self._ensure_payload_indexes()
 
-    def embed_text(self, text: str) -> List[float]:
-        """Genera el embedding de un texto usando SentenceTransformers."""
+    def _ensure_payload_indexes(self) -> None:
+        """Crea los índices de PAYLOAD_INDEXES que falten (también en colecciones existentes)."""
+        try:
+            schema = self.client.get_collection(self.collection_name).payload_schema or {}
+        except Exception as e:
+            logger.warning("⚠️ No se pudo leer el esquema de payload: %s", e)
+            return
+        for field, field_schema in self.PAYLOAD_INDEXES.items():
+            if field in schema:
+                continue
+            self.client.create_payload_index(
+                collection_name=self.collection_name,
+                field_name=field,
+                field_schema=field_schema,
+                wait=True,
+            )
+            logger.info("🗂️ Índice de payload '%s' (%s) creado", field, field_schema.value)
+
+    @staticmethod
+    def _clean_text(text: str) -> str:
         if not isinstance(text, str):
             raise ValueError("El texto debe ser str")
 
@@ -111,18 +178,59 @@ class VectorDB:
         if len(text) > 50000:
             logger.warning("Texto muy largo (%d chars), truncando a 50k", len(text))
             text = text[:50000]
+        return text
+
+    def embed_text(self, text: str) -> List[float]:
+        """Genera el embedding de un texto usando SentenceTransformers."""
+        text = self._clean_text(text)
 
         try:
             vec = self.model.encode(
                 text,
                 convert_to_numpy=True,
                 normalize_embeddings=True,
+                show_progress_bar=False,
             )
             return vec.tolist()
         except Exception as e:
             logger.error("❌ Error generando embedding local: %s", e)
             raise
 
+    def embed_texts(self, texts: List[str]):
+        """Embeddings de varios textos vía el servicio de embeddings (lotes de encode_batch_size)."""
+        return self.embedder.encode([self._clean_text(t) for t in texts])
+
+    @staticmethod
+    def _point_id(document_id: str, chunk_index: int) -> int:
+        return stable_point_id(document_id, chunk_index)
+
+    @classmethod
+    def _payload(
+        cls,
+        document_id: str,
+        content: str,
+        chunk_index: int,
+        metadata: Optional[Dict[str, Any]],
+    ) -> Dict[str, Any]:
+        payload = {
+            "document_id": document_id,
+            "chunk_index": chunk_index,
+            "text": content[:500],
+            "content_length": len(content),
+            "created_at": datetime.utcnow().isoformat(),
+        }
+        if metadata:
+            payload.update(metadata)
+        # Tipos consistentes con los índices de payload (year INTEGER, resto KEYWORD)
+        if isinstance(payload.get("year"), str) and payload["year"].strip().isdigit():
+            payload["year"] = int(payload["year"])
+        if payload.get("resolution_number") is not None:
+            payload["resolution_number"] = str(payload["resolution_number"])
+        payload["content_hash"] = content_hash(content)
+        payload["embedding_model"] = cls.MODEL_NAME
+        payload["embedding_version"] = cls.EMBEDDING_VERSION
+        return payload
+
     def add_document(
         self,
         document_id: str,
@@ -133,21 +241,10 @@ class VectorDB:
         """Inserta un documento (chunk) en la colección."""
         try:
             embedding = self.embed_text(content)
-
-            payload = {
-                "document_id": document_id,
-                "chunk_index": chunk_index,
-                "text": content[:500],
-                "content_length": len(content),
-                "created_at": datetime.utcnow().isoformat(),
-            }
-            if metadata:
-                payload.update(metadata)
-
-            point_id = abs(hash(f"{document_id}-{chunk_index}")) % (10**9)
+            payload = self._payload(document_id, content, chunk_index, metadata)
 
             point = PointStruct(
-                id=point_id,
+                id=self._point_id(document_id, chunk_index),
                 vector=embedding,
                 payload=payload,
             )
@@ -179,95 +276,277 @@ class VectorDB:
         1. Modo scraper: add_documents(texts, ids, metadatas)
         2. Modo dict: add_documents([{id, content, metadata}, ...])
         """
-        success_count = 0
-        
-        # Modo 1: Lista de textos con ids y metadatas separados (para scraper)
+        # Normaliza ambos modos a listas paralelas
         if isinstance(texts, list) and texts and isinstance(texts[0], str):
             if ids is None or metadatas is None:
                 logger.error("Se requieren ids y metadatas cuando texts es lista de strings")
                 return 0
-                
-            for i, (text, doc_id, metadata) in enumerate(zip(texts, ids, metadatas)):
-                try:
-                    if self.add_document(
-                        document_id=str(doc_id),
-                        content=text,
-                        chunk_index=metadata.get('chunk_index', i),
-                        metadata=metadata
-                    ):
-                        success_count += 1
-                except Exception as e:
-                    logger.error("Error insertando documento %s: %s", doc_id, e)
-                    
-        # Modo 2: Lista de diccionarios (modo original)
+            rows = [
+                (str(doc_id), text, metadata.get("chunk_index", i), metadata)
+                for i, (text, doc_id, metadata) in enumerate(zip(texts, ids, metadatas))
+            ]
         elif isinstance(texts, list) and texts and isinstance(texts[0], dict):
-            for i, doc in enumerate(texts):
-                try:
-                    if self.add_document(
-                        document_id=doc.get("id", str(i)),
-                        content=doc["content"],
-                        chunk_index=doc.get("chunk_index", 0),
-                        metadata=doc.get("metadata"),
-                    ):
-                        success_count += 1
-                except Exception as e:
-                    logger.error("Error insertando documento: %s", e)
-        
+            rows = [
+                (doc.get("id", str(i)), doc.get("content"), doc.get("chunk_index", 0), doc.get("metadata"))
+                for i, doc in enumerate(texts)
+            ]
+        else:
+            return 0
+
+        success_count = self._add_batch(rows)
         logger.info("✅ Inserción batch: %d/%d exitosos", success_count, len(texts))
         return success_count
 
+    def _add_batch(self, rows: List[Tuple[str, str, int, Optional[Dict[str, Any]]]]) -> int:
+        """
+        Encode de todos los textos en lotes y upsert por tramos de upsert_batch_size
+        con wait=False. El último tramo va con wait=True: Qdrant aplica las
+        actualizaciones de una colección en orden, así que al volver esa llamada
+        todos los tramos anteriores ya son visibles.
+
+        Incremental: los puntos que ya existen con el mismo content_hash, modelo y
+        versión no se re-embeben (solo se actualiza su payload), y los textos
+        idénticos del lote se codifican una sola vez.
+        """
+        valid = []
+        for row in rows:
+            try:
+                valid.append((row[0], self._clean_text(row[1]), row[2], row[3]))
+            except ValueError as e:
+                logger.error("Error insertando documento %s: %s", row[0], e)
+        if not valid:
+            return 0
+
+        items = [
+            (self._point_id(doc_id, chunk_index), self._payload(doc_id, content, chunk_index, metadata), content)
+            for doc_id, content, chunk_index, metadata in valid
+        ]
+        unchanged = self._unchanged_ids(items) if self.skip_unchanged else set()
+        changed = [item for item in items if item[0] not in unchanged]
+        success_count = self._refresh_payloads([item for item in items if item[0] in unchanged])
+
+        # Un encode por texto distinto (los artículos repetidos entre resoluciones son comunes)
+        unique: Dict[str, int] = {}
+        for _, payload, content in changed:
+            unique.setdefault(payload["content_hash"], len(unique))
+        texts = [""] * len(unique)
+        for _, payload, content in changed:
+            texts[unique[payload["content_hash"]]] = content
+        try:
+            vectors = self.embed_texts(texts) if texts else []
+        except Exception as e:
+            logger.error("❌ Error generando embeddings en batch: %s", e)
+            return success_count
+        if unchanged or len(texts) < len(changed):
+            logger.info(
+                "♻️ %d sin cambios, %d textos repetidos reutilizados, %d embebidos",
+                len(unchanged),
+                len(changed) - len(texts),
+                len(texts),
+            )
+
+        points = [
+            PointStruct(
+                id=point_id,
+                vector=vectors[unique[payload["content_hash"]]].tolist(),
+                payload=payload,
+            )
+            for point_id, payload, _ in changed
+        ]
+
+        step = self.upsert_batch_size
+        for start in range(0, len(points), step):
+            chunk = points[start:start + step]
+            try:
+                self.client.upsert(
+                    collection_name=self.collection_name,
+                    points=chunk,
+                    wait=start + step >= len(points),
+                )
+                success_count += len(chunk)
+            except Exception as e:
+                logger.error("❌ Error en upsert de %d puntos: %s", len(chunk), e)
+        return success_count
+
+    def _unchanged_ids(self, items: List[Tuple[int, Dict[str, Any], str]]) -> set:
+        """Ids que ya están en la colección con el mismo contenido, modelo y versión."""
+        wanted = {point_id: payload for point_id, payload, _ in items}
+        unchanged = set()
+        ids = list(wanted)
+        for start in range(0, len(ids), self.upsert_batch_size):
+            try:
+                found = self.client.retrieve(
+                    collection_name=self.collection_name,
+                    ids=ids[start:start + self.upsert_batch_size],
+                    with_payload=["content_hash", "embedding_model", "embedding_version"],
+                    with_vectors=False,
+                )
+            except Exception as e:
+                logger.warning("⚠️ No se pudo consultar puntos existentes (%s), se re-embebe todo", e)
+                return set()
+            for point in found:
+                stored, new = point.payload or {}, wanted.get(point.id)
+                if new and all(stored.get(k) == new[k] for k in ("content_hash", "embedding_model", "embedding_version")):
+                    unchanged.add(point.id)
+        return unchanged
+
+    def _refresh_payloads(self, items: List[Tuple[int, Dict[str, Any], str]]) -> int:
+        """
+        Actualiza solo el payload (metadatos) de puntos cuyo vector no cambia.
+        created_at se conserva: es la fecha de la primera inserción del punto.
+        """
+        count = 0
+        for start in range(0, len(items), self.upsert_batch_size):
+            chunk = items[start:start + self.upsert_batch_size]
+            try:
+                self.client.batch_update_points(
+                    collection_name=self.collection_name,
+                    update_operations=[
+                        SetPayloadOperation(
+                            set_payload=SetPayload(
+                                payload={k: v for k, v in payload.items() if k != "created_at"},
+                                points=[point_id],
+                            )
+                        )
+                        for point_id, payload, _ in chunk
+                    ],
+                    wait=start + self.upsert_batch_size >= len(items),
+                )
+                count += len(chunk)
+            except Exception as e:
+                logger.error("❌ Error actualizando payload de %d puntos: %s", len(chunk), e)
+        return count
+
+    @staticmethod
+    def _to_result(hit) -> SearchResult:
+        p = hit.payload or {}
+        return SearchResult(
+            document_id=p.get("document_id"),
+            score=hit.score,
+            content=p.get("text", ""),
+            metadata=p,
+            chunk_index=int(p.get("chunk_index", 0)),
+        )
+
+    def _with_payload(self, payload_fields: Optional[List[str]]):
+        return payload_fields or self.payload_fields or True
+
+    @staticmethod
+    def build_filter(
+        year: Union[int, List[int], None] = None,
+        year_from: Optional[int] = None,
+        year_to: Optional[int] = None,
+        resolution_number: Union[str, List[str], None] = None,
+        document_id: Union[str, List[str], None] = None,
+    ) -> Optional[Filter]:
+        """Filtro de Qdrant por año (exacto, lista o rango), número de resolución y documento."""
+
+        def match(key: str, value, cast) -> FieldCondition:
+            if isinstance(value, (list, tuple, set)):
+                return FieldCondition(key=key, match=MatchAny(any=[cast(v) for v in value]))
+            return FieldCondition(key=key, match=MatchValue(value=cast(value)))
+
+        must = []
+        if year is not None:
+            must.append(match("year", year, int))
+        if year_from is not None or year_to is not None:
+            must.append(FieldCondition(key="year", range=Range(gte=year_from, lte=year_to)))
+        if resolution_number is not None:
+            must.append(match("resolution_number", resolution_number, str))
+        if document_id is not None:
+            must.append(match("document_id", document_id, str))
+        return Filter(must=must) if must else None
+
+    @staticmethod
+    def filters_from_query(query: str) -> Dict[str, Any]:
+        """
+        Filtros explícitos en la consulta: años de 4 dígitos ("normas de 2024 sobre energía")
+        y "resolución 101" / "CREG 101". Uso: search(q, filters=VectorDB.filters_from_query(q)).
+        """
+        filters: Dict[str, Any] = {}
+        years = sorted({int(y) for y in re.findall(r"\b(19[89]\d|20\d{2})\b", query)})
+        if len(years) == 1:
+            filters["year"] = years[0]
+        elif years:
+            filters["year"] = years
+        number = re.search(r"\b(?:resoluci[oó]n|creg)\s+(?:no\.?\s*)?(\d{1,4})\b", query, re.IGNORECASE)
+        if number and int(number.group(1)) not in years:
+            filters["resolution_number"] = number.group(1)
+        return filters
+
     def search(
         self,
         query: str,
         limit: int = 5,
         score_threshold: float = 0.0,
+        payload_fields: Optional[List[str]] = None,
+        filters: Optional[Dict[str, Any]] = None,
     ) -> List[SearchResult]:
-        """Realiza búsqueda semántica en Qdrant."""
+        """
+        Realiza búsqueda semántica en Qdrant. filters: argumentos de build_filter
+        (year, year_from, year_to, resolution_number, document_id).
+        """
         try:
             q_vec = self.embed_text(query)
-            
-            import requests
-            response = requests.post(
-                f"http://localhost:6333/collections/{self.collection_name}/points/search",
-                json={
-                    "vector": q_vec,
-                    "limit": limit,
-                    "with_payload": True
-                }
+            hits = self.client.search(
+                collection_name=self.collection_name,
+                query_vector=q_vec,
+                query_filter=self.build_filter(**filters) if filters else None,
+                search_params=self.storage.search_params(),
+                limit=limit,
+                score_threshold=score_threshold or None,
+                with_payload=self._with_payload(payload_fields),
             )
-            
-            if response.status_code != 200:
-                logger.error("Error en búsqueda: %s", response.text)
-                return []
-            
-            hits = response.json().get("result", [])
-            
-            results: List[SearchResult] = []
-            for h in hits:
-                score = h.get("score", 0.0)
-                if score < score_threshold:
-                    continue
-                p = h.get("payload", {})
-                results.append(
-                    SearchResult(
-                        document_id=p.get("document_id"),
-                        score=score,
-                        content=p.get("text", ""),
-                        metadata=p,
-                        chunk_index=int(p.get("chunk_index", 0)),
-                    )
-                )
+            results = [self._to_result(h) for h in hits]
             logger.info(
-                "🔍 Query='%s' → %d resultados (limit=%d)",
+                "🔍 Query='%s' → %d resultados (limit=%d%s)",
                 query,
                 len(results),
                 limit,
+                f", filtros={filters}" if filters else "",
             )
             return results
         except Exception as e:
             logger.error("❌ Error en búsqueda semántica: %s", e)
             return []
 
+    def search_batch(
+        self,
+        queries: List[str],
+        limit: int = 5,
+        score_threshold: float = 0.0,
+        payload_fields: Optional[List[str]] = None,
+        filters: Optional[Dict[str, Any]] = None,
+    ) -> List[List[SearchResult]]:
+        """Varias búsquedas en un solo encode y un solo request a Qdrant (mismos filtros para todas)."""
+        if not queries:
+            return []
+        try:
+            vectors = self.embed_texts(queries)
+            with_payload = self._with_payload(payload_fields)
+            query_filter = self.build_filter(**filters) if filters else None
+            search_params = self.storage.search_params()
+            responses = self.client.search_batch(
+                collection_name=self.collection_name,
+                requests=[
+                    SearchRequest(
+                        vector=vec.tolist(),
+                        filter=query_filter,
+                        params=search_params,
+                        limit=limit,
+                        score_threshold=score_threshold or None,
+                        with_payload=with_payload,
+                    )
+                    for vec in vectors
+                ],
+            )
+            results = [[self._to_result(h) for h in hits] for hits in responses]
+            logger.info("🔍 %d queries en batch → %d resultados", len(queries), sum(map(len, results)))
+            return results
+        except Exception as e:
+            logger.error("❌ Error en búsqueda semántica en batch: %s", e)
+            return [[] for _ in queries]
+
     def get_stats(self) -> Dict[str, Any]:
         """Devuelve estadísticas básicas de la colección."""
         try:
@@ -277,6 +556,7 @@ class VectorDB:
                 "points_count": col.points_count,
                 "vector_size": self.EMBEDDING_DIM,
                 "distance": "cosine",
+                "storage_profile": self.storage.name,
                 "model": self.MODEL_NAME,
                 "timestamp": datetime.utcnow().isoformat(),
             }
@@ -284,6 +564,67 @@ class VectorDB:
             logger.error("❌ Error obteniendo stats de Qdrant: %s", e)
             return {}
 
+    def export_snapshot(self, path: str, dtype: str = "float32", batch_size: int = 256, shards: int = 1) -> int:
+        """
+        Vuelca la colección (vectores + payloads) a un snapshot en disco
+        (ver src/db/snapshot.py y src/db/export_qdrant_vectors.py). Los ids deben ser enteros.
+        """
+        from src.db.export_qdrant_vectors import export_collection
+
+        return export_collection(
+            self.client,
+            self.collection_name,
+            path,
+            shards=shards,
+            batch_size=batch_size,
+            dtype=dtype,
+            model=self.MODEL_NAME,
+        )
+
+    def apply_storage_profile(self, name: Optional[str] = None) -> None:
+        """Migra la colección existente a otro perfil de almacenamiento y lo usa en las búsquedas."""
+        self.storage = get_profile(name) if name else self.storage
+        apply_profile(self.client, self.collection_name, self.storage)
+
+    def compact(self, apply: bool = False) -> Dict[str, int]:
+        """
+        Elimina puntos duplicados de un mismo (document_id, chunk_index) que dejaron
+        ingestas anteriores con ids aleatorios y mueve los conservados a su id estable
+        (ver src/db/qdrant_compact.py). Sin apply solo informa.
+        """
+        from src.db.qdrant_compact import compact_collection
+
+        return compact_collection(self.client, self.collection_name, apply=apply)
+
+    def import_snapshot(self, path: str, batch_size: int = 256) -> int:
+        """Carga un snapshot en la colección (upsert por lotes, mismos ids)."""
+        from src.db.snapshot import SnapshotReader
+
+        reader = SnapshotReader(path)
+        if reader.dim != self.EMBEDDING_DIM:
+            raise ValueError(
+                f"El snapshot tiene dim={reader.dim}, la colección espera {self.EMBEDDING_DIM}"
+            )
+
+        count = 0
+        for batch in reader.batches(batch_size):
+            payloads = batch["payloads"] or [{}] * len(batch["ids"])
+            self.client.upsert(
+                collection_name=self.collection_name,
+                points=[
+                    PointStruct(id=int(i), vector=v.tolist(), payload=p)
+                    for i, v, p in zip(batch["ids"], batch["vectors"], payloads)
+                ],
+                wait=True,
+            )
+            count += len(batch["ids"])
+        logger.info("✅ Snapshot importado en '%s': %d puntos", self.collection_name, count)
+        return count
+
+    def close(self) -> None:
+        """Libera el pool de embeddings (si lo hay)."""
+        self.embedder.close()
+
     def health_check(self) -> bool:
         """Comprueba si Qdrant responde correctamente."""
         try:
@@ -308,7 +649,8 @@ if __name__ == "__main__":
         metadata={"type": "Resolución", "year": 2024},
     )
     
-    results = vdb.search("regulación de energía eléctrica", limit=3)
+    query = "normas de 2024 sobre energía eléctrica"
+    results = vdb.search(query, limit=3, filters=VectorDB.filters_from_query(query))
     for r in results:
         print("\n---")
         print(f"Score: {r.score:.4f}")
@@ -5,21 +5,94 @@ VectorDB para Supabase pgvector + RPC match_chunks + Hybrid Search (Async)
 
 import logging
 import asyncio
+import os
 import re
-from typing import List, Dict, Optional
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+from typing import Any, AsyncIterator, Awaitable, Callable, List, Dict, Optional, Tuple
 
-from supabase import create_client, Client
+import numpy as np
+from supabase import AsyncClient
 from openai import AsyncOpenAI
 
 from src.config import (
     SUPABASE_URL,
     SUPABASE_KEY,
+    SUPABASE_BATCH_FETCH,
+    SUPABASE_POOL_SIZE,
+    SUPABASE_KEEPALIVE,
+    SUPABASE_TIMEOUT,
+    SUPABASE_HTTP2,
+    LOCAL_INDEX_ENABLED,
+    LOCAL_INDEX_FULL_RELOAD,
+    LOCAL_INDEX_NLIST,
+    LOCAL_INDEX_NPROBE,
+    LOCAL_INDEX_REFRESH,
+    LOCAL_INDEX_SNAPSHOT,
     OPENAI_API_KEY,
     OPENAI_EMBEDDING_MODEL,
+    EMBEDDING_CACHE_SIZE,
+    EMBEDDING_CACHE_TTL,
+    EMBEDDING_CACHE_PATH,
 )
+from src.db.embedding_cache import EmbeddingCache
+from src.db.local_index import LocalVectorIndex, parse_vector
+from src.db.snapshot import SnapshotReader, SnapshotWriter
+from src.db.supabase_async import PoolGate, create_async_supabase
 
 logger = logging.getLogger(__name__)
 
+# SQLSTATE de Postgres para columna inexistente (PostgREST lo devuelve en APIError.code)
+UNDEFINED_COLUMN = "42703"
+
+# Margen al releer por updated_at: now() es la hora de inicio de la transacción, así que
+# una escritura que confirma tarde puede quedar con updated_at anterior al último leído
+UPDATED_AT_OVERLAP = 120
+
+
+class RetrievalContext:
+    """
+    Estado de recuperación de un único mensaje.
+    Memoiza las búsquedas ya lanzadas para reutilizarlas entre etapas
+    (desambiguación + búsqueda híbrida) y cuenta las llamadas al backend.
+    """
+
+    def __init__(self):
+        self.calls: Counter = Counter()
+        self._tasks: Dict[Tuple, asyncio.Future] = {}
+        self._spawned: List[asyncio.Future] = []
+
+    async def once(self, key: Tuple, factory: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Ejecuta factory() una sola vez por key; las llamadas siguientes comparten el resultado.
+        """
+        task = self._tasks.get(key)
+        if task is None:
+            task = asyncio.ensure_future(factory())
+            self._tasks[key] = task
+        # shield: cancelar a quien espera no cancela el trabajo compartido
+        return await asyncio.shield(task)
+
+    def spawn(self, coro: Awaitable[Any]) -> asyncio.Future:
+        """
+        Lanza trabajo especulativo ligado a este mensaje (se cancela con cancel()).
+        """
+        task = asyncio.ensure_future(coro)
+        self._spawned.append(task)
+        return task
+
+    async def cancel(self) -> int:
+        """
+        Cancela todo el trabajo pendiente del contexto y espera a que termine.
+        Devuelve cuántas tareas seguían en curso.
+        """
+        pending = [t for t in list(self._tasks.values()) + self._spawned if not t.done()]
+        for t in pending:
+            t.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+        return len(pending)
+
 
 class VectorDBSupabase:
     """
@@ -33,35 +106,119 @@ class VectorDBSupabase:
         if not OPENAI_API_KEY:
             raise ValueError("Falta OPENAI_API_KEY en .env")
 
-        # El cliente de Supabase es síncrono por defecto, lo usaremos con to_thread para no bloquear
-        self.supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
+        # Cliente async nativo (sin to_thread) con pool keep-alive propio
+        self.supabase: AsyncClient = create_async_supabase(
+            SUPABASE_URL,
+            SUPABASE_KEY,
+            pool_size=SUPABASE_POOL_SIZE,
+            keepalive=SUPABASE_KEEPALIVE,
+            timeout=SUPABASE_TIMEOUT,
+            http2=SUPABASE_HTTP2,
+        )
+        self.pool = PoolGate(SUPABASE_POOL_SIZE)
         self.openai = AsyncOpenAI(api_key=OPENAI_API_KEY)
         self.embedding_model = OPENAI_EMBEDDING_MODEL or "text-embedding-3-small"
+        self.batch_fetch = SUPABASE_BATCH_FETCH
+
+        self.embedding_cache: Optional[EmbeddingCache] = None
+        if EMBEDDING_CACHE_SIZE > 0 or EMBEDDING_CACHE_PATH:
+            self.embedding_cache = EmbeddingCache(
+                max_size=EMBEDDING_CACHE_SIZE,
+                ttl=EMBEDDING_CACHE_TTL,
+                path=EMBEDDING_CACHE_PATH or None,
+            )
+
+        # Réplica local opcional de embedding_openai (se carga en segundo plano)
+        self.local_index: Optional[LocalVectorIndex] = None
+        self._index_task: Optional[asyncio.Task] = None
+        if LOCAL_INDEX_ENABLED:
+            self.local_index = LocalVectorIndex(nlist=LOCAL_INDEX_NLIST, nprobe=LOCAL_INDEX_NPROBE)
+
+        # Round trips a Supabase por tipo de consulta (para benchmarks/diagnóstico)
+        self.round_trips: Counter = Counter()
+        # chunks.updated_at (sql/chunk_updated_at.sql); se desactiva si la columna no existe
+        self._has_updated_at = True
 
         logger.info("✅ VectorDBSupabase inicializado (Async + Hybrid Search)")
 
-    async def generate_embedding(self, text: str) -> Optional[List[float]]:
+    async def _execute(
+        self,
+        label: str,
+        fn: Callable[[], Any],
+        ctx: Optional[RetrievalContext] = None,
+    ) -> Any:
+        """
+        Ejecuta una consulta async de Supabase (fn devuelve el awaitable de .execute())
+        dentro del pool, y la contabiliza.
+        """
+        self.round_trips[label] += 1
+        if ctx is not None:
+            ctx.calls[label] += 1
+        async with self.pool.acquire():
+            return await fn()
+
+    async def generate_embedding(
+        self, text: str, ctx: Optional[RetrievalContext] = None
+    ) -> Optional[List[float]]:
         """
-        Genera embedding con OpenAI (Async).
+        Genera embedding con OpenAI (Async), pasando antes por el cache de consultas.
+        Con ctx, el embedding de un mismo texto se calcula una sola vez por mensaje.
         """
         text = (text or "").strip()
         if not text:
             return None
 
+        if ctx is not None:
+            return await ctx.once(("embedding", text), lambda: self._generate_embedding(text, ctx))
+        return await self._generate_embedding(text)
+
+    async def _generate_embedding(
+        self, text: str, ctx: Optional[RetrievalContext] = None
+    ) -> Optional[List[float]]:
+        if self.embedding_cache is not None:
+            cached = self.embedding_cache.get(text, self.embedding_model)
+            if cached is not None:
+                if ctx is not None:
+                    ctx.calls["embedding_cache"] += 1
+                return cached.tolist()
+
+        if ctx is not None:
+            ctx.calls["embedding"] += 1
         try:
             resp = await self.openai.embeddings.create(
                 model=self.embedding_model,
                 input=text,
             )
-            return resp.data[0].embedding
+            embedding = resp.data[0].embedding
+            if self.embedding_cache is not None:
+                self.embedding_cache.put(text, self.embedding_model, embedding)
+            return embedding
         except Exception as e:
             logger.error(f"❌ Error generando embedding OpenAI: {e}")
             return None
 
-    async def search_by_text(self, query: str, limit: int = 5) -> List[Dict]:
+    async def search_by_text(
+        self,
+        query: str,
+        limit: int = 5,
+        ctx: Optional[RetrievalContext] = None,
+    ) -> List[Dict]:
         """
         Búsqueda por texto exacto (número y año) para mejorar precisión.
+        Con ctx, la misma búsqueda se ejecuta una sola vez por mensaje.
         """
+        if ctx is not None:
+            return await ctx.once(
+                ("text", query, limit), lambda: self._search_by_text(query, limit, ctx)
+            )
+        return await self._search_by_text(query, limit)
+
+    async def _search_by_text(
+        self,
+        query: str,
+        limit: int = 5,
+        ctx: Optional[RetrievalContext] = None,
+    ) -> List[Dict]:
         # Buscar todos los números en el mensaje
         nums = re.findall(r"\b(\d+)\b", query)
         if not nums:
@@ -85,7 +242,15 @@ class VectorDBSupabase:
             logger.info(f"🔎 Búsqueda textual: numero={numero}, año={año}")
             
             # Construir query base
-            query_builder = self.supabase.table("normas").select("id, numero, año, url, titulo")
+            columns = "id, numero, año, url, titulo"
+            if self.batch_fetch:
+                # Embebe el chunk de menor índice de cada norma en la misma consulta
+                columns += ", chunks(texto, indice)"
+            query_builder = self.supabase.table("normas").select(columns)
+            if self.batch_fetch:
+                query_builder = query_builder.order("indice", foreign_table="chunks").limit(
+                    1, foreign_table="chunks"
+                )
             
             # Filtro por número (exacto o ilike si es corto)
             if len(numero) >= 1:
@@ -95,20 +260,34 @@ class VectorDBSupabase:
             if año:
                 query_builder = query_builder.eq("año", año)
             
-            res = await asyncio.to_thread(lambda: query_builder.limit(limit).execute())
+            res = await self._execute("normas", lambda: query_builder.limit(limit).execute(), ctx)
+
+            # Primer chunk por norma_id (ya viene embebido en modo batch)
+            first_chunks: Dict = {}
+            if self.batch_fetch:
+                for row in res.data:
+                    embedded = row.pop("chunks", None) or []
+                    first_chunks[row["id"]] = embedded[:1]
             
             results = []
             for row in res.data:
-                # Traer el primer chunk para contexto
-                chunks = await asyncio.to_thread(
-                    lambda: self.supabase.table("chunks")
-                    .select("texto, indice")
-                    .eq("norma_id", row["id"])
-                    .limit(1)
-                    .execute()
-                )
+                if self.batch_fetch:
+                    chunk_rows = first_chunks.get(row["id"], [])
+                else:
+                    # Traer el primer chunk para contexto (menor índice, igual que en modo batch)
+                    chunks = await self._execute(
+                        "chunks",
+                        lambda: self.supabase.table("chunks")
+                        .select("texto, indice")
+                        .eq("norma_id", row["id"])
+                        .order("indice")
+                        .limit(1)
+                        .execute(),
+                        ctx,
+                    )
+                    chunk_rows = chunks.data
                 
-                texto = chunks.data[0]["texto"] if chunks.data else "Documento encontrado."
+                texto = chunk_rows[0]["texto"] if chunk_rows else "Documento encontrado."
                 
                 results.append({
                     "documento": texto[:300],
@@ -119,7 +298,7 @@ class VectorDBSupabase:
                         "año": row.get("año", "N/A"),
                         "url": row.get("url", ""),
                         "similarity": 1.0,
-                        "indice": chunks.data[0]["indice"] if chunks.data else 0,
+                        "indice": chunk_rows[0]["indice"] if chunk_rows else 0,
                         "texto_completo": texto,
                         "fuente": "búsqueda_textual"
                     }
@@ -134,85 +313,301 @@ class VectorDBSupabase:
         query: str,
         n_results: int = 3,
         threshold: float = 0.5,
+        ctx: Optional[RetrievalContext] = None,
     ) -> List[Dict]:
         """
         Busca chunks similares usando embeddings (Vector Search).
+        Con ctx, la misma búsqueda se ejecuta una sola vez por mensaje.
         """
-        query_embedding = await self.generate_embedding(query)
+        if ctx is not None:
+            return await ctx.once(
+                ("vector", query, n_results, threshold),
+                lambda: self._search_by_vector(query, n_results, threshold, ctx),
+            )
+        return await self._search_by_vector(query, n_results, threshold)
+
+    async def _search_by_vector(
+        self,
+        query: str,
+        n_results: int = 3,
+        threshold: float = 0.5,
+        ctx: Optional[RetrievalContext] = None,
+    ) -> List[Dict]:
+        query_embedding = await self.generate_embedding(query, ctx)
         if not query_embedding:
             return []
 
         try:
-            # RPC match_chunks (usamos to_thread para Supabase sync)
-            rpc = await asyncio.to_thread(
-                lambda: self.supabase.rpc(
-                    "match_chunks",
-                    {
-                        "query_embedding": query_embedding,
-                        "match_threshold": threshold,
-                        "match_count": n_results,
-                    },
-                ).execute()
+            if self._local_index_ready():
+                if ctx is not None:
+                    ctx.calls["local_index"] += 1
+                rows = self.local_index.search(query_embedding, n_results, threshold)
+            else:
+                rows = await self.match_chunks(query_embedding, n_results, threshold, ctx)
+            if not rows:
+                return []
+
+            if self.batch_fetch:
+                return await self._hydrate_matches_batched(rows, ctx)
+            return await self._hydrate_matches_per_row(rows, ctx)
+        except Exception as e:
+            logger.error(f"⚠️ Error en búsqueda vectorial: {e}")
+            return []
+
+    def _local_index_ready(self) -> bool:
+        if self.local_index is None:
+            return False
+        if self._index_task is None:
+            self._index_task = asyncio.create_task(self._local_index_loop())
+        return self.local_index.ready
+
+    async def _local_index_loop(self) -> None:
+        """
+        Carga inicial del índice local y refresco periódico: ids nuevos por watermark y,
+        con chunks.updated_at, filas cambiadas por debajo de él (re-embebidas o rellenadas).
+        Recarga completa cada LOCAL_INDEX_FULL_RELOAD segundos, o cuando el número de
+        chunks baja o cambia sin que se mueva la marca de versión (borrados).
+        """
+        if LOCAL_INDEX_SNAPSHOT and os.path.exists(LOCAL_INDEX_SNAPSHOT):
+            try:
+                self.local_index.load_snapshot(SnapshotReader(LOCAL_INDEX_SNAPSHOT))
+            except Exception as e:
+                logger.error(f"⚠️ Snapshot inválido, se carga desde Supabase: {e}")
+        version = None
+        while True:
+            try:
+                current = await self.corpus_version()
+                changed = (
+                    version is not None
+                    and current is not None
+                    and (current[0] < version[0] or (current[0] != version[0] and current[1] == version[1]))
+                )
+                expired = (
+                    LOCAL_INDEX_FULL_RELOAD > 0
+                    and self.local_index.ready
+                    and time.time() - self.local_index.reloaded_at >= LOCAL_INDEX_FULL_RELOAD
+                )
+                if changed or expired:
+                    await self.local_index.reload(self)
+                else:
+                    await self.local_index.refresh(self)
+                    if version is not None and version[1] is not None and self._has_updated_at:
+                        since = datetime.fromisoformat(version[1]) - timedelta(seconds=UPDATED_AT_OVERLAP)
+                        await self.local_index.sync_updated(self, since.isoformat())
+                version = current or version
+            except Exception as e:
+                logger.error(f"⚠️ Error refrescando índice local: {e}")
+            await asyncio.sleep(LOCAL_INDEX_REFRESH)
+
+    async def iter_embeddings(
+        self,
+        after_id: int = 0,
+        page_size: int = 500,
+        label: str = "embeddings_page",
+    ) -> AsyncIterator[List[Dict]]:
+        """Recorre chunks con embedding_openai no nulo por páginas de id creciente (keyset)."""
+        while True:
+            res = await self._execute(
+                label,
+                lambda: self.supabase.table("chunks")
+                .select("id, norma_id, indice, embedding_openai")
+                .gt("id", after_id)
+                .not_.is_("embedding_openai", "null")
+                .order("id")
+                .limit(page_size)
+                .execute(),
             )
+            rows = res.data or []
+            if rows:
+                yield rows
+            if len(rows) < page_size:
+                return
+            after_id = rows[-1]["id"]
 
-            if not rpc.data:
-                return []
+    async def iter_updated_embeddings(
+        self,
+        since: str,
+        page_size: int = 500,
+        label: str = "embeddings_updated",
+    ) -> AsyncIterator[List[Dict]]:
+        """
+        Recorre chunks con embedding_openai no nulo y updated_at >= since, por páginas
+        ordenadas por (updated_at, id).
+        """
+        offset = 0
+        while True:
+            res = await self._execute(
+                label,
+                lambda: self.supabase.table("chunks")
+                .select("id, norma_id, indice, embedding_openai")
+                .gte("updated_at", since)
+                .not_.is_("embedding_openai", "null")
+                .order("updated_at")
+                .order("id")
+                .range(offset, offset + page_size - 1)
+                .execute(),
+            )
+            rows = res.data or []
+            if rows:
+                yield rows
+            if len(rows) < page_size:
+                return
+            offset += len(rows)
 
-            results = []
-            for row in rpc.data:
-                norma_id = row.get("norma_id")
-                indice = row.get("indice")
-                similarity = float(row.get("similarity", 0) or 0)
-
-                tr = await asyncio.to_thread(
-                    lambda: self.supabase.table("chunks")
-                    .select("texto, normas(numero, año, url)")
-                    .eq("norma_id", norma_id)
-                    .eq("indice", indice)
-                    .limit(1)
-                    .execute()
+    async def export_snapshot(self, path: str, dtype: str = "float32", page_size: int = 500) -> int:
+        """Escribe chunks.embedding_openai a un snapshot en disco (ver src/db/snapshot.py)."""
+        writer = None
+        try:
+            async for rows in self.iter_embeddings(page_size=page_size, label="snapshot"):
+                vectors = np.stack([parse_vector(r["embedding_openai"]) for r in rows])
+                if writer is None:
+                    writer = SnapshotWriter(
+                        path,
+                        dim=vectors.shape[1],
+                        dtype=dtype,
+                        columns=("norma_id", "indice"),
+                        source="supabase:chunks.embedding_openai",
+                        model=self.embedding_model,
+                    )
+                writer.append(
+                    [r["id"] for r in rows],
+                    vectors,
+                    columns={
+                        "norma_id": [r["norma_id"] for r in rows],
+                        "indice": [r.get("indice") or 0 for r in rows],
+                    },
                 )
+                logger.info(f"💾 Snapshot: {writer.count} vectores...")
+        except BaseException:
+            if writer is not None:
+                writer.abort()
+            raise
+        if writer is None:
+            return 0
+        writer.close()
+        return writer.count
 
-                if not tr.data:
-                    continue
+    async def match_chunks(
+        self,
+        query_embedding: List[float],
+        n_results: int = 3,
+        threshold: float = 0.5,
+        ctx: Optional[RetrievalContext] = None,
+    ) -> List[Dict]:
+        """
+        Ejecuta el RPC match_chunks y devuelve las filas crudas (norma_id, indice, similarity).
+        """
+        rpc = await self._execute(
+            "match_chunks",
+            lambda: self.supabase.rpc(
+                "match_chunks",
+                {
+                    "query_embedding": query_embedding,
+                    "match_threshold": threshold,
+                    "match_count": n_results,
+                },
+            ).execute(),
+            ctx,
+        )
+        return rpc.data or []
 
-                row0 = tr.data[0]
-                texto_completo = row0.get("texto") or ""
-                norma_meta = row0.get("normas") or {}
+    async def _hydrate_matches_batched(
+        self, rows: List[Dict], ctx: Optional[RetrievalContext] = None
+    ) -> List[Dict]:
+        """
+        Trae texto + metadata de la norma para todos los matches en UNA sola consulta.
+        """
+        norma_ids = sorted({row.get("norma_id") for row in rows})
+        indices = sorted({row.get("indice") for row in rows})
 
-                results.append({
-                    "documento": texto_completo[:300],
-                    "distancia": 1 - similarity,
-                    "metadata": {
-                        "norma_id": norma_id,
-                        "normanumero": norma_meta.get("numero", "N/A"),
-                        "año": norma_meta.get("año", "N/A"),
-                        "url": norma_meta.get("url", ""),
-                        "similarity": similarity,
-                        "indice": indice,
-                        "texto_completo": texto_completo,
-                        "fuente": "búsqueda_vectorial"
-                    }
-                })
-            return results
-        except Exception as e:
-            logger.error(f"⚠️ Error en búsqueda vectorial: {e}")
-            return []
+        # in_() por norma_id e indice trae un superconjunto (producto cruzado),
+        # luego se filtra por los pares exactos devueltos por el RPC.
+        tr = await self._execute(
+            "chunks",
+            lambda: self.supabase.table("chunks")
+            .select("norma_id, indice, texto, normas(numero, año, url)")
+            .in_("norma_id", norma_ids)
+            .in_("indice", indices)
+            .execute(),
+            ctx,
+        )
+
+        by_key = {}
+        for row0 in tr.data or []:
+            by_key.setdefault((row0.get("norma_id"), row0.get("indice")), row0)
+
+        results = []
+        for row in rows:
+            row0 = by_key.get((row.get("norma_id"), row.get("indice")))
+            if row0 is None:
+                continue
+            results.append(self._format_vector_result(row, row0))
+        return results
+
+    async def _hydrate_matches_per_row(
+        self, rows: List[Dict], ctx: Optional[RetrievalContext] = None
+    ) -> List[Dict]:
+        """
+        Modo original: una consulta chunks + normas(...) por cada match (N+1).
+        """
+        results = []
+        for row in rows:
+            norma_id = row.get("norma_id")
+            indice = row.get("indice")
+
+            tr = await self._execute(
+                "chunks",
+                lambda: self.supabase.table("chunks")
+                .select("texto, normas(numero, año, url)")
+                .eq("norma_id", norma_id)
+                .eq("indice", indice)
+                .limit(1)
+                .execute(),
+                ctx,
+            )
+
+            if not tr.data:
+                continue
+            results.append(self._format_vector_result(row, tr.data[0]))
+        return results
+
+    @staticmethod
+    def _format_vector_result(row: Dict, row0: Dict) -> Dict:
+        similarity = float(row.get("similarity", 0) or 0)
+        texto_completo = row0.get("texto") or ""
+        norma_meta = row0.get("normas") or {}
+
+        return {
+            "documento": texto_completo[:300],
+            "distancia": 1 - similarity,
+            "metadata": {
+                "norma_id": row.get("norma_id"),
+                "normanumero": norma_meta.get("numero", "N/A"),
+                "año": norma_meta.get("año", "N/A"),
+                "url": norma_meta.get("url", ""),
+                "similarity": similarity,
+                "indice": row.get("indice"),
+                "texto_completo": texto_completo,
+                "fuente": "búsqueda_vectorial"
+            }
+        }
 
     async def search(
         self,
         query: str,
         n_results: int = 3,
         threshold: float = 0.5,
+        ctx: Optional[RetrievalContext] = None,
     ) -> Optional[List[Dict]]:
         """
         Pipeline Hybrid Search: Texto + Vectorial.
+        Con ctx, reutiliza la búsqueda textual ya hecha en este mensaje.
         """
         logger.info(f"🔍 Búsqueda Híbrida iniciando: {query}")
         
         # Ejecutamos ambas búsquedas en paralelo
-        text_task = self.search_by_text(query)
-        vector_task = self.search_by_vector(query, n_results, threshold)
+        text_task = self.search_by_text(query, ctx=ctx)
+        vector_task = self.search_by_vector(query, n_results, threshold, ctx)
         
         text_results, vector_results = await asyncio.gather(text_task, vector_task)
         
@@ -231,12 +626,50 @@ class VectorDBSupabase:
                 
         return final_results if final_results else None
 
+    async def corpus_version(self) -> Optional[Tuple]:
+        """
+        Versión del corpus como (número de chunks, último updated_at): cambia al cargar
+        o borrar chunks y con cualquier UPDATE en el lugar (texto editado, embedding
+        recalculado), gracias al trigger de sql/chunk_updated_at.sql. Sin esa migración
+        se usa (número de chunks, id máximo), que no ve los cambios en el lugar.
+        """
+        marker = "updated_at" if self._has_updated_at else "id"
+        try:
+            res = await self._execute(
+                "corpus_version",
+                lambda: self.supabase.table("chunks")
+                .select(marker, count="exact")
+                .order(marker, desc=True)
+                .limit(1)
+                .execute(),
+            )
+            return (res.count or 0, res.data[0][marker] if res.data else None)
+        except Exception as e:
+            if self._has_updated_at and getattr(e, "code", None) == UNDEFINED_COLUMN:
+                logger.warning("⚠️ chunks.updated_at no existe (sql/chunk_updated_at.sql): versión por id máximo")
+                self._has_updated_at = False
+                return await self.corpus_version()
+            logger.error(f"⚠️ Error obteniendo versión del corpus: {e}")
+            return None
+
+    def pool_stats(self) -> Dict:
+        """Métricas del pool de conexiones a Supabase (espera por conexión libre)."""
+        return self.pool.stats()
+
+    async def aclose(self) -> None:
+        if self._index_task is not None:
+            self._index_task.cancel()
+        if self.embedding_cache is not None:
+            self.embedding_cache.close()
+        await self.supabase.postgrest.session.aclose()
+
     async def health_check(self) -> bool:
         """
         Verifica que Supabase esté disponible (Async).
         """
         try:
-            _ = await asyncio.to_thread(
+            _ = await self._execute(
+                "health",
                 lambda: self.supabase.table("chunks").select("id").limit(1).execute()
             )
             return True
@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+"""
+Prueba de punta a punta del pipeline de la Batch API (src/db/batch_embeddings.py)
+contra un servidor FALSO de OpenAI: /v1/files, /v1/batches y /v1/files/{id}/content.
+
+Levanta el servidor, genera N chunks sintéticos, y corre build (shards pequeños para
+forzar varios), submit, poll e ingest; la escritura va a un diccionario en memoria
+en lugar de Supabase. Comprueba que cada chunk recibió su embedding y su content_hash.
+
+Uso:
+    python -m src.scripts.batch_smoke [n_chunks] [lineas_por_shard]
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+from aiohttp import web
+
+FAKE_API_PORT = 8083
+DIM = 8
+
+os.environ["OPENAI_BASE_URL"] = f"http://127.0.0.1:{FAKE_API_PORT}/v1"
+os.environ.setdefault("OPENAI_API_KEY", "sk-smoke")
+
+from openai import AsyncOpenAI  # noqa: E402
+
+from src.db.batch_embeddings import BatchPipeline  # noqa: E402
+from src.db.content_hash import content_hash  # noqa: E402
+
+
+def fake_embedding(text: str):
+    digest = hashlib.sha256(text.encode("utf-8")).digest()
+    return [b / 255 for b in digest[:DIM]]
+
+
+class FakeBatchAPI:
+    """Archivos y batches en memoria; cada batch avanza un estado por consulta."""
+
+    STEPS = ["validating", "in_progress", "finalizing", "completed"]
+
+    def __init__(self):
+        self.files = {}
+        self.batches = {}
+
+    def _file(self, file_id: str, content: bytes, filename: str, purpose: str) -> dict:
+        self.files[file_id] = content
+        return {
+            "id": file_id,
+            "object": "file",
+            "bytes": len(content),
+            "created_at": int(time.time()),
+            "filename": filename,
+            "purpose": purpose,
+            "status": "processed",
+        }
+
+    async def upload(self, request: web.Request) -> web.Response:
+        form = await request.post()
+        upload = form["file"]
+        content = upload.file.read()
+        return web.json_response(self._file(f"file-{len(self.files)}", content, upload.filename, form["purpose"]))
+
+    async def create_batch(self, request: web.Request) -> web.Response:
+        body = await request.json()
+        batch_id = f"batch_{len(self.batches)}"
+        self.batches[batch_id] = {
+            "id": batch_id,
+            "object": "batch",
+            "endpoint": body["endpoint"],
+            "input_file_id": body["input_file_id"],
+            "completion_window": body["completion_window"],
+            "created_at": int(time.time()),
+            "status": "validating",
+            "output_file_id": None,
+            "error_file_id": None,
+            "metadata": body.get("metadata"),
+        }
+        return web.json_response(self.batches[batch_id])
+
+    def _complete(self, batch: dict) -> None:
+        lines = self.files[batch["input_file_id"]].decode("utf-8").splitlines()
+        out = []
+        for line in lines:
+            req = json.loads(line)
+            out.append(json.dumps({
+                "id": f"resp-{req['custom_id']}",
+                "custom_id": req["custom_id"],
+                "response": {
+                    "status_code": 200,
+                    "body": {"data": [{"index": 0, "embedding": fake_embedding(req["body"]["input"])}]},
+                },
+                "error": None,
+            }))
+        output_id = f"file-{len(self.files)}"
+        self._file(output_id, ("\n".join(out) + "\n").encode("utf-8"), "output.jsonl", "batch_output")
+        batch["output_file_id"] = output_id
+        batch["request_counts"] = {"completed": len(lines), "failed": 0, "total": len(lines)}
+
+    async def get_batch(self, request: web.Request) -> web.Response:
+        batch = self.batches[request.match_info["batch_id"]]
+        step = self.STEPS.index(batch["status"])
+        if step < len(self.STEPS) - 1:
+            batch["status"] = self.STEPS[step + 1]
+            if batch["status"] == "completed":
+                self._complete(batch)
+        return web.json_response(batch)
+
+    async def content(self, request: web.Request) -> web.Response:
+        return web.Response(body=self.files[request.match_info["file_id"]], content_type="application/jsonl")
+
+
+async def main():
+    n_chunks = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    lines_per_shard = int(sys.argv[2]) if len(sys.argv) > 2 else 500
+
+    fake = FakeBatchAPI()
+    app = web.Application(client_max_size=256 * 2**20)
+    app.router.add_post("/v1/files", fake.upload)
+    app.router.add_post("/v1/batches", fake.create_batch)
+    app.router.add_get("/v1/batches/{batch_id}", fake.get_batch)
+    app.router.add_get("/v1/files/{file_id}/content", fake.content)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, "127.0.0.1", FAKE_API_PORT).start()
+
+    workdir = tempfile.mkdtemp(prefix="batch_smoke_")
+    texts = {i: f"Artículo {i}. Texto de prueba de la resolución CREG {i}." for i in range(1, n_chunks + 1)}
+    texts[7] = "   "  # se omite en la validación
+
+    async def rows():
+        for i, t in texts.items():
+            yield {"id": i, "texto": t}
+
+    stored = {}
+    hashed = {}
+
+    async def write(ids, vectors, hashes):
+        stored.update(zip(ids, vectors))
+        hashed.update(zip(ids, hashes))
+
+    t0 = time.perf_counter()
+    try:
+        pipeline = BatchPipeline(AsyncOpenAI(), workdir, max_lines=lines_per_shard)
+        shards = await pipeline.build(rows())
+        await pipeline.submit()
+        await pipeline.poll(interval=0.01)
+        written = await pipeline.ingest(write=write, rows_per_write=200)
+    finally:
+        await runner.cleanup()
+
+    expected = {i for i, t in texts.items() if t.strip()}
+    ok = (
+        set(stored) == expected
+        and all(stored[i] == fake_embedding(texts[i]) for i in expected)
+        and all(hashed[i] == content_hash(texts[i]) for i in expected)
+    )
+
+    print("=" * 60)
+    print(f"📝 Shards: {len(shards)} | omitidos: {pipeline.manifest.get('skipped')}")
+    print(f"📥 Embeddings escritos: {written} / {len(expected)} esperados")
+    print(f"{'✅' if ok else '❌'} Contenido verificado | ⏱️ {(time.perf_counter() - t0) * 1000:.0f} ms")
+    shutil.rmtree(workdir, ignore_errors=True)
+    if not ok:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+"""
+Benchmark: escalado del pool de embeddings (src/db/embedding_service.py).
+Mide chunks/s con 1 proceso y con N réplicas del modelo, y la eficiencia
+respecto a escalado lineal.
+
+Uso:
+    python -m src.scripts.bench_embedding_pool [n_chunks] [workers,workers,...]
+"""
+
+import os
+import sys
+import time
+
+from src.db.embedding_service import create_embedding_service
+from src.scripts.bench_qdrant_ingest import SAMPLE
+
+MODEL_NAME = "all-MiniLM-L6-v2"
+
+
+def main():
+    n_chunks = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    cpus = os.cpu_count() or 1
+    counts = [int(x) for x in sys.argv[2].split(",")] if len(sys.argv) > 2 else sorted({1, 2, 4, 8, cpus})
+    texts = [SAMPLE.format(i=i) for i in range(n_chunks)]
+
+    print("=" * 70)
+    print(f"📊 BENCHMARK pool de embeddings ({n_chunks} chunks, {cpus} núcleos)")
+    print("=" * 70)
+
+    base = None
+    for workers in counts:
+        with create_embedding_service(MODEL_NAME, workers=workers) as service:
+            service.encode(texts[:64])  # calentamiento
+            t0 = time.perf_counter()
+            service.encode(texts)
+            rate = n_chunks / (time.perf_counter() - t0)
+        base = base or rate
+        speedup = rate / base
+        print(
+            f"  workers={workers:<3} {rate:9.1f} chunks/s | x{speedup:.2f}"
+            f" | eficiencia {speedup / workers:.0%}"
+        )
+
+
+if __name__ == "__main__":
+    main()
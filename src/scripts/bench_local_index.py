@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+Benchmark: índice vectorial local (exacto e IVF) frente al RPC match_chunks.
+Reporta recall@k respecto al RPC y latencia p50/p95 de cada variante.
+
+Uso:
+    python -m src.scripts.bench_local_index [k] [nlist] [nprobe,nprobe,...]
+"""
+
+import asyncio
+import statistics
+import sys
+import time
+
+from src.db.local_index import LocalVectorIndex
+from src.db.vectordb_supabase import VectorDBSupabase
+from src.scripts.bench_vector_search import QUERIES, percentile
+
+
+def report(label, latencies, recalls=None):
+    line = f"  {label:<22} p50: {statistics.median(latencies):8.2f} ms | p95: {percentile(latencies, 95):8.2f} ms"
+    if recalls is not None:
+        line += f" | recall@k: {statistics.mean(recalls):.3f}"
+    print(line)
+
+
+async def main():
+    k = int(sys.argv[1]) if len(sys.argv) > 1 else 3
+    nlist = int(sys.argv[2]) if len(sys.argv) > 2 else 64
+    nprobes = [int(x) for x in sys.argv[3].split(",")] if len(sys.argv) > 3 else [1, 4, 8, 16]
+    threshold = 0.4
+
+    vdb = VectorDBSupabase()
+    embeddings = [await vdb.generate_embedding(q) for q in QUERIES]
+    embeddings = [e for e in embeddings if e]
+
+    index = LocalVectorIndex(nlist=0)
+    t0 = time.perf_counter()
+    await index.refresh(vdb)
+    load_s = time.perf_counter() - t0
+
+    print("=" * 70)
+    print(f"📊 BENCHMARK índice local (k={k}, threshold={threshold})")
+    print(f"  Carga: {len(index)} vectores en {load_s:.1f} s | {index.stats()}")
+    print("=" * 70)
+
+    # Referencia: el RPC de Supabase
+    truth, latencies = [], []
+    for emb in embeddings:
+        t0 = time.perf_counter()
+        rows = await vdb.match_chunks(emb, k, threshold)
+        latencies.append((time.perf_counter() - t0) * 1000)
+        truth.append({(r["norma_id"], r["indice"]) for r in rows})
+    report("RPC match_chunks", latencies)
+
+    def run(label):
+        latencies, recalls = [], []
+        for emb, expected in zip(embeddings, truth):
+            t0 = time.perf_counter()
+            rows = index.search(emb, k, threshold)
+            latencies.append((time.perf_counter() - t0) * 1000)
+            got = {(r["norma_id"], r["indice"]) for r in rows}
+            recalls.append(len(got & expected) / len(expected) if expected else 1.0)
+        report(label, latencies, recalls)
+
+    run("local exacto")
+
+    index.nlist = nlist
+    index.train()
+    for nprobe in nprobes:
+        index.nprobe = nprobe
+        run(f"local IVF nprobe={nprobe}")
+
+    await vdb.aclose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
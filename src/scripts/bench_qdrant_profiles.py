@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+Reporte: recall@k, latencia (p50/p95) y memoria de los perfiles de almacenamiento
+(src/db/qdrant_storage.py) sobre nuestro corpus.
+
+Copia los vectores de la colección origen (por defecto creg_documents) a una
+colección temporal por perfil, espera a que Qdrant termine de indexar y busca
+con vectores del propio corpus como queries. La referencia es la búsqueda exacta
+(sin HNSW ni cuantización) sobre float32. La memoria es una estimación
+(vectores en RAM + grafo HNSW); el uso real depende de la versión y de mmap.
+
+Uso:
+    python -m src.scripts.bench_qdrant_profiles [n_queries] [k] [perfil,perfil,...] [--source COLECCIÓN]
+"""
+
+import os
+import random
+import sys
+import time
+
+from qdrant_client import QdrantClient
+from qdrant_client.models import PointStruct, SearchParams
+
+from src.db.qdrant_storage import PROFILES, wait_green
+from src.scripts.bench_qdrant_search import percentile
+
+PREFIX = "bench_profile_"
+COPY_BATCH = 512
+
+
+def copy_collection(client, source, target, profile, dim):
+    client.create_collection(
+        collection_name=target,
+        vectors_config=profile.vectors_config(dim),
+        hnsw_config=profile.hnsw_config(),
+        quantization_config=profile.quantization_config(),
+    )
+    offset = None
+    while True:
+        points, offset = client.scroll(source, limit=COPY_BATCH, offset=offset, with_payload=False, with_vectors=True)
+        if points:
+            client.upsert(target, points=[PointStruct(id=p.id, vector=p.vector) for p in points], wait=False)
+        if offset is None:
+            break
+    wait_green(client, target)
+
+
+def main():
+    args = list(sys.argv[1:])
+    source = os.getenv("QDRANT_COLLECTION", "creg_documents")
+    if "--source" in args:
+        i = args.index("--source")
+        source = args[i + 1]
+        del args[i:i + 2]
+    n_queries = int(args[0]) if len(args) > 0 else 200
+    k = int(args[1]) if len(args) > 1 else 10
+    names = args[2].split(",") if len(args) > 2 else list(PROFILES)
+
+    client = QdrantClient(
+        host=os.getenv("QDRANT_HOST", "localhost"),
+        port=int(os.getenv("QDRANT_PORT", "6333")),
+        api_key=os.getenv("QDRANT_API_KEY"),
+        timeout=120,
+    )
+    info = client.get_collection(source)
+    dim = info.config.params.vectors.size
+    points = info.points_count
+
+    # Queries: vectores de puntos al azar del corpus
+    sample, offset = [], None
+    while True:
+        batch, offset = client.scroll(source, limit=COPY_BATCH, offset=offset, with_payload=False, with_vectors=True)
+        sample.extend(p.vector for p in batch if random.random() < n_queries * 2 / max(points, 1))
+        if offset is None or len(sample) >= n_queries:
+            break
+    queries = sample[:n_queries]
+
+    exact = [
+        {h.id for h in client.search(source, query_vector=q, limit=k, search_params=SearchParams(exact=True))}
+        for q in queries
+    ]
+
+    print("=" * 92)
+    print(f"📊 PERFILES DE ALMACENAMIENTO ('{source}': {points} puntos x {dim} dims, {len(queries)} queries, k={k})")
+    print("=" * 92)
+    print(f"  {'perfil':<15} {'recall@k':>9} {'p50 ms':>8} {'p95 ms':>8} {'RAM est.':>10} {'indexado':>9}")
+
+    for name in names:
+        profile = PROFILES[name]
+        target = PREFIX + name.replace("-", "_")
+        if client.collection_exists(target):
+            client.delete_collection(target)
+        try:
+            t0 = time.perf_counter()
+            copy_collection(client, source, target, profile, dim)
+            build = time.perf_counter() - t0
+
+            params = profile.search_params()
+            latencies, hits = [], 0
+            for q, truth in zip(queries, exact):
+                t0 = time.perf_counter()
+                found = client.search(target, query_vector=q, limit=k, search_params=params)
+                latencies.append((time.perf_counter() - t0) * 1000)
+                hits += len(truth & {h.id for h in found})
+            recall = hits / max(sum(len(t) for t in exact), 1)
+            print(
+                f"  {name:<15} {recall:>9.3f} {percentile(latencies, 50):>8.2f} {percentile(latencies, 95):>8.2f}"
+                f" {profile.estimated_ram(points, dim) / 2**20:>8.1f}MB {build:>8.0f}s"
+            )
+        finally:
+            client.delete_collection(target)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+Benchmark: latencia (p50/p95) de búsquedas en un Qdrant local.
+Compara el camino original (requests.post con una conexión nueva por búsqueda y
+payload completo) con el QdrantClient reutilizado (REST y gRPC), con selección de
+campos del payload y con search_batch (varias queries en un request).
+
+Los vectores de las queries se calculan una vez: se mide solo el transporte y la búsqueda.
+Usa una colección temporal que se borra al terminar.
+
+Uso:
+    python -m src.scripts.bench_qdrant_search [n_chunks] [iteraciones] [limit]
+"""
+
+import os
+import statistics
+import sys
+import time
+
+import requests
+from qdrant_client import QdrantClient
+
+from src.db.vectordb_qdrant import SearchRequest, VectorDB
+from src.scripts.bench_qdrant_ingest import SAMPLE
+
+COLLECTION = "bench_search_tmp"
+FIELDS = ["document_id", "chunk_index", "text"]
+QUERIES = [
+    "fórmula tarifaria de gas",
+    "regulación de energía eléctrica",
+    "transmisión y distribución",
+    "calidad del servicio de energía",
+    "Resolución 101-042",
+]
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    k = max(0, min(len(ordered) - 1, round(pct / 100 * (len(ordered) - 1))))
+    return ordered[k]
+
+
+def measure(fn, vectors, iterations):
+    latencies = []
+    for _ in range(iterations):
+        for vec in vectors:
+            t0 = time.perf_counter()
+            fn(vec)
+            latencies.append((time.perf_counter() - t0) * 1000)
+    return latencies
+
+
+def report(label, latencies, per_request=1):
+    print(
+        f"  {label:<28} p50 {percentile(latencies, 50):7.2f} ms   p95 {percentile(latencies, 95):7.2f} ms"
+        f"   media {statistics.mean(latencies) / per_request:7.2f} ms/query"
+    )
+
+
+def main():
+    n_chunks = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    iterations = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    limit = int(sys.argv[3]) if len(sys.argv) > 3 else 5
+    host = os.getenv("QDRANT_HOST", "localhost")
+    port = int(os.getenv("QDRANT_PORT", "6333"))
+
+    vdb = VectorDB(collection_name=COLLECTION, prefer_grpc=False)
+    texts = [SAMPLE.format(i=i) for i in range(n_chunks)]
+    vdb.add_documents(
+        texts,
+        ids=[f"BENCH-{i // 10}" for i in range(n_chunks)],
+        metadatas=[{"chunk_index": i % 10, "year": 2000 + i % 25, "resolution_number": str(i)} for i in range(n_chunks)],
+    )
+    vectors = [v.tolist() for v in vdb.embed_texts(QUERIES)]
+
+    print("=" * 78)
+    print(f"📊 BENCHMARK búsqueda Qdrant ({n_chunks} puntos, {len(QUERIES)} queries x {iterations}, limit={limit})")
+    print("=" * 78)
+
+    try:
+        url = f"http://{host}:{port}/collections/{COLLECTION}/points/search"
+        report(
+            "antes (requests.post)",
+            measure(
+                lambda v: requests.post(url, json={"vector": v, "limit": limit, "with_payload": True}).json(),
+                vectors,
+                iterations,
+            ),
+        )
+        report(
+            "client REST",
+            measure(lambda v: vdb.client.search(COLLECTION, query_vector=v, limit=limit, with_payload=True), vectors, iterations),
+        )
+        report(
+            "client REST + campos",
+            measure(lambda v: vdb.client.search(COLLECTION, query_vector=v, limit=limit, with_payload=FIELDS), vectors, iterations),
+        )
+
+        grpc = QdrantClient(
+            host=host,
+            grpc_port=int(os.getenv("QDRANT_GRPC_PORT", "6334")),
+            api_key=os.getenv("QDRANT_API_KEY"),
+            prefer_grpc=True,
+        )
+        try:
+            report(
+                "client gRPC + campos",
+                measure(lambda v: grpc.search(COLLECTION, query_vector=v, limit=limit, with_payload=FIELDS), vectors, iterations),
+            )
+        except Exception as e:
+            print(f"  client gRPC: no disponible ({e.__class__.__name__}: {e})")
+
+        batch = [SearchRequest(vector=v, limit=limit, with_payload=FIELDS) for v in vectors]
+        report(
+            f"search_batch ({len(vectors)} queries)",
+            measure(lambda _: vdb.client.search_batch(COLLECTION, requests=batch), [None], iterations),
+            per_request=len(vectors),
+        )
+    finally:
+        vdb.client.delete_collection(COLLECTION)
+        vdb.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Benchmark: round trips y latencia (p50/p95) de VectorDBSupabase.search_by_vector
+comparando el modo original (una consulta por match) con el modo batch (una sola consulta).
+
+Uso:
+    python -m src.scripts.bench_vector_search [iteraciones] [n_results]
+"""
+
+import asyncio
+import statistics
+import sys
+import time
+
+from src.db.vectordb_supabase import VectorDBSupabase
+
+QUERIES = [
+    "fórmula tarifaria de gas",
+    "regulación de energía eléctrica",
+    "transmisión y distribución",
+    "calidad del servicio de energía",
+    "Resolución 101-042",
+]
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    k = max(0, min(len(ordered) - 1, round(pct / 100 * (len(ordered) - 1))))
+    return ordered[k]
+
+
+async def run_mode(vdb, embeddings, batch_fetch, iterations, n_results, threshold):
+    vdb.batch_fetch = batch_fetch
+    vdb.round_trips.clear()
+    latencies = []
+    calls = 0
+
+    for _ in range(iterations):
+        for emb in embeddings:
+            t0 = time.perf_counter()
+            rows = await vdb.match_chunks(emb, n_results, threshold)
+            if rows:
+                if batch_fetch:
+                    await vdb._hydrate_matches_batched(rows)
+                else:
+                    await vdb._hydrate_matches_per_row(rows)
+            latencies.append((time.perf_counter() - t0) * 1000)
+            calls += 1
+
+    return {
+        "round_trips": sum(vdb.round_trips.values()) / calls,
+        "p50": statistics.median(latencies),
+        "p95": percentile(latencies, 95),
+    }
+
+
+async def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+    n_results = int(sys.argv[2]) if len(sys.argv) > 2 else 3
+    threshold = 0.4
+
+    vdb = VectorDBSupabase()
+
+    # Los embeddings se generan una vez: el benchmark mide solo Supabase
+    embeddings = [await vdb.generate_embedding(q) for q in QUERIES]
+    embeddings = [e for e in embeddings if e]
+
+    print("=" * 70)
+    print(f"📊 BENCHMARK search_by_vector (n_results={n_results}, iteraciones={iterations})")
+    print("=" * 70)
+
+    for label, batch_fetch in (("antes (N+1)", False), ("después (batch)", True)):
+        r = await run_mode(vdb, embeddings, batch_fetch, iterations, n_results, threshold)
+        print(
+            f"  {label:<16} round trips/búsqueda: {r['round_trips']:.1f}"
+            f" | p50: {r['p50']:.1f} ms | p95: {r['p95']:.1f} ms"
+        )
+
+    print(f"  Pool Supabase: {vdb.pool_stats()}")
+    await vdb.aclose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
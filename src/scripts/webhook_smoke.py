@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Prueba de humo del modo webhook contra un servidor FALSO de la API de Telegram.
+
+Levanta localmente:
+  1) un endpoint que imita https://api.telegram.org/bot<token>/<método>
+  2) el WebhookServer de CREGBot apuntando a ese endpoint (TELEGRAM_API_BASE_URL)
+y envía N updates /start concurrentes (no tocan OpenAI), midiendo cuántas
+respuestas llegan y la latencia total.
+
+Uso:
+    python -m src.scripts.webhook_smoke [n_updates]
+"""
+
+import asyncio
+import os
+import sys
+import time
+
+from aiohttp import ClientSession, web
+
+FAKE_API_PORT = 8081
+WEBHOOK_PORT = 8082
+
+os.environ["TELEGRAM_API_BASE_URL"] = f"http://127.0.0.1:{FAKE_API_PORT}/bot"
+os.environ.setdefault("WEBHOOK_SECRET", "smoke-secret")
+
+from src.config import WEBHOOK_SECRET  # noqa: E402
+from src.bot import CREGBot  # noqa: E402
+from src.webhook import SECRET_HEADER, WebhookServer  # noqa: E402
+
+
+class FakeTelegramAPI:
+    """Responde a los métodos de la Bot API que usa el bot y registra las llamadas."""
+
+    def __init__(self):
+        self.calls = []
+        self.message_id = 0
+
+    async def handle(self, request: web.Request) -> web.Response:
+        method = request.match_info["method"]
+        self.calls.append(method)
+        if method == "getMe":
+            result = {"id": 1, "is_bot": True, "first_name": "CREG", "username": "creg_bot"}
+        elif method in ("sendMessage", "editMessageText"):
+            self.message_id += 1
+            result = {
+                "message_id": self.message_id,
+                "date": int(time.time()),
+                "chat": {"id": 1, "type": "private"},
+                "text": "ok",
+            }
+        else:
+            result = True
+        return web.json_response({"ok": True, "result": result})
+
+
+def make_update(update_id: int) -> dict:
+    return {
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "date": int(time.time()),
+            "chat": {"id": 1000 + update_id, "type": "private"},
+            "from": {"id": 1000 + update_id, "is_bot": False, "first_name": "Test"},
+            "text": "/start",
+            "entities": [{"type": "bot_command", "offset": 0, "length": 6}],
+        },
+    }
+
+
+async def main():
+    n_updates = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+
+    fake = FakeTelegramAPI()
+    api = web.Application()
+    api.router.add_post("/bot{token}/{method}", fake.handle)
+    api_runner = web.AppRunner(api)
+    await api_runner.setup()
+    await web.TCPSite(api_runner, "127.0.0.1", FAKE_API_PORT).start()
+
+    server = WebhookServer(CREGBot(), secret_token=WEBHOOK_SECRET)
+    await server.start("127.0.0.1", WEBHOOK_PORT)
+
+    url = f"http://127.0.0.1:{WEBHOOK_PORT}{server.path}"
+    t0 = time.perf_counter()
+    async with ClientSession() as session:
+        async def post(i):
+            async with session.post(url, json=make_update(i), headers={SECRET_HEADER: WEBHOOK_SECRET}) as r:
+                return r.status
+
+        statuses = await asyncio.gather(*(post(i) for i in range(1, n_updates + 1)))
+
+    while server.pending:
+        await asyncio.sleep(0.01)
+    elapsed = time.perf_counter() - t0
+
+    await server.stop()
+    await api_runner.cleanup()
+
+    print("=" * 60)
+    print(f"📨 Updates enviados: {n_updates} (HTTP 200: {statuses.count(200)})")
+    print(f"💬 sendMessage recibidos por la API falsa: {fake.calls.count('sendMessage')}")
+    print(f"⏱️ Tiempo total: {elapsed * 1000:.0f} ms")
+    print(f"📊 Stats webhook: {server.stats()}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
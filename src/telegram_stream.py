@@ -0,0 +1,127 @@
+# src/telegram_stream.py
+"""
+Respuestas en streaming para Telegram: se edita progresivamente un mensaje
+placeholder con los tokens del LLM, agrupando ediciones para respetar los
+límites de Telegram y continuando en mensajes nuevos al pasar de 4096 chars.
+"""
+
+import asyncio
+import logging
+import time
+from datetime import timedelta
+from typing import Awaitable, Callable, Optional
+
+from telegram import Message
+from telegram.error import BadRequest, RetryAfter
+
+logger = logging.getLogger(__name__)
+
+TELEGRAM_MAX_CHARS = 4096
+
+
+def _seconds(value) -> float:
+    return value.total_seconds() if isinstance(value, timedelta) else float(value)
+
+
+class TelegramStreamWriter:
+    """
+    Escribe una respuesta incremental sobre mensajes de Telegram.
+
+    - append(): acumula tokens y edita como máximo una vez cada min_interval segundos.
+    - finish(): fuerza la última edición (esperando RetryAfter si hace falta).
+    - first_visible: segundos desde started_at hasta que el primer token fue visible.
+    """
+
+    def __init__(
+        self,
+        send: Callable[[str], Awaitable[Message]],
+        min_interval: float = 1.0,
+        limit: int = TELEGRAM_MAX_CHARS,
+        started_at: Optional[float] = None,
+    ):
+        self._send = send
+        self.min_interval = min_interval
+        self.limit = limit
+        self.started_at = started_at if started_at is not None else time.perf_counter()
+
+        self.first_visible: Optional[float] = None
+        self.edits = 0
+        self.messages = 0
+
+        self._message: Optional[Message] = None
+        self._text = ""   # texto del mensaje actual (aún sin cortar)
+        self._shown = ""  # lo último que Telegram muestra en el mensaje actual
+        self._next_edit = 0.0
+
+    async def start(self, placeholder: str) -> None:
+        self._message = await self._send(placeholder)
+        self._shown = placeholder
+        self.messages += 1
+
+    async def append(self, text: str) -> None:
+        self._text += text
+        if time.monotonic() >= self._next_edit:
+            await self.flush()
+
+    async def flush(self, force: bool = False, **kwargs) -> None:
+        # Al superar el límite se cierra el mensaje actual y se abre uno nuevo
+        while len(self._text) > self.limit:
+            cut = self._split_point(self._text)
+            head, self._text = self._text[:cut].rstrip(), self._text[cut:].lstrip()
+            await self._edit(head, force=True)
+            self._message = await self._send(self._text[: self.limit] or "…")
+            self._shown = self._text[: self.limit]
+            self.messages += 1
+            self._mark_visible()
+
+        if self._text and self._text != self._shown:
+            await self._edit(self._text, force=force, **kwargs)
+
+    async def finish(self, footer: str = "") -> None:
+        self._text += footer
+        await self.flush(force=True)
+
+    async def replace(self, text: str, **kwargs) -> None:
+        """Reemplaza el contenido del mensaje actual (p.ej. opciones de desambiguación)."""
+        self._text = text
+        await self.flush(force=True, **kwargs)
+
+    def _split_point(self, text: str) -> int:
+        # Preferir cortar en un salto de línea o espacio dentro del límite
+        for sep in ("\n", " "):
+            idx = text.rfind(sep, 0, self.limit)
+            if idx > self.limit // 2:
+                return idx + 1
+        return self.limit
+
+    def _mark_visible(self) -> None:
+        if self.first_visible is None:
+            self.first_visible = time.perf_counter() - self.started_at
+
+    async def _edit(self, text: str, force: bool = False, **kwargs) -> None:
+        if text == self._shown:
+            return
+        wait = self._next_edit - time.monotonic()
+        if wait > 0:
+            if not force:
+                return
+            await asyncio.sleep(wait)
+
+        try:
+            await self._message.edit_text(text, **kwargs)
+        except RetryAfter as e:
+            retry = _seconds(e.retry_after)
+            logger.warning(f"⏳ Telegram pidió esperar {retry:.0f}s antes de editar")
+            self._next_edit = time.monotonic() + retry
+            if force:
+                await self._edit(text, force=True, **kwargs)
+            return
+        except BadRequest as e:
+            # "Message is not modified" no es un error real
+            if "not modified" not in str(e).lower():
+                raise
+
+        self._shown = text
+        self.edits += 1
+        self._next_edit = time.monotonic() + self.min_interval
+        self._mark_visible()
@@ -0,0 +1,165 @@
+# src/webhook.py
+"""
+Modo webhook para CREGBot: servidor aiohttp que recibe los updates de Telegram,
+reutiliza una sola Application + CREGAgent y procesa updates en paralelo con
+un límite acotado. Si la cola de pendientes se llena responde 503 para que
+Telegram reintente más tarde (backpressure).
+"""
+
+import asyncio
+import hmac
+import logging
+import signal
+import time
+from typing import Optional, Set
+
+from aiohttp import web
+from telegram import Update
+
+logger = logging.getLogger(__name__)
+
+SECRET_HEADER = "X-Telegram-Bot-Api-Secret-Token"
+
+
+class WebhookServer:
+    """
+    Servidor de webhook sobre la Application ya construida por CREGBot.
+    """
+
+    def __init__(
+        self,
+        bot,
+        path: str = "/telegram",
+        secret_token: Optional[str] = None,
+        max_concurrency: int = 32,
+        max_pending: int = 256,
+    ):
+        self.bot = bot
+        self.application = bot.app
+        self.path = path
+        self.secret_token = secret_token
+        self.max_concurrency = max_concurrency
+        self.max_pending = max_pending
+
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._tasks: Set[asyncio.Task] = set()
+        self._runner: Optional[web.AppRunner] = None
+
+        # Métricas
+        self.received = 0
+        self.in_flight = 0
+        self.processed = 0
+        self.rejected = 0
+        self.failed = 0
+
+    @property
+    def pending(self) -> int:
+        return len(self._tasks)
+
+    def build_app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_post(self.path, self.handle_update)
+        app.router.add_get("/health", self.handle_health)
+        return app
+
+    async def handle_update(self, request: web.Request) -> web.Response:
+        if self.secret_token:
+            received = request.headers.get(SECRET_HEADER, "")
+            if not hmac.compare_digest(received, self.secret_token):
+                return web.Response(status=403)
+
+        # Backpressure: Telegram reintenta los updates que reciben error
+        if self.pending >= self.max_pending:
+            self.rejected += 1
+            logger.warning(f"🚦 Webhook saturado ({self.pending} pendientes), rechazando update")
+            return web.Response(status=503, headers={"Retry-After": "1"})
+
+        try:
+            data = await request.json()
+            update = Update.de_json(data, self.application.bot)
+        except Exception as e:
+            logger.error(f"❌ Update inválido en webhook: {e}")
+            return web.Response(status=400)
+
+        self.received += 1
+        task = asyncio.create_task(self._process(update))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return web.Response(text="ok")
+
+    async def handle_health(self, request: web.Request) -> web.Response:
+        return web.json_response(self.stats())
+
+    async def _process(self, update: Update) -> None:
+        async with self._semaphore:
+            self.in_flight += 1
+            t0 = time.perf_counter()
+            try:
+                await self.application.process_update(update)
+                self.processed += 1
+            except Exception as e:
+                self.failed += 1
+                logger.error(f"❌ Error procesando update {update.update_id}: {e}")
+            finally:
+                self.in_flight -= 1
+                logger.debug(f"Update {update.update_id} en {(time.perf_counter() - t0) * 1000:.0f} ms")
+
+    def stats(self) -> dict:
+        return {
+            "pending": self.pending,
+            "in_flight": self.in_flight,
+            "received": self.received,
+            "processed": self.processed,
+            "rejected": self.rejected,
+            "failed": self.failed,
+        }
+
+    async def start(self, host: str, port: int, webhook_url: Optional[str] = None) -> None:
+        await self.application.initialize()
+        await self.application.start()
+
+        self._runner = web.AppRunner(self.build_app())
+        await self._runner.setup()
+        await web.TCPSite(self._runner, host, port).start()
+        logger.info(f"🌐 Webhook escuchando en {host}:{port}{self.path}")
+
+        if webhook_url:
+            await self.application.bot.set_webhook(
+                url=webhook_url,
+                secret_token=self.secret_token,
+                max_connections=min(100, self.max_concurrency),
+                allowed_updates=Update.ALL_TYPES,
+            )
+            logger.info(f"✅ Webhook registrado en Telegram: {webhook_url}")
+
+    async def stop(self, drain_timeout: float = 30.0) -> None:
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+        # Terminar los updates en curso antes de cerrar la Application
+        if self._tasks:
+            logger.info(f"⏳ Esperando {len(self._tasks)} updates en curso...")
+            _, still = await asyncio.wait(set(self._tasks), timeout=drain_timeout)
+            for task in still:
+                task.cancel()
+
+        await self.application.stop()
+        await self.application.shutdown()
+        logger.info("🛑 Webhook detenido")
+
+    async def serve(self, host: str, port: int, webhook_url: Optional[str] = None) -> None:
+        """Arranca el servidor y bloquea hasta SIGINT/SIGTERM."""
+        stop_event = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            try:
+                loop.add_signal_handler(sig, stop_event.set)
+            except NotImplementedError:
+                pass
+
+        await self.start(host, port, webhook_url)
+        try:
+            await stop_event.wait()
+        finally:
+            await self.stop()
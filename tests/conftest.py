@@ -0,0 +1,11 @@
+"""
+Pruebas sin servicios externos: Supabase, OpenAI y Telegram se reemplazan por
+dobles en memoria. src.config exige estas variables al importarse.
+"""
+
+import os
+
+os.environ.setdefault("TELEGRAM_BOT_TOKEN", "123456:TEST")
+os.environ.setdefault("OPENAI_API_KEY", "sk-test")
+os.environ.setdefault("SUPABASE_URL", "http://127.0.0.1:9")
+os.environ.setdefault("SUPABASE_KEY", "test-key")
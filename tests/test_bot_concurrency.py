@@ -0,0 +1,109 @@
+"""
+Modo polling: las updates de chats distintos se atienden a la vez, de modo que el
+AnswerScheduler (semáforo global, límite por chat, single-flight) controla la
+concurrencia en lugar de la cola secuencial de python-telegram-bot.
+"""
+
+import asyncio
+import time
+
+from aiohttp import web
+from telegram import Update
+
+import src.bot
+from src.bot import CREGBot
+
+
+class FakeTelegramAPI:
+    """Responde a los métodos de la Bot API que usa el bot."""
+
+    def __init__(self):
+        self.message_id = 0
+
+    async def handle(self, request: web.Request) -> web.Response:
+        method = request.match_info["method"]
+        if method == "getMe":
+            result = {"id": 1, "is_bot": True, "first_name": "CREG", "username": "creg_bot"}
+        elif method in ("sendMessage", "editMessageText"):
+            self.message_id += 1
+            result = {
+                "message_id": self.message_id,
+                "date": int(time.time()),
+                "chat": {"id": 1, "type": "private"},
+                "text": "ok",
+            }
+        else:
+            result = True
+        return web.json_response({"ok": True, "result": result})
+
+
+class BarrierAgent:
+    """Cada respuesta espera a que lleguen `parties` consultas simultáneas."""
+
+    def __init__(self, parties: int):
+        self.parties = parties
+        self.arrived = 0
+        self.all_arrived = asyncio.Event()
+        self.questions = []
+
+    async def answer(self, question: str):
+        self.questions.append(question)
+        self.arrived += 1
+        if self.arrived == self.parties:
+            self.all_arrived.set()
+        await asyncio.wait_for(self.all_arrived.wait(), timeout=5)
+        return {"respuesta": f"ok: {question}", "normas_usadas": []}
+
+
+def make_update(update_id: int, chat_id: int, text: str) -> dict:
+    return {
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "date": int(time.time()),
+            "chat": {"id": chat_id, "type": "private"},
+            "from": {"id": chat_id, "is_bot": False, "first_name": "U"},
+            "text": text,
+        },
+    }
+
+
+def test_polling_answers_two_chats_concurrently(monkeypatch):
+    async def scenario():
+        api = FakeTelegramAPI()
+        web_app = web.Application()
+        web_app.router.add_post("/bot{token}/{method}", api.handle)
+        runner = web.AppRunner(web_app)
+        await runner.setup()
+        site = web.TCPSite(runner, "127.0.0.1", 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        monkeypatch.setattr(src.bot, "TELEGRAM_API_BASE_URL", f"http://127.0.0.1:{port}/bot")
+
+        bot = CREGBot()
+        bot.streaming = False
+        agent = BarrierAgent(parties=2)
+        bot.scheduler.agent = agent
+
+        errors = []
+        bot.app.add_error_handler(lambda update, context: errors.append(context.error))
+
+        try:
+            async with bot.app:
+                await bot.app.start()
+                try:
+                    # Lo mismo que hace el Updater de run_polling con cada update recibida
+                    for i, chat_id in enumerate((101, 202), 1):
+                        data = make_update(i, chat_id, f"pregunta del chat {chat_id}")
+                        await bot.app.update_queue.put(Update.de_json(data, bot.app.bot))
+                    await asyncio.wait_for(agent.all_arrived.wait(), timeout=5)
+                finally:
+                    await bot.app.stop()
+        finally:
+            await runner.cleanup()
+
+        assert errors == []
+        assert sorted(agent.questions) == ["pregunta del chat 101", "pregunta del chat 202"]
+        assert bot.scheduler.executed == 2
+
+    asyncio.run(scenario())
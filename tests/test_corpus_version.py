@@ -0,0 +1,99 @@
+"""El cache semántico de respuestas se invalida con cambios en el lugar de los chunks."""
+
+import asyncio
+import itertools
+
+from src.core.agent import CREGAgent
+
+_clock = itertools.count(1)
+
+
+def _now() -> str:
+    return f"2026-01-01T00:00:{next(_clock):02d}+00:00"
+
+
+class FakeChunks:
+    """Tabla chunks con el trigger de sql/chunk_updated_at.sql: todo UPDATE toca updated_at."""
+
+    def __init__(self, n: int = 3):
+        self.rows = [{"id": i, "texto": f"texto {i}", "updated_at": _now()} for i in range(1, n + 1)]
+
+    def update(self, chunk_id: int, **values) -> None:
+        row = next(r for r in self.rows if r["id"] == chunk_id)
+        row.update(values, updated_at=_now())
+
+
+class FakeQuery:
+    def __init__(self, table: FakeChunks):
+        self.table = table
+
+    def select(self, column, count=None):
+        self.column = column
+        return self
+
+    def order(self, column, desc=False):
+        self.order_by = (column, desc)
+        return self
+
+    def limit(self, n):
+        self.n = n
+        return self
+
+    async def execute(self):
+        column, desc = self.order_by
+        rows = sorted(self.table.rows, key=lambda r: r[column], reverse=desc)[: self.n]
+        return type("Res", (), {"data": [{self.column: r[self.column]} for r in rows], "count": len(self.table.rows)})
+
+
+class FakeSupabase:
+    def __init__(self, chunks: FakeChunks):
+        self.chunks = chunks
+
+    def table(self, name):
+        assert name == "chunks"
+        return FakeQuery(self.chunks)
+
+
+def _agent_with(chunks: FakeChunks) -> CREGAgent:
+    agent = CREGAgent()
+    agent.vectordb.supabase = FakeSupabase(chunks)
+    return agent
+
+
+async def _check_now(agent: CREGAgent) -> None:
+    # Simula que ya pasó ANSWER_CACHE_CORPUS_CHECK desde la última consulta
+    agent._corpus_checked_at = 0.0
+    await agent._refresh_corpus_version()
+
+
+def test_in_place_update_invalidates_answer_cache():
+    async def scenario():
+        chunks = FakeChunks()
+        agent = _agent_with(chunks)
+        await _check_now(agent)
+        agent.answer_cache.store("¿qué dice la 101?", [1.0, 0.0], frozenset({1}), "respuesta vieja", 0.5)
+
+        await _check_now(agent)
+        assert len(agent.answer_cache) == 1  # sin cambios: se conserva
+
+        # Mismo número de chunks y mismo id máximo: solo cambia el texto de un chunk viejo
+        chunks.update(1, texto="texto corregido")
+        await _check_now(agent)
+        assert len(agent.answer_cache) == 0
+        assert agent.answer_cache.invalidations == 1
+
+    asyncio.run(scenario())
+
+
+def test_re_embedding_invalidates_answer_cache():
+    async def scenario():
+        chunks = FakeChunks()
+        agent = _agent_with(chunks)
+        await _check_now(agent)
+        agent.answer_cache.store("tarifas de gas", [0.0, 1.0], frozenset({2}), "respuesta", 0.5)
+
+        chunks.update(2, embedding_openai="[0.1,0.2]")
+        await _check_now(agent)
+        assert len(agent.answer_cache) == 0
+
+    asyncio.run(scenario())
@@ -0,0 +1,167 @@
+"""
+El refresco del índice local ve los cambios que no mueven el watermark de id:
+embeddings recalculados, filas viejas rellenadas después y borrados.
+"""
+
+import asyncio
+import itertools
+import json
+
+import numpy as np
+import pytest
+
+import src.db.vectordb_supabase as vectordb_supabase
+from src.db.local_index import LocalVectorIndex
+from src.db.vectordb_supabase import VectorDBSupabase
+
+# Pasos de una hora: más que UPDATED_AT_OVERLAP, así "updated_at >= since" distingue ciclos
+_clock = itertools.count(1)
+
+
+def _now() -> str:
+    return f"2026-01-01T{next(_clock):02d}:00:00+00:00"
+
+
+def _vec(*values) -> str:
+    return json.dumps(list(values))
+
+
+class FakeChunks:
+    """Tabla chunks con el trigger de sql/chunk_updated_at.sql: todo UPDATE toca updated_at."""
+
+    def __init__(self):
+        self.rows = [
+            {"id": 1, "norma_id": 10, "indice": 0, "embedding_openai": _vec(1, 0, 0)},
+            {"id": 2, "norma_id": 10, "indice": 1, "embedding_openai": _vec(0, 1, 0)},
+            {"id": 3, "norma_id": 20, "indice": 0, "embedding_openai": None},
+            {"id": 4, "norma_id": 20, "indice": 1, "embedding_openai": _vec(0, 0, 1)},
+        ]
+        for r in self.rows:
+            r["updated_at"] = _now()
+
+    def update(self, chunk_id: int, **values) -> None:
+        row = next(r for r in self.rows if r["id"] == chunk_id)
+        row.update(values, updated_at=_now())
+
+    def delete(self, chunk_id: int) -> None:
+        self.rows = [r for r in self.rows if r["id"] != chunk_id]
+
+
+class FakeQuery:
+    def __init__(self, table: FakeChunks):
+        self.table = table
+        self.filters = []
+        self.orders = []
+        self.window = (0, None)
+        self.negate = False
+
+    def select(self, columns, count=None):
+        self.columns = [c.strip() for c in columns.split(",")]
+        return self
+
+    @property
+    def not_(self):
+        self.negate = True
+        return self
+
+    def is_(self, column, value):
+        negate, self.negate = self.negate, False
+        self.filters.append(lambda r: (r[column] is None) != negate)
+        return self
+
+    def gt(self, column, value):
+        self.filters.append(lambda r: r[column] > value)
+        return self
+
+    def gte(self, column, value):
+        self.filters.append(lambda r: r[column] >= value)
+        return self
+
+    def order(self, column, desc=False):
+        self.orders.append((column, desc))
+        return self
+
+    def limit(self, n):
+        self.window = (0, n)
+        return self
+
+    def range(self, start, end):
+        self.window = (start, end - start + 1)
+        return self
+
+    async def execute(self):
+        rows = [r for r in self.table.rows if all(f(r) for f in self.filters)]
+        for column, desc in reversed(self.orders):
+            rows.sort(key=lambda r: r[column], reverse=desc)
+        start, n = self.window
+        rows = rows[start:] if n is None else rows[start : start + n]
+        data = [{c: r[c] for c in self.columns} for r in rows]
+        return type("Res", (), {"data": data, "count": len(self.table.rows)})
+
+
+class FakeSupabase:
+    def __init__(self, chunks: FakeChunks):
+        self.chunks = chunks
+
+    def table(self, name):
+        assert name == "chunks"
+        return FakeQuery(self.chunks)
+
+
+def _top_id(index: LocalVectorIndex, *query) -> int:
+    return index.search(list(query), k=1, threshold=0.5)[0]["id"]
+
+
+def test_local_index_sees_re_embeddings_backfills_and_deletes(monkeypatch):
+    chunks = FakeChunks()
+    vdb = VectorDBSupabase()
+    vdb.supabase = FakeSupabase(chunks)
+    vdb.local_index = index = LocalVectorIndex()
+
+    def after_initial_load():
+        assert sorted(index.ids.tolist()) == [1, 2, 4]
+        assert index.watermark == 4
+        # Mismos ids y mismo número de chunks: solo cambian filas bajo el watermark
+        chunks.update(2, embedding_openai=_vec(1, 1, 0))
+        chunks.update(3, embedding_openai=_vec(0, 1, 0))
+
+    def after_sync():
+        assert sorted(index.ids.tolist()) == [1, 2, 3, 4]
+        assert _top_id(index, 0, 1, 0) == 3
+        assert _top_id(index, 1, 1, 0) == 2
+        chunks.delete(1)
+
+    def after_delete():
+        assert sorted(index.ids.tolist()) == [2, 3, 4]
+
+    steps = iter([after_initial_load, after_sync, after_delete])
+
+    async def fake_sleep(_seconds):
+        step = next(steps, None)
+        if step is None:
+            raise asyncio.CancelledError
+        step()
+
+    monkeypatch.setattr(vectordb_supabase.asyncio, "sleep", fake_sleep)
+    with pytest.raises(asyncio.CancelledError):
+        asyncio.run(vdb._local_index_loop())
+    assert next(steps, None) is None
+
+
+def test_upsert_moves_re_embedded_rows_between_ivf_lists():
+    rng = np.random.default_rng(0)
+    vectors = rng.normal(size=(64, 8)).astype(np.float32)
+    index = LocalVectorIndex(nlist=4, nprobe=1)
+    index.add(range(1, 65), [1] * 64, range(64), vectors)
+    index.train()
+
+    target = index._centroids[0] - index._centroids[1]
+    replaced = index.upsert([5, 5, 100], [1, 1, 2], [4, 4, 0], np.stack([vectors[0], target, target]))
+
+    assert replaced == 1
+    assert len(index) == 65
+    row = int(np.flatnonzero(index.ids == 5)[0])
+    members = [c for c, lst in enumerate(index._lists) if row in lst]
+    assert len(members) == 1
+    assert sum(len(lst) for lst in index._lists) == 65
+    assert {r["id"] for r in index.search(target, k=2, threshold=0.0)} == {5, 100}